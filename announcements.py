@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+announcements.py -- Udacity conference server-side Python App Engine
+    announcement & featured speaker, cached per instance and in memcache
+
+$Id$
+
+Used by the API's getAnnouncement/getFeaturedSpeaker and refreshed by the
+cron and task handlers in main.py, which import this rather than the API
+module.
+
+"""
+
+from google.appengine.ext import ndb
+
+from cache import DerivedValue
+from models import Conference
+from models import FeaturedSpeaker
+
+MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
+MEMCACHE_FEATURED_SPEAKERS_KEY = "FEATURED_SPEAKERS"
+FEATURED_SPEAKER_ID = 'current'
+
+# - - - Announcements - - - - - - - - - - - - - - - - - - - -
+
+
+def make_announcement():
+    """Return Announcement of nearly sold out conferences, or an
+    empty string if there are none."""
+    confs = Conference.query(ndb.AND(
+        Conference.seatsAvailable <= 5,
+        Conference.seatsAvailable > 0)
+    ).fetch(projection=[Conference.name])
+
+    if confs:
+        # If there are almost sold out conferences,
+        # format announcement
+        return '%s %s' % (
+            'Last chance to attend! The following conferences '
+            'are nearly sold out:',
+            ', '.join(conf.name for conf in confs))
+    # an empty announcement is cached too, so that it is not
+    # recomputed on every request
+    return ""
+
+
+def cache_announcement():
+    """Create Announcement & assign to cache; used by
+    memcache cron job & putAnnouncement().
+    """
+    announcement = make_announcement()
+    ANNOUNCEMENT.set(announcement)
+    return announcement
+
+# - - - Featured Speakers - - - - - - - - - - - - - - - - - - - -
+
+
+def _format_featured_speaker(speaker):
+    """Return the featured speaker text of speaker, or None if it has
+    fewer than two sessions."""
+    if not speaker or len(speaker.sessions) < 2:
+        return None
+    return '%s %s %s %s' % (
+        'Featured Speaker:',
+        speaker.name, '| Sessions:',
+        ', '.join(speaker.sessions))
+
+
+def make_featured_speaker():
+    """Return the speaker last featured by the set featured speakers
+    task, re-rendered; used to rebuild the value when it has been
+    evicted from memcache."""
+    featured = FeaturedSpeaker.get_by_id(FEATURED_SPEAKER_ID)
+    speaker = featured.speaker.get() if featured and featured.speaker else None
+    return _format_featured_speaker(speaker) or ''
+
+
+def cache_featured_speaker(speaker_key):
+    """Create featured speaker & assign to cache; used by
+    set featured speakers task.
+    """
+    speaker = ndb.Key(urlsafe=speaker_key).get()
+    featured = _format_featured_speaker(speaker)
+
+    if featured:
+        # remembered, so that an eviction re-renders this speaker
+        FeaturedSpeaker(id=FEATURED_SPEAKER_ID, speaker=speaker.key).put()
+        FEATURED_SPEAKER.set(featured)
+
+
+# globally derived values, cached per instance and in memcache
+ANNOUNCEMENT = DerivedValue(MEMCACHE_ANNOUNCEMENTS_KEY, make_announcement)
+FEATURED_SPEAKER = DerivedValue(MEMCACHE_FEATURED_SPEAKERS_KEY,
+                                make_featured_speaker)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+"""
+archive.py -- Udacity conference server-side Python App Engine
+    archival of ended conferences, their sessions and speakers
+
+$Id$
+
+A daily cron job moves every Conference whose endDate has passed, with
+its Sessions, into ArchivedConference / ArchivedSession entities, and
+then every Speaker without active sessions into ArchivedSpeaker. The
+archive kinds only index what includeArchived queries filter on by
+equality, and nothing of them reaches the composite indexes, so the
+active kinds and their indexes only hold current data.
+
+An archived entity keeps the key path of the original with each kind
+mapped to its archive kind, e.g. Profile/Conference/Session becomes
+Profile/ArchivedConference/ArchivedSession. The root stays the same, so
+a conference moves within its own entity group, and websafe keys held
+by profiles can be mapped to the archive without a lookup table.
+
+Archived conferences and sessions are taken out of the dashboard
+statistics, which count active data.
+
+"""
+
+import time
+from collections import Counter
+from datetime import datetime
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+import feed
+import stats
+from models import ArchivedConference
+from models import ArchivedSession
+from models import ArchivedSpeaker
+from models import Attendance
+from models import Conference
+from models import Session
+from models import Speaker
+from models import WaitlistEntry
+from models import current_version_seed
+from models import MEMCACHE_CONFERENCES_VERSION_KEY
+from models import MEMCACHE_CONFERENCE_DETAIL_KEY
+from models import MEMCACHE_CONFERENCE_VERSION_KEY
+from models import MEMCACHE_SESSIONS_VERSION_KEY
+
+ARCHIVE_URL = '/tasks/archive'
+TIME_BUDGET_SECONDS = 60
+CONFERENCE_BATCH = 20
+SPEAKER_BATCH = 100
+DELETE_BATCH = 500
+
+ARCHIVE_KINDS = {
+    'Conference': ArchivedConference,
+    'Session': ArchivedSession,
+    'Speaker': ArchivedSpeaker,
+}
+
+LIVE_KINDS = dict((model._get_kind(), kind) for kind, model in ARCHIVE_KINDS.items())
+
+# - - - Keys - - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def archived_key(key):
+    """Return the key an entity gets once archived."""
+    flat = list(key.flat())
+    for i in range(0, len(flat), 2):
+        if flat[i] in ARCHIVE_KINDS:
+            flat[i] = ARCHIVE_KINDS[flat[i]]._get_kind()
+    return ndb.Key(flat=flat)
+
+
+def live_key(key):
+    """Return the key an archived entity had before archival; other
+    keys are returned as they are."""
+    flat = list(key.flat())
+    for i in range(0, len(flat), 2):
+        flat[i] = LIVE_KINDS.get(flat[i], flat[i])
+    return ndb.Key(flat=flat)
+
+
+def get_multi(keys):
+    """Like ndb.get_multi, but falls back to the archived entity for keys
+    whose entity has been archived."""
+    entities = ndb.get_multi(keys)
+    missing = [i for i, entity in enumerate(entities) if entity is None]
+    if missing:
+        archived = ndb.get_multi([archived_key(keys[i]) for i in missing])
+        for i, entity in zip(missing, archived):
+            entities[i] = entity
+    return entities
+
+
+def _archived_copy(entity):
+    model = ARCHIVE_KINDS[entity._get_kind()]
+    copy = model(key=archived_key(entity.key))
+    # computed properties (e.g. Session.endDateTime) are kept as values
+    copy.populate(**entity.to_dict())
+    return copy
+
+# - - - Archival - - - - - - - - - - - - - - - - - - - - - - -
+
+
+@ndb.transactional
+def _archive_conference(key):
+    conf = key.get()
+    if not conf:
+        # archived by an earlier run; the query lagged behind
+        return
+    sessions = Session.query(ancestor=key).fetch()
+    waitlist = WaitlistEntry.query(ancestor=key).fetch(keys_only=True)
+
+    deltas = Counter(stats.conference_deltas(conf, -1))
+    registrations = (conf.maxAttendees or 0) - (conf.seatsAvailable or 0)
+    if registrations > 0:
+        deltas.update(stats.registration_deltas(conf, -registrations))
+    for session in sessions:
+        deltas.update(stats.session_deltas(session, -1))
+
+    ndb.put_multi([_archived_copy(conf)] +
+                  [_archived_copy(session) for session in sessions])
+    ndb.delete_multi([key] + [session.key for session in sessions] + waitlist)
+    stats.enqueue(deltas, transactional=True)
+
+
+def _delete_attendance(key):
+    """Drop the attendance index of an archived conference; it can hold
+    too many entities for the archiving transaction."""
+    while True:
+        keys = Attendance.query(ancestor=key).fetch(DELETE_BATCH, keys_only=True)
+        if not keys:
+            return
+        ndb.delete_multi(keys)
+
+
+@ndb.transactional
+def _archive_speaker(key):
+    speaker = key.get()
+    if speaker:
+        _archived_copy(speaker).put()
+        key.delete()
+
+
+def run(phase='conferences', cursor=None):
+    """Archive until the time budget is spent, then chain a task to carry
+    on; used by the archive cron job and task."""
+    deadline = time.time() + TIME_BUDGET_SECONDS
+    today = datetime.utcnow().date()
+    while time.time() < deadline:
+        if phase == 'conferences':
+            keys = Conference.query(Conference.endDate < today).fetch(
+                CONFERENCE_BATCH, keys_only=True)
+            for key in keys:
+                _archive_conference(key)
+                _delete_attendance(key)
+            if keys:
+                # conference lists changed without a Conference put
+                memcache.incr(MEMCACHE_CONFERENCES_VERSION_KEY,
+                              initial_value=current_version_seed())
+                memcache.delete_multi(
+                    [pattern % key.urlsafe() for key in keys
+                     for pattern in (MEMCACHE_CONFERENCE_DETAIL_KEY,
+                                     MEMCACHE_CONFERENCE_VERSION_KEY,
+                                     MEMCACHE_SESSIONS_VERSION_KEY)])
+                feed.schedule_render()
+            if len(keys) < CONFERENCE_BATCH:
+                phase = 'speakers'
+        else:
+            start = Cursor(urlsafe=cursor) if cursor else None
+            speakers, next_cursor, more = Speaker.query().fetch_page(
+                SPEAKER_BATCH, start_cursor=start)
+            for speaker in speakers:
+                if not Session.query(Session.speaker == speaker.name).get(keys_only=True):
+                    _archive_speaker(speaker.key)
+            if not more or not next_cursor:
+                return
+            cursor = next_cursor.urlsafe()
+    taskqueue.add(url=ARCHIVE_URL,
+                  params={'phase': phase, 'cursor': cursor or ''})
+
+# - - - Queries - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def matches(entity, filtr):
+    """Whether entity passes a formatted queryConferences filter; repeated
+    properties match when any value does, as in the datastore."""
+    values = getattr(entity, filtr['field'], None)
+    if not isinstance(values, list):
+        values = [values]
+    compare = COMPARISONS[filtr['operator']]
+    return any(value is not None and compare(value, filtr['value'])
+               for value in values)
+
+
+COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '!=': lambda a, b: a != b,
+}
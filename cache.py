@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+cache.py -- Udacity conference server-side Python App Engine
+    two-tier (instance + memcache) cache for small global derived values
+
+$Id$
+
+"""
+
+import threading
+import time
+
+from google.appengine.api import memcache
+
+LEASE_SUFFIX = "_LEASE"
+
+
+class DerivedValue(object):
+    """DerivedValue -- a small global value computed from the datastore.
+
+    Reads are served from an instance-local copy for local_ttl seconds,
+    then from memcache. On a memcache miss only one request (per key,
+    across instances) recomputes the value, holding a lease in memcache;
+    the others wait briefly for its result and otherwise fall back to
+    their stale local copy, so callers never see a blank value just
+    because memcache evicted the key.
+    """
+
+    def __init__(self, key, regenerate, local_ttl=30, memcache_ttl=0,
+                 lease_time=10, wait_attempts=5, wait_interval=0.1):
+        self.key = key
+        self.regenerate = regenerate
+        self.local_ttl = local_ttl
+        self.memcache_ttl = memcache_ttl
+        self.lease_time = lease_time
+        self.wait_attempts = wait_attempts
+        self.wait_interval = wait_interval
+        self._local = None  # (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the value, from the nearest tier that has it."""
+        local = self._local
+        if local and local[0] > time.time():
+            return local[1]
+
+        # one thread per instance goes to memcache; the others keep
+        # serving the stale copy if there is one
+        if not self._lock.acquire(local is None):
+            return local[1]
+        try:
+            local = self._local
+            if local and local[0] > time.time():
+                return local[1]
+            value = memcache.get(self.key)
+            if value is None:
+                value = self._regenerate(local[1] if local else None)
+            self._store_local(value)
+            return value
+        finally:
+            self._lock.release()
+
+    def set(self, value):
+        """Store a freshly computed value in both tiers."""
+        memcache.set(self.key, value, time=self.memcache_ttl)
+        self._store_local(value)
+
+    def _store_local(self, value):
+        self._local = (time.time() + self.local_ttl, value)
+
+    def _regenerate(self, stale):
+        """Recompute the value under a memcache lease (single flight)."""
+        lease_key = self.key + LEASE_SUFFIX
+        if memcache.add(lease_key, 1, time=self.lease_time):
+            try:
+                value = self.regenerate()
+                memcache.set(self.key, value, time=self.memcache_ttl)
+                return value
+            finally:
+                memcache.delete(lease_key)
+
+        # someone else holds the lease; give them a moment
+        for _ in range(self.wait_attempts):
+            time.sleep(self.wait_interval)
+            value = memcache.get(self.key)
+            if value is not None:
+                return value
+        if stale is not None:
+            return stale
+        # the lease holder is slow or gone; compute, but leave storing
+        # to it so memcache is not written twice
+        return self.regenerate()
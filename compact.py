@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+compact.py -- Udacity conference server-side Python App Engine
+    columnar encoding of large Session/Conference lists
+
+$Id$
+
+Instead of one object per item repeating every field name, each field is
+one parallel list. Strings that repeat across items (speakers, session
+types, cities, topics, organisers) are stored once in `strings` and
+referenced by index, dates are day offsets from `baseDate` and session
+start times are minutes past midnight. -1 marks a missing value in
+index and offset columns. The columns are plain lists so that they can
+be built (and measured, see compact_bench.py) without the SDK.
+
+"""
+
+
+class _Dictionary(object):
+    """Assigns each distinct string an index into a shared list."""
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def __call__(self, value):
+        if value is None:
+            return -1
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def _day_offsets(dates):
+    """Return (base date string, day offset of each date from it)."""
+    present = [d for d in dates if d]
+    if not present:
+        return None, [-1] * len(dates)
+    base = min(present)
+    return str(base), [(d - base).days if d else -1 for d in dates]
+
+
+def session_columns(sessions):
+    """Return the SessionColumns fields for a list of Sessions."""
+    strings = _Dictionary()
+    base, dates = _day_offsets([s.date for s in sessions])
+    return {
+        'baseDate': base,
+        'name': [s.name for s in sessions],
+        'highlights': [s.highlights or '' for s in sessions],
+        'speaker': [strings(s.speaker) for s in sessions],
+        'durationMinutes': [s.durationMinutes for s in sessions],
+        'typeOfSession': [strings(s.typeOfSession) for s in sessions],
+        'date': dates,
+        'startTime': [s.startTime.hour * 60 + s.startTime.minute for s in sessions],
+        'websafeKey': [s.key.urlsafe() for s in sessions],
+        'strings': strings.strings,
+    }
+
+
+def conference_columns(conferences, display_names):
+    """Return the ConferenceColumns fields for a list of Conferences;
+    display_names maps organizer user ids to display names."""
+    strings = _Dictionary()
+    start_base, start_dates = _day_offsets([c.startDate for c in conferences])
+    end_base, end_dates = _day_offsets([c.endDate for c in conferences])
+    return {
+        'startBaseDate': start_base,
+        'endBaseDate': end_base,
+        'name': [c.name for c in conferences],
+        'description': [c.description or '' for c in conferences],
+        'organizerUserId': [strings(c.organizerUserId) for c in conferences],
+        'organizerDisplayName': [strings(display_names.get(c.organizerUserId))
+                                 for c in conferences],
+        # topics of all conferences in one list, split by topicCount
+        'topics': [strings(t) for c in conferences for t in c.topics],
+        'topicCount': [len(c.topics) for c in conferences],
+        'city': [strings(c.city) for c in conferences],
+        'startDate': start_dates,
+        'endDate': end_dates,
+        'month': [c.month or 0 for c in conferences],
+        'maxAttendees': [c.maxAttendees or 0 for c in conferences],
+        'seatsAvailable': [c.seatsAvailable or 0 for c in conferences],
+        'websafeKey': [c.key.urlsafe() for c in conferences],
+        'strings': strings.strings,
+    }
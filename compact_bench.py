@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+compact_bench.py -- compare payload size and decode time of the standard
+    SessionForms / ConferenceForms JSON against the compact columns
+
+$Id$
+
+Runs without the SDK on synthetic data:
+
+    python compact_bench.py [count]
+
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+import compact
+
+SPEAKERS = ['Speaker %d' % i for i in range(40)]
+TYPES = ['Talk', 'Workshop', 'Keynote', 'Lightning', 'Panel']
+CITIES = ['London', 'Chicago', 'Paris', 'Tokyo', 'San Francisco', 'Berlin']
+TOPICS = ['Medical Innovations', 'Programming Languages', 'Web Technologies',
+          'Movie Making', 'Health and Nutrition']
+
+
+class _Key(object):
+    def __init__(self, n):
+        self._urlsafe = 'ahRkZXZ-b3JuYXRlLWJlYm9wLTEyMDMwOHIxCxIHUHJvZmlsZSIC' \
+                        'bWUMCxIKQ29uZmVyZW5jZRgBDAsSB1Nlc3Npb24Y%07d' % n
+
+    def urlsafe(self):
+        return self._urlsafe
+
+
+class _Item(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def _sessions(count):
+    base = date(2016, 6, 1)
+    return [_Item(key=_Key(i), name='Session number %d' % i,
+                  highlights=random.choice([None, 'Hands on, bring a laptop']),
+                  speaker=random.choice(SPEAKERS),
+                  durationMinutes=random.choice([30, 45, 60, 90]),
+                  typeOfSession=random.choice(TYPES),
+                  date=base + timedelta(days=random.randrange(3)),
+                  startTime=dtime(random.randrange(9, 18), random.choice([0, 30])))
+            for i in range(count)]
+
+
+def _conferences(count):
+    base = date(2016, 1, 1)
+    confs = []
+    for i in range(count):
+        start = base + timedelta(days=random.randrange(365))
+        confs.append(_Item(key=_Key(i), name='Conference %d' % i,
+                           description='An annual gathering',
+                           organizerUserId='user%d@example.com' % (i % 25),
+                           topics=random.sample(TOPICS, 2),
+                           city=random.choice(CITIES),
+                           startDate=start, endDate=start + timedelta(days=2),
+                           month=start.month, maxAttendees=200,
+                           seatsAvailable=random.randrange(200)))
+    return confs
+
+
+def _session_forms(sessions):
+    """The JSON the standard SessionForms response carries."""
+    return {'items': [dict(name=s.name, highlights=s.highlights,
+                           speaker=s.speaker, durationMinutes=s.durationMinutes,
+                           typeOfSession=s.typeOfSession, date=str(s.date),
+                           startTime=s.startTime.strftime('%H:%M'),
+                           websafeKey=s.key.urlsafe())
+                      for s in sessions]}
+
+
+def _conference_forms(confs, names):
+    """The JSON the standard ConferenceForms response carries."""
+    return {'items': [dict(name=c.name, description=c.description,
+                           organizerUserId=c.organizerUserId,
+                           organizerDisplayName=names[c.organizerUserId],
+                           topics=c.topics, city=c.city,
+                           startDate=str(c.startDate), endDate=str(c.endDate),
+                           month=c.month, maxAttendees=c.maxAttendees,
+                           seatsAvailable=c.seatsAvailable,
+                           websafeKey=c.key.urlsafe())
+                      for c in confs]}
+
+
+def _parse_date(value):
+    return date(*map(int, value.split('-')))
+
+
+def _decode_sessions(cols):
+    """Rebuild SessionForm-shaped dicts, as the client codec does."""
+    strings = cols['strings']
+    base = _parse_date(cols['baseDate'])
+    days = {}
+    items = []
+    for i, offset in enumerate(cols['date']):
+        if offset not in days:
+            days[offset] = str(base + timedelta(days=offset)) if offset >= 0 else None
+        minutes = cols['startTime'][i]
+        items.append(dict(name=cols['name'][i],
+                          highlights=cols['highlights'][i] or None,
+                          speaker=strings[cols['speaker'][i]] if cols['speaker'][i] >= 0 else None,
+                          durationMinutes=cols['durationMinutes'][i],
+                          typeOfSession=strings[cols['typeOfSession'][i]] if cols['typeOfSession'][i] >= 0 else None,
+                          date=days[offset],
+                          startTime='%02d:%02d' % divmod(minutes, 60),
+                          websafeKey=cols['websafeKey'][i]))
+    return {'items': items}
+
+
+def _timed(fn, *args):
+    start = time.time()
+    for _ in range(10):
+        result = fn(*args)
+    return result, (time.time() - start) / 10 * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(1)
+
+    sessions = _sessions(count)
+    standard = json.dumps(_session_forms(sessions))
+    columns = json.dumps(compact.session_columns(sessions))
+    _, std_ms = _timed(json.loads, standard)
+    _, col_ms = _timed(lambda s: _decode_sessions(json.loads(s)), columns)
+    print('%d sessions: standard %d bytes, %.1f ms parse; '
+          'compact %d bytes (%.0f%%), %.1f ms parse+decode'
+          % (count, len(standard), std_ms, len(columns),
+             100.0 * len(columns) / len(standard), col_ms))
+
+    confs = _conferences(count)
+    names = dict(('user%d@example.com' % i, 'User %d' % i) for i in range(25))
+    standard = json.dumps(_conference_forms(confs, names))
+    columns = json.dumps(compact.conference_columns(confs, names))
+    print('%d conferences: standard %d bytes; compact %d bytes (%.0f%%)'
+          % (count, len(standard), len(columns),
+             100.0 * len(columns) / len(standard)))
+
+
+if __name__ == '__main__':
+    main()
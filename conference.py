@@ -10,18 +10,37 @@ created by wesc on 2014 apr 21
 
 """
 
+import calendar
+import hashlib
 from datetime import datetime
+from datetime import timedelta
+import logging
+import time
+_LOAD_START = time.time()
 
 import endpoints
 from protorpc import messages
 from protorpc import message_types
+from protorpc import protojson
 from protorpc import remote
 
 from google.appengine.api import memcache
 from google.appengine.api import taskqueue
 from google.appengine.ext import ndb
 
+import announcements
+import archive
+import compact
+import feed
+import ical
+import index_audit
+import notifications
+from profiling import ProfilingMiddleware
+from intervals import IntervalIndex
+import stats
 from utils import getUserId
+from ratelimit import rate_limited
+from idempotency import idempotent
 
 from models import ConflictException
 from models import Profile
@@ -32,12 +51,36 @@ from models import Conference
 from models import ConferenceForm
 from models import ConferenceForms
 from models import ConferenceQueryForms
+from models import ConferenceKeysForm
 from models import TeeShirtSize
 from models import StringMessage
 from models import Session
 from models import SessionForm
 from models import SessionForms
 from models import Speaker
+from models import SpeakerForm
+from models import ConferenceDetailForm
+from models import WaitlistEntry
+from models import Attendance
+from models import WaitlistPositionForm
+from models import StatForm
+from models import ConferenceStatsForm
+from models import ConferenceColumns
+from models import ScheduleConflictForm
+from models import ScheduleConflictForms
+from models import Recommendation
+from models import RecommendationForm
+from models import RecommendationForms
+from models import SessionColumns
+from models import clear_conference_detail
+from models import current_version_seed
+from models import MEMCACHE_CONFERENCE_VERSION_KEY
+from models import MEMCACHE_SESSIONS_VERSION_KEY
+from models import MEMCACHE_CONFERENCES_VERSION_KEY
+from models import MEMCACHE_CONFERENCE_DETAIL_KEY
+from models import DETAIL_CACHE_TTL
+from models import ArchivedConference
+from models import ArchivedSession
 
 from settings import WEB_CLIENT_ID
 
@@ -45,8 +88,8 @@ __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
-MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
-MEMCACHE_FEATURED_SPEAKERS_KEY = "FEATURED_SPEAKERS"
+MEMCACHE_SCHEDULE_KEY = "SCHEDULE_%s"
+MAX_CONFERENCES_PER_BATCH = 100
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
@@ -57,6 +100,11 @@ DEFAULTS = {
     'topics': ['Default', 'Topic'],
 }
 
+# the ConferenceForm fields createConference copies into the Conference;
+# every other form field is output only or set by the server
+CONFERENCE_CREATE_FIELDS = ('name', 'description', 'topics', 'city', 'startDate',
+                            'endDate', 'maxAttendees', 'seatsAvailable')
+
 OPERATORS = {
     'EQ': '=',
     'GT': '>',
@@ -78,6 +126,28 @@ CONF_GET_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+CONF_CREATE_REQUEST = endpoints.ResourceContainer(
+    ConferenceForm,
+    idempotencyKey=messages.StringField(1),
+)
+
+CONF_REGISTER_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    idempotencyKey=messages.StringField(2),
+)
+
+CONF_GET_VERSION_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    version=messages.IntegerField(2),
+)
+
+STATS_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+)
+
 CONF_POST_REQUEST = endpoints.ResourceContainer(
     ConferenceForm,
     websafeConferenceKey=messages.StringField(1),
@@ -86,6 +156,7 @@ CONF_POST_REQUEST = endpoints.ResourceContainer(
 SESSION_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
+    version=messages.IntegerField(2),
 )
 
 SESSION_GET_REQUEST_BY_TYPE = endpoints.ResourceContainer(
@@ -97,16 +168,29 @@ SESSION_GET_REQUEST_BY_TYPE = endpoints.ResourceContainer(
 SESSION_GET_REQUEST_BY_SPEAKER = endpoints.ResourceContainer(
     message_types.VoidMessage,
     speaker=messages.StringField(1),
+    includeArchived=messages.BooleanField(2),
+)
+
+FINISHED_SESSIONS_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    includeArchived=messages.BooleanField(1),
 )
 
 SESSION_POST_REQUEST = endpoints.ResourceContainer(
     SessionForm,
     websafeConferenceKey=messages.StringField(1),
+    idempotencyKey=messages.StringField(2),
 )
 
 WISHLIST_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     SessionKey=messages.StringField(1),
+    checkConflicts=messages.BooleanField(2),
+)
+
+CALENDAR_POST_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    reset=messages.BooleanField(1),
 )
 
 INTERESTED_POST_REQUEST = endpoints.ResourceContainer(
@@ -117,6 +201,49 @@ INTERESTED_POST_REQUEST = endpoints.ResourceContainer(
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
+def _epoch_minutes(day, at=None):
+    """Minutes since the epoch of a date (and time) or a datetime."""
+    if at is not None:
+        day = datetime.combine(day, at)
+    return calendar.timegm(day.timetuple()) // 60
+
+
+def _conference_key(wsck):
+    """Return the Conference key of a websafe key, or None if it is
+    malformed or of another kind."""
+    try:
+        key = ndb.Key(urlsafe=wsck)
+    except Exception:
+        # bad base64, bad protocol buffer, ... depending on the damage
+        return None
+    return key if key.kind() == 'Conference' else None
+
+
+def _get_conference(wsck):
+    """Return the live Conference of a websafe key; raise NotFound if
+    there is none (archived conferences take no writes)."""
+    key = _conference_key(wsck)
+    conf = key.get() if key else None
+    if not conf:
+        raise endpoints.NotFoundException(
+            'No conference found with key: %s' % wsck)
+    return conf
+
+
+def _sort_value(entity, field):
+    """The value the datastore sorts entity on by field ascending."""
+    if not field:
+        return None
+    value = getattr(entity, field, None)
+    if isinstance(value, list):
+        return min(value) if value else None
+    return value
+
+
+def _format_minutes(minutes):
+    return datetime.utcfromtimestamp(minutes * 60).strftime('%Y-%m-%d %H:%M')
+
+
 @endpoints.api(name='conference',
                version='v1',
                allowed_client_ids=[WEB_CLIENT_ID, API_EXPLORER_CLIENT_ID],
@@ -137,7 +264,10 @@ class ConferenceApi(remote.Service):
                 else:
                     setattr(cf, field.name, getattr(conf, field.name))
             elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
+                # archived conferences keep the key clients know them by
+                setattr(cf, field.name, archive.live_key(conf.key).urlsafe())
+        if isinstance(conf, ArchivedConference):
+            cf.archived = True
         if display_name:
             setattr(cf, 'organizerDisplayName', display_name)
         cf.check_initialized()
@@ -155,9 +285,7 @@ class ConferenceApi(remote.Service):
             raise endpoints.BadRequestException("Conference 'name' field required")
 
         # copy ConferenceForm/ProtoRPC Message into dict
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
-        del data['websafeKey']
-        del data['organizerDisplayName']
+        data = {name: getattr(request, name) for name in CONFERENCE_CREATE_FIELDS}
 
         # add default values for those missing (both data model & outbound Message)
         for df in DEFAULTS:
@@ -177,22 +305,22 @@ class ConferenceApi(remote.Service):
         # set seatsAvailable to be same as maxAttendees on creation
         if data["maxAttendees"] > 0:
             data["seatsAvailable"] = data["maxAttendees"]
-        # generate Profile Key based on user ID and Conference
-        # ID based on Profile key get Conference key from ID
-        p_key = ndb.Key(Profile, user_id)
-        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
-        c_key = ndb.Key(Conference, c_id, parent=p_key)
-        data['key'] = c_key
+        # make the Conference a child of the organiser's Profile; put()
+        # assigns the id, saving a separate allocate_ids round trip
+        data['parent'] = ndb.Key(Profile, user_id)
         data['organizerUserId'] = request.organizerUserId = user_id
 
         # create Conference, send email to organizer confirming
-        # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
+        # creation of Conference & return ConferenceForm
+        conf = Conference(**data)
+        conf.put()
+        stats.enqueue(stats.conference_deltas(conf))
+        feed.schedule_render()
         taskqueue.add(params={'email': user.email(),
                               'conferenceInfo': repr(request)},
                       url='/tasks/send_confirmation_email'
                       )
-        return request
+        return self._copy_conference_to_form(conf)
 
     @ndb.transactional()
     def _update_conference_object(self, request):
@@ -204,21 +332,29 @@ class ConferenceApi(remote.Service):
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
 
-        # update existing conference
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
-        # check that conference exists
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
+        # update existing conference; check that it exists
+        conf = _get_conference(request.websafeConferenceKey)
 
         # check that user is owner
         if user_id != conf.organizerUserId:
             raise endpoints.ForbiddenException(
                 'Only the owner can update the conference.')
 
+        # move the conference's counts from its old city/topics/month
+        # to the new ones
+        registered = (conf.maxAttendees or 0) - (conf.seatsAvailable or 0)
+        deltas = stats.conference_deltas(conf, -1)
+        dates = (conf.startDate, conf.endDate)
+        # the fields of the conference's calendar event
+        shown = (conf.name, conf.city, conf.description) + dates
+        deltas.update(stats.registration_deltas(conf, -registered))
+
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
         for field in request.all_fields():
+            # versions are maintained by the model, never by the client
+            if field.name in ('version', 'notModified'):
+                continue
             data = getattr(request, field.name)
             # only copy fields where we get data
             if data not in (None, []):
@@ -230,13 +366,32 @@ class ConferenceApi(remote.Service):
                 # write to Conference object
                 setattr(conf, field.name, data)
         conf.put()
+        deltas.update(stats.conference_deltas(conf))
+        deltas.update(stats.registration_deltas(conf, registered))
+        stats.enqueue(deltas, transactional=True)
+        if (conf.startDate, conf.endDate) != dates:
+            notifications.notify_attendees(
+                conf, 'Conference dates changed',
+                'Hi, the dates of %s you registered for have changed. It now '
+                'runs from %s to %s.' % (conf.name, conf.startDate, conf.endDate),
+                transactional=True)
+        if (conf.name, conf.city, conf.description, conf.startDate, conf.endDate) != shown:
+            ical.queue_refresh(conf, transactional=True)
+        feed.schedule_render(transactional=True)
+        # seats added while people wait go to the waitlist, which only
+        # registration refuses them to
+        if conf.seatsAvailable > 0 and self._has_waitlist(conf.key):
+            taskqueue.add(params={'websafeConferenceKey': conf.key.urlsafe()},
+                          url='/tasks/promote_waitlist',
+                          transactional=True)
         prof = ndb.Key(Profile, user_id).get()
         return self._copy_conference_to_form(conf, getattr(prof, 'displayName'))
 
-    @endpoints.method(ConferenceForm, ConferenceForm,
+    @endpoints.method(CONF_CREATE_REQUEST, ConferenceForm,
                       path='conference',
                       http_method='POST',
                       name='createConference')
+    @idempotent('createConference', ConferenceForm)
     def create_conference(self, request):
         """Create new conference."""
         return self._create_conference_object(request)
@@ -247,23 +402,68 @@ class ConferenceApi(remote.Service):
                       name='updateConference')
     def update_conference(self, request):
         """Update conference w/provided fields & return w/updated info."""
-        return self._update_conference_object(request)
+        conf_form = self._update_conference_object(request)
+        self._clear_conference_detail(request.websafeConferenceKey)
+        return conf_form
 
-    @endpoints.method(CONF_GET_REQUEST, ConferenceForm,
+    @endpoints.method(CONF_GET_VERSION_REQUEST, ConferenceForm,
                       path='conference/{websafeConferenceKey}',
                       http_method='GET',
                       name='getConference')
     def get_conference(self, request):
-        """Return requested conference (by websafeConferenceKey)."""
+        """Return requested conference (by websafeConferenceKey), or just
+        notModified if it is still at the client supplied version."""
+        wsck = request.websafeConferenceKey
+        if request.version and request.version == memcache.get(
+                MEMCACHE_CONFERENCE_VERSION_KEY % wsck):
+            return ConferenceForm(version=request.version, notModified=True)
+
         # get Conference object from request; bail if not found
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        conf = ndb.Key(urlsafe=wsck).get()
         if not conf:
             raise endpoints.NotFoundException(
-                'No conference found with key: %s' % request.websafeConferenceKey)
+                'No conference found with key: %s' % wsck)
+        if request.version and request.version == conf.version:
+            return ConferenceForm(version=conf.version, notModified=True)
         prof = conf.key.parent().get()
         # return ConferenceForm
         return self._copy_conference_to_form(conf, getattr(prof, 'displayName'))
 
+    @endpoints.method(ConferenceKeysForm, ConferenceForms,
+                      path='conferences/batch',
+                      http_method='POST',
+                      name='getConferences')
+    def get_conferences(self, request):
+        """Return the requested conferences in request order; keys that
+        are malformed or have no conference get a notFound form."""
+        wscks = request.websafeConferenceKeys
+        if len(wscks) > MAX_CONFERENCES_PER_BATCH:
+            raise endpoints.BadRequestException(
+                'At most %d conferences per request.' % MAX_CONFERENCES_PER_BATCH)
+
+        keys = {}
+        for wsck in wscks:
+            key = _conference_key(wsck)
+            if key:
+                keys[wsck] = key
+        unique = list(set(keys.values()))
+        confs = dict(zip(unique, archive.get_multi(unique)))
+
+        organisers = list(set(ndb.Key(Profile, conf.organizerUserId)
+                              for conf in confs.values() if conf))
+        names = dict((key.id(), getattr(prof, 'displayName', None))
+                     for key, prof in zip(organisers, ndb.get_multi(organisers)))
+
+        items = []
+        for wsck in wscks:
+            conf = confs.get(keys.get(wsck))
+            if conf:
+                items.append(self._copy_conference_to_form(
+                    conf, names.get(conf.organizerUserId)))
+            else:
+                items.append(ConferenceForm(websafeKey=wsck, notFound=True))
+        return ConferenceForms(items=items)
+
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
                       path='getConferencesCreated',
                       http_method='POST',
@@ -333,25 +533,215 @@ class ConferenceApi(remote.Service):
                       path='queryConferences',
                       http_method='POST',
                       name='queryConferences')
+    @rate_limited('queryConferences')
     def query_conferences(self, request):
-        """Query for conferences."""
-        conferences = self._get_query(request)
+        """Query for conferences, or just notModified if no conference has
+        changed since the client supplied version."""
+        # read the version before querying, so a concurrent write can
+        # only make the client refetch, never miss the change
+        version = self._conferences_version()
+        if request.version and request.version == version:
+            return ConferenceForms(version=version, notModified=True)
+
+        conferences, names = self._query_conferences_with_names(request)
+
+        # return individual ConferenceForm object per Conference
+        return ConferenceForms(
+                items=[self._copy_conference_to_form(conf, names[conf.organizerUserId]) for conf in conferences],
+                version=version
+        )
+
+    @endpoints.method(ConferenceQueryForms, ConferenceColumns,
+                      path='queryConferencesCompact',
+                      http_method='POST',
+                      name='queryConferencesCompact')
+    @rate_limited('queryConferences')
+    def query_conferences_compact(self, request):
+        """Query for conferences, returned in compact columnar form."""
+        version = self._conferences_version()
+        if request.version and request.version == version:
+            return ConferenceColumns(version=version, notModified=True)
+
+        conferences, names = self._query_conferences_with_names(request)
+        return ConferenceColumns(version=version,
+                                 **compact.conference_columns(conferences, names))
+
+    def _query_conferences_with_names(self, request):
+        """Run the conference query; return the conferences and a dict of
+        their organisers' display names by user id."""
+        conferences = self._get_query(request).fetch()
+        if request.includeArchived:
+            inequality_field = self._format_filters(request.filters)[0]
+            conferences.extend(self._query_archived_conferences(request))
+            conferences.sort(key=lambda conf: (
+                _sort_value(conf, inequality_field), conf.name))
 
         # need to fetch organiser displayName from profiles
         # get all keys and use get_multi for speed
-        organisers = [(ndb.Key(Profile, conf.organizerUserId)) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
+        organisers = set(ndb.Key(Profile, conf.organizerUserId) for conf in conferences)
+        profiles = ndb.get_multi(list(organisers))
 
         # put display names in a dict for easier fetching
         names = {}
         for profile in profiles:
             names[profile.key.id()] = profile.displayName
+        return conferences, names
+
+    def _query_archived_conferences(self, request):
+        """Return the archived conferences matching the query filters.
+        Only equality filters are indexed on ArchivedConference, so the
+        inequality ones are applied here."""
+        q = ArchivedConference.query()
+        inequalities = []
+        for filtr in self._format_filters(request.filters)[1]:
+            if filtr["field"] in ["month", "maxAttendees"]:
+                filtr["value"] = int(filtr["value"])
+            if filtr["operator"] == "=":
+                q = q.filter(ndb.query.FilterNode(filtr["field"], "=", filtr["value"]))
+            else:
+                inequalities.append(filtr)
+        return [conf for conf in q
+                if all(archive.matches(conf, filtr) for filtr in inequalities)]
 
-        # return individual ConferenceForm object per Conference
-        return ConferenceForms(
-                items=[self._copy_conference_to_form(conf, names[conf.organizerUserId]) for conf in conferences]
+    @staticmethod
+    def _conferences_version():
+        """Return the version of the whole set of conferences."""
+        version = memcache.get(MEMCACHE_CONFERENCES_VERSION_KEY)
+        if version is None:
+            # evicted; start a new clock-seeded counter
+            memcache.add(MEMCACHE_CONFERENCES_VERSION_KEY, current_version_seed())
+            version = memcache.get(MEMCACHE_CONFERENCES_VERSION_KEY)
+        return version
+
+
+# - - - Conference detail - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _clear_conference_detail(websafeConferenceKey):
+        """Drop the cached composite for a conference after a write."""
+        clear_conference_detail(websafeConferenceKey)
+
+    @ndb.tasklet
+    def _conference_detail_async(self, c_key):
+        """Fetch conference, organiser and sessions concurrently, then the
+        speakers of those sessions; return the user-independent composite."""
+        conf, prof, sessions = yield (c_key.get_async(),
+                                      c_key.parent().get_async(),
+                                      Session.query(ancestor=c_key).fetch_async())
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % c_key.urlsafe())
+
+        # IN is limited to 30 values, so look speakers up in slices
+        names = sorted(set(session.speaker for session in sessions if session.speaker))
+        speakers = yield [Speaker.query(Speaker.name.IN(names[i:i + 30])).fetch_async()
+                          for i in range(0, len(names), 30)]
+
+        raise ndb.Return(ConferenceDetailForm(
+            conference=self._copy_conference_to_form(conf, getattr(prof, 'displayName', None)),
+            sessions=[self._copy_session_to_form(session) for session in sessions],
+            speakers=[SpeakerForm(name=speaker.name, sessions=speaker.sessions)
+                      for batch in speakers for speaker in batch],
+        ))
+
+    @endpoints.method(CONF_GET_REQUEST, ConferenceDetailForm,
+                      path='conference/{websafeConferenceKey}/detail',
+                      http_method='GET',
+                      name='getConferenceDetail')
+    def get_conference_detail(self, request):
+        """Return conference, its sessions & speakers and the current
+        user's registration/wishlist flags in one call."""
+        wsck = request.websafeConferenceKey
+        c_key = _conference_key(wsck)
+        if not c_key:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % wsck)
+        # the profile is only needed for the per-user overlay; start
+        # loading it while the composite is fetched
+        user = endpoints.get_current_user()
+        prof_future = ndb.Key(Profile, getUserId(user)).get_async() if user else None
+
+        cache_key = MEMCACHE_CONFERENCE_DETAIL_KEY % wsck
+        cached = memcache.get(cache_key)
+        if cached:
+            detail = protojson.decode_message(ConferenceDetailForm, cached)
+        else:
+            detail = self._conference_detail_async(c_key).get_result()
+            # add, not set: fails while a write holds the key locked
+            memcache.add(cache_key, protojson.encode_message(detail),
+                         time=DETAIL_CACHE_TTL)
+
+        # overlay user-specific flags on the shared composite
+        prof = prof_future.get_result() if prof_future else None
+        if prof:
+            detail.isUserAttending = wsck in prof.conferenceKeysToAttend
+            wishlist = set(prof.sessionsInWishlist)
+            detail.wishlistSessionKeys = [session.websafeKey for session in detail.sessions
+                                          if session.websafeKey in wishlist]
+        else:
+            detail.isUserAttending = False
+        # not part of the composite: joining the waitlist does not
+        # invalidate it
+        detail.hasWaitlist = (detail.conference.seatsAvailable > 0 and
+                              self._has_waitlist(c_key))
+        return detail
+
+
+# - - - Statistics - - - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _stat_forms(counts, prefix, suffix=''):
+        """Turn {'<prefix><name><suffix>': count} into sorted StatForms."""
+        forms = []
+        for name, count in sorted(counts.items()):
+            if name.startswith(prefix) and name.endswith(suffix):
+                forms.append(StatForm(name=name[len(prefix):len(name) - len(suffix)],
+                                      count=count))
+        return forms
+
+    @endpoints.method(STATS_GET_REQUEST, ConferenceStatsForm,
+                      path='stats',
+                      http_method='GET',
+                      name='getConferenceStats')
+    def get_conference_stats(self, request):
+        """Return aggregate statistics, plus those of the given conference
+        if the current user organises it."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+
+        totals = stats.get_counts(['conferences', 'registrations', 'sessions'])
+        by_city = stats.get_prefixed('city:')
+        by_topic = stats.get_prefixed('topic:')
+        by_month = stats.get_prefixed('month:')
+        form = ConferenceStatsForm(
+            conferences=totals['conferences'],
+            registrations=totals['registrations'],
+            sessions=totals['sessions'],
+            conferencesByCity=self._stat_forms(by_city, 'city:', ':conferences'),
+            conferencesByTopic=self._stat_forms(by_topic, 'topic:', ':conferences'),
+            conferencesByMonth=self._stat_forms(by_month, 'month:', ':conferences'),
+            registrationsByCity=self._stat_forms(by_city, 'city:', ':registrations'),
+            registrationsByTopic=self._stat_forms(by_topic, 'topic:', ':registrations'),
+            registrationsByMonth=self._stat_forms(by_month, 'month:', ':registrations'),
+            sessionsByType=self._stat_forms(stats.get_prefixed('sessionType:'),
+                                            'sessionType:', ':sessions'),
         )
 
+        wsck = request.websafeConferenceKey
+        if wsck:
+            # the organiser's user id is the id of the conference's parent
+            if ndb.Key(urlsafe=wsck).parent().id() != getUserId(user):
+                raise endpoints.ForbiddenException(
+                    'Only the owner can see statistics of the conference.')
+            prefix = 'conference:%s:' % wsck
+            conf_counts = stats.get_prefixed(prefix)
+            form.conferenceRegistrations = conf_counts.get(prefix + 'registrations', 0)
+            form.conferenceSessions = conf_counts.get(prefix + 'sessions', 0)
+            form.conferenceSessionsByType = self._stat_forms(
+                conf_counts, prefix + 'sessionType:')
+        return form
+
 
 # - - - Profile objects - - - - - - - - - - - - - - - - - - -
 
@@ -506,10 +896,7 @@ class ConferenceApi(remote.Service):
         # check if conf exists given websafeConfKey
         # get conference; check that it exists
         wsck = request.websafeConferenceKey
-        conf = ndb.Key(urlsafe=wsck).get()
-        if not conf:
-            raise endpoints.NotFoundException(
-                'No conference found with key: %s' % wsck)
+        conf = _get_conference(wsck)
 
         # register
         if reg:
@@ -518,14 +905,20 @@ class ConferenceApi(remote.Service):
                 raise ConflictException(
                     "You have already registered for this conference")
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+            # check if seats avail; freed seats go to the waitlist
+            # first, in order (see waitlist.promote)
+            if conf.seatsAvailable <= 0 or self._has_waitlist(conf.key):
                 raise ConflictException(
-                    "There are no seats available.")
+                    "There are no seats available. Join the waitlist "
+                    "to be registered when a seat frees up.")
 
             # register user, take away one seat
             prof.conferenceKeysToAttend.append(wsck)
             conf.seatsAvailable -= 1
+            Attendance(id=prof.key.id(), parent=conf.key).put()
+            stats.enqueue(stats.registration_deltas(conf), transactional=True)
+            if prof.calendarToken:
+                ical.queue_update(prof.key.id(), wsck, transactional=True)
             retval = True
 
         # unregister
@@ -533,9 +926,17 @@ class ConferenceApi(remote.Service):
             # check if user already registered
             if wsck in prof.conferenceKeysToAttend:
 
-                # unregister user, add back one seat
+                # unregister user, add back one seat and offer it
+                # to the head of the waitlist
                 prof.conferenceKeysToAttend.remove(wsck)
                 conf.seatsAvailable += 1
+                ndb.Key(Attendance, prof.key.id(), parent=conf.key).delete()
+                stats.enqueue(stats.registration_deltas(conf, -1), transactional=True)
+                taskqueue.add(params={'websafeConferenceKey': wsck},
+                              url='/tasks/promote_waitlist',
+                              transactional=True)
+                if prof.calendarToken:
+                    ical.queue_update(prof.key.id(), wsck, transactional=True)
                 retval = True
             else:
                 retval = False
@@ -543,6 +944,9 @@ class ConferenceApi(remote.Service):
         # write things back to the datastore & return
         prof.put()
         conf.put()
+        if retval:
+            # the feed shows seats available
+            feed.schedule_render(transactional=True)
         return BooleanMessage(data=retval)
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
@@ -553,7 +957,7 @@ class ConferenceApi(remote.Service):
         """Get list of conferences that user has registered for."""
         prof = self._get_profile_from_user() # get user Profile
         conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
+        conferences = [conf for conf in archive.get_multi(conf_keys) if conf]
 
         # get organizers
         organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
@@ -569,63 +973,119 @@ class ConferenceApi(remote.Service):
                                       for conf in conferences]
         )
 
-    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+    @endpoints.method(CONF_REGISTER_REQUEST, BooleanMessage,
                       path='conference/{websafeConferenceKey}',
                       http_method='POST',
                       name='registerForConference')
+    @rate_limited('registerForConference')
+    @idempotent('registerForConference', BooleanMessage)
     def register_for_conference(self, request):
         """Register user for selected conference."""
-        return self._conference_registration(request)
+        retval = self._conference_registration(request)
+        self._clear_conference_detail(request.websafeConferenceKey)
+        return retval
 
-    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+    @endpoints.method(CONF_REGISTER_REQUEST, BooleanMessage,
                       path='conference/{websafeConferenceKey}',
                       http_method='DELETE',
                       name='unregisterFromConference')
+    @rate_limited('unregisterFromConference')
+    @idempotent('unregisterFromConference', BooleanMessage)
     def unregister_from_conference(self, request):
         """Unregister user for selected conference."""
-        return self._conference_registration(request, reg=False)
+        retval = self._conference_registration(request, reg=False)
+        self._clear_conference_detail(request.websafeConferenceKey)
+        return retval
 
 
-# - - - Announcements - - - - - - - - - - - - - - - - - - - -
+# - - - Waitlist - - - - - - - - - - - - - - - - - - - - - -
 
     @staticmethod
-    def _cache_announcement():
-        """Create Announcement & assign to memcache; used by
-        memcache cron job & putAnnouncement().
-        """
-        confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
-            Conference.seatsAvailable > 0)
-        ).fetch(projection=[Conference.name])
-
-        if confs:
-            # If there are almost sold out conferences,
-            # format announcement and set it in memcache
-            announcement = '%s %s' % (
-                'Last chance to attend! The following conferences '
-                'are nearly sold out:',
-                ', '.join(conf.name for conf in confs))
-            memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
-        else:
-            # If there are no sold out conferences,
-            # delete the memcache announcements entry
-            announcement = ""
-            memcache.delete(MEMCACHE_ANNOUNCEMENTS_KEY)
+    def _has_waitlist(c_key):
+        """Return whether anyone is on a conference's waitlist."""
+        return WaitlistEntry.query(ancestor=c_key).get(keys_only=True) is not None
+
+    @ndb.transactional(xg=True)
+    def _waitlist(self, request, join=True):
+        """Join or leave the waitlist of a sold out conference."""
+        prof = self._get_profile_from_user()  # get user Profile
+
+        wsck = request.websafeConferenceKey
+        conf = _get_conference(wsck)
+
+        w_key = ndb.Key(WaitlistEntry, prof.key.id(), parent=conf.key)
+        entry = w_key.get()
+
+        # join
+        if join:
+            if wsck in prof.conferenceKeysToAttend:
+                raise ConflictException(
+                    "You have already registered for this conference")
+            if entry:
+                raise ConflictException(
+                    "You are already on the waitlist for this conference")
+            if conf.seatsAvailable > 0 and not self._has_waitlist(conf.key):
+                raise ConflictException(
+                    "There are seats available; register instead.")
+            WaitlistEntry(key=w_key).put()
+            return BooleanMessage(data=True)
+
+        # leave
+        if entry:
+            w_key.delete()
+        return BooleanMessage(data=bool(entry))
+
+    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+                      path='conference/{websafeConferenceKey}/waitlist',
+                      http_method='POST',
+                      name='joinWaitlist')
+    def join_waitlist(self, request):
+        """Join the waitlist of a sold out conference."""
+        return self._waitlist(request)
+
+    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+                      path='conference/{websafeConferenceKey}/waitlist',
+                      http_method='DELETE',
+                      name='leaveWaitlist')
+    def leave_waitlist(self, request):
+        """Leave the waitlist of a conference."""
+        return self._waitlist(request, join=False)
+
+    @endpoints.method(CONF_GET_REQUEST, WaitlistPositionForm,
+                      path='conference/{websafeConferenceKey}/waitlist',
+                      http_method='GET',
+                      name='getWaitlistPosition')
+    def get_waitlist_position(self, request):
+        """Return the current user's position (1 = next) on the waitlist."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+
+        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
+        conf, entry = ndb.get_multi([c_key, ndb.Key(WaitlistEntry, user_id, parent=c_key)])
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % request.websafeConferenceKey)
+        if not entry:
+            raise endpoints.NotFoundException(
+                'You are not on the waitlist for this conference')
+
+        ahead = WaitlistEntry.query(ancestor=c_key).filter(
+            WaitlistEntry.created < entry.created).count()
+        return WaitlistPositionForm(position=ahead + 1,
+                                    seatsAvailable=conf.seatsAvailable)
 
-        return announcement
+
+# - - - Announcements - - - - - - - - - - - - - - - - - - - -
 
     @endpoints.method(message_types.VoidMessage, StringMessage,
                       path='conference/announcement/get',
                       http_method='GET',
                       name='getAnnouncement')
     def get_announcement(self, request):
-        """Return Announcement from memcache."""
-        get_announcement = memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY)
-        if get_announcement:
-            announcement = get_announcement
-        else:
-            announcement = ""
-        return StringMessage(data=announcement)
+        """Return Announcement from cache."""
+        return StringMessage(data=announcements.ANNOUNCEMENT.get())
 
 
 # - - - Sessions - - - - - - - - - - - - - - - - - - - -
@@ -640,7 +1100,9 @@ class ConferenceApi(remote.Service):
                 else:
                     setattr(form, field.name, getattr(session, field.name))
             elif field.name == "websafeKey":
-                setattr(form, field.name, session.key.urlsafe())
+                setattr(form, field.name, archive.live_key(session.key).urlsafe())
+        if isinstance(session, ArchivedSession):
+            form.archived = True
         form.check_initialized()
         return form
 
@@ -651,8 +1113,8 @@ class ConferenceApi(remote.Service):
             raise endpoints.UnauthorizedException('Authorization required')
         user_id = getUserId(user)
 
-        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
-        conference = c_key.get()
+        conference = _get_conference(request.websafeConferenceKey)
+        c_key = conference.key
 
         # Do checks
         if user_id != conference.organizerUserId:
@@ -670,11 +1132,11 @@ class ConferenceApi(remote.Service):
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
         del data['websafeConferenceKey']
         del data['websafeKey']
+        del data['idempotencyKey']
+        del data['version']
 
-        s_id = Session.allocate_ids(size=1, parent=c_key)
-        s_key = ndb.Key(Session, s_id[0], parent=c_key)
-
-        data['key'] = s_key
+        # the id is assigned by the put in _put_session
+        data['parent'] = c_key
 
         if data['date']:
             data['date'] = datetime.strptime(data['date'][:10], '%Y-%m-%d').date()
@@ -683,20 +1145,20 @@ class ConferenceApi(remote.Service):
             data['startTime'] = datetime.strptime(data['startTime'], '%H:%M').time()
 
         # create Session
-        session = Session(**data).put()
-
-        # get the newly created Session so we can pass back the websafeKey
-        new_session = session.get()
+        new_session = Session(**data)
+        self._put_session(new_session)
+        stats.enqueue(stats.session_deltas(new_session))
+        notifications.notify_attendees(
+            conference, 'New session at %s' % conference.name,
+            'Hi, a session was added to %s you registered for:\r\n\r\n'
+            '%s on %s at %s' % (conference.name, new_session.name,
+                                new_session.date, new_session.startTime))
 
         if data['speaker']:
             try:
                 speaker = Speaker.query(Speaker.name == data['speaker']).fetch()[0]
             except:
-                speaker_id = Speaker.allocate_ids(size=1, parent=s_key)
-                speaker_key = ndb.Key(Speaker, speaker_id[0], parent=s_key)
-                new_speaker = Speaker(name=data['speaker'], key=speaker_key)
-                speaker_key = new_speaker.put()
-                speaker = speaker_key.get()
+                speaker = Speaker(name=data['speaker'], parent=new_session.key)
 
             speaker.sessions.append(new_session.name)
             speaker.put()
@@ -706,13 +1168,24 @@ class ConferenceApi(remote.Service):
 
         return self._copy_session_to_form(new_session)
 
+    @staticmethod
+    @ndb.transactional()
+    def _put_session(session):
+        """Put a session, bumping its conference's sessionsVersion."""
+        conf = session.key.parent().get()
+        conf.sessionsVersion += 1
+        ndb.put_multi([session, conf])
+
     @endpoints.method(SESSION_POST_REQUEST, SessionForm,
                       path='sessions/create',
                       http_method='POST',
                       name='createSession')
+    @idempotent('createSession', SessionForm)
     def create_session(self, request):
         """Create a session"""
-        return self._create_session_object(request)
+        session_form = self._create_session_object(request)
+        self._clear_conference_detail(request.websafeConferenceKey)
+        return session_form
 
     def _get_sessions(self, websafeConferenceKey):
         """Return formatted query from the submitted filters."""
@@ -733,13 +1206,46 @@ class ConferenceApi(remote.Service):
                       http_method='GET',
                       name='getConferenceSessions')
     def get_conference_sessions(self, request):
-        """Get sessions."""
-        sessions = self._get_sessions(request.websafeConferenceKey)
+        """Get sessions, or just notModified if the conference's sessions
+        are still at the client supplied version."""
+        wsck = request.websafeConferenceKey
+        version = self._sessions_version(wsck)
+        if request.version and request.version == version:
+            return SessionForms(version=version, notModified=True)
+
+        sessions = self._get_sessions(wsck)
 
         return SessionForms(
-            items=[self._copy_session_to_form(session) for session in sessions]
+            items=[self._copy_session_to_form(session) for session in sessions],
+            version=version
         )
 
+    @endpoints.method(SESSION_GET_REQUEST, SessionColumns,
+                      path='sessions/compact',
+                      http_method='GET',
+                      name='getConferenceSessionsCompact')
+    def get_conference_sessions_compact(self, request):
+        """Get sessions in compact columnar form."""
+        wsck = request.websafeConferenceKey
+        version = self._sessions_version(wsck)
+        if request.version and request.version == version:
+            return SessionColumns(version=version, notModified=True)
+
+        sessions = self._get_sessions(wsck).fetch()
+        return SessionColumns(version=version, **compact.session_columns(sessions))
+
+    @staticmethod
+    def _sessions_version(wsck):
+        """Return the version of a conference's set of sessions."""
+        version = memcache.get(MEMCACHE_SESSIONS_VERSION_KEY % wsck)
+        if version is None:
+            conf = ndb.Key(urlsafe=wsck).get()
+            if not conf:
+                raise endpoints.NotFoundException(
+                    'No conference found with key: %s' % wsck)
+            version = conf.sessionsVersion
+        return version
+
     @endpoints.method(SESSION_GET_REQUEST_BY_TYPE, SessionForms,
                       path='session/type',
                       http_method='GET',
@@ -758,6 +1264,10 @@ class ConferenceApi(remote.Service):
     def get_sessions_by_speaker(self, request):
         """Get sessions by speaker."""
         sessions = self._get_sessions_by_speaker(request.speaker)
+        if request.includeArchived:
+            sessions = sessions.fetch()
+            sessions.extend(ArchivedSession.query(ArchivedSession.speaker == request.speaker))
+            sessions.sort(key=lambda session: (session.date, session.startTime))
         return SessionForms(
             items=[self._copy_session_to_form(session) for session in sessions]
         )
@@ -768,7 +1278,9 @@ class ConferenceApi(remote.Service):
 
         # check if session exists given SessionKey
         sk = request.SessionKey
-        session = ndb.Key(urlsafe=sk).get()
+        # Session keys only; wishlisted sessions may have been archived since
+        s_key = ndb.Key(urlsafe=sk)
+        session = archive.get_multi([s_key])[0] if s_key.kind() == 'Session' else None
         if not session:
             raise endpoints.NotFoundException(
                 'No session found with key: %s' % sk)
@@ -778,6 +1290,14 @@ class ConferenceApi(remote.Service):
             if sk in prof.sessionsInWishlist:
                 raise ConflictException(
                     "You have already registered for this session")
+            if request.checkConflicts:
+                index = IntervalIndex(self._schedule_intervals(prof)['session'])
+                clashes = index.overlapping(_epoch_minutes(session.date, session.startTime),
+                                            _epoch_minutes(session.endDateTime))
+                if clashes:
+                    raise ConflictException(
+                        "This session overlaps with: %s" %
+                        ', '.join(name for _, _, (_, name) in clashes))
             # add to wishlist
             prof.sessionsInWishlist.append(sk)
             retval = True
@@ -793,6 +1313,8 @@ class ConferenceApi(remote.Service):
 
         # write things back to the datastore & return
         prof.put()
+        if retval and prof.calendarToken:
+            ical.queue_update(prof.key.id(), sk)
         return BooleanMessage(data=retval)
 
     @endpoints.method(WISHLIST_GET_REQUEST, BooleanMessage,
@@ -819,18 +1341,93 @@ class ConferenceApi(remote.Service):
         """Return sessions in users wishlist."""
         prof = self._get_profile_from_user() # get user Profile
         sessions_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.sessionsInWishlist]
-        sessions = ndb.get_multi(sessions_keys)
+        sessions = [session for session in archive.get_multi(sessions_keys) if session]
 
         # return set of ConferenceForm objects per Conference
         return SessionForms(items=[self._copy_session_to_form(session) for session in sessions])
 
-    @endpoints.method(message_types.VoidMessage, SessionForms,
+
+# - - - Schedule conflicts - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _schedule_intervals(prof):
+        """Return the user's wishlist sessions and registered conferences as
+        {'session': [...], 'conference': [...]} lists of
+        (start, end, (websafeKey, name)) in epoch minutes.
+
+        Cached in memcache, stamped with the profile's wishlist and
+        registrations and with the version stamps of the registered
+        conferences, so a change to any of them invalidates the entry on
+        the next read; changes to other conferences do not.
+        """
+        version_keys = [MEMCACHE_CONFERENCE_VERSION_KEY % wsck
+                        for wsck in prof.conferenceKeysToAttend]
+        versions = memcache.get_multi(version_keys)
+        stamp = hashlib.md5('|'.join(
+            prof.sessionsInWishlist + ['#'] +
+            ['%s=%s' % (wsck, versions.get(key))
+             for wsck, key in zip(prof.conferenceKeysToAttend, version_keys)])).hexdigest()
+        cache_key = MEMCACHE_SCHEDULE_KEY % prof.key.id()
+        cached = memcache.get(cache_key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        keys = [ndb.Key(urlsafe=wsk)
+                for wsk in prof.sessionsInWishlist + prof.conferenceKeysToAttend]
+        entities = archive.get_multi(keys)
+        sessions = entities[:len(prof.sessionsInWishlist)]
+        confs = entities[len(prof.sessionsInWishlist):]
+
+        schedule = {
+            'session': [(_epoch_minutes(s.date, s.startTime),
+                         _epoch_minutes(s.endDateTime),
+                         (archive.live_key(s.key).urlsafe(), s.name))
+                        for s in sessions if s],
+            # endDate is the last day of the conference
+            'conference': [(_epoch_minutes(c.startDate),
+                            _epoch_minutes(c.endDate + timedelta(days=1)),
+                            (archive.live_key(c.key).urlsafe(), c.name))
+                           for c in confs if c and c.startDate and c.endDate],
+        }
+        memcache.set(cache_key, (stamp, schedule))
+        return schedule
+
+    @endpoints.method(message_types.VoidMessage, ScheduleConflictForms,
+                      path='schedule/conflicts',
+                      http_method='GET',
+                      name='getMyScheduleConflicts')
+    def get_my_schedule_conflicts(self, request):
+        """Return overlapping wishlist sessions and overlapping registered
+        conferences of the current user."""
+        prof = self._get_profile_from_user()  # get user Profile
+        schedule = self._schedule_intervals(prof)
+
+        items = []
+        for kind in ('session', 'conference'):
+            for first, second in IntervalIndex(schedule[kind]).overlaps():
+                items.append(ScheduleConflictForm(
+                    kind=kind,
+                    websafeKey=first[2][0],
+                    name=first[2][1],
+                    otherWebsafeKey=second[2][0],
+                    otherName=second[2][1],
+                    overlapStart=_format_minutes(second[0]),
+                    overlapEnd=_format_minutes(min(first[1], second[1])),
+                ))
+        return ScheduleConflictForms(items=items)
+
+    @endpoints.method(FINISHED_SESSIONS_GET_REQUEST, SessionForms,
                       path='finishedSessions',
                       http_method='GET',
                       name='getFinishedSessions')
     def get_finished_sessions(self, request):
         """Return sessions that have already finished"""
-        sessions = Session.query(Session.endDateTime < datetime.now())
+        now = datetime.now()
+        sessions = Session.query(Session.endDateTime < now)
+        if request.includeArchived:
+            sessions = sessions.fetch()
+            sessions.extend(ArchivedSession.query(ArchivedSession.endDateTime < now))
+            sessions.sort(key=lambda session: session.endDateTime)
         return SessionForms(items=[self._copy_session_to_form(session) for session in sessions])
 
     @endpoints.method(message_types.VoidMessage, SessionForms,
@@ -844,31 +1441,59 @@ class ConferenceApi(remote.Service):
         return SessionForms(items=[self._copy_session_to_form(session) for session in sessions])
 
 
-# - - - Featured Speakers - - - - - - - - - - - - - - - - - - - -
+# - - - Recommendations - - - - - - - - - - - - - - - - - - - -
 
-    @staticmethod
-    def _cache_featured_speaker(speaker_key):
-        """Create featured speaker & assign to memcache; used by
-        memcache cron job.
-        """
-        speaker = ndb.Key(urlsafe=speaker_key).get()
+    @endpoints.method(message_types.VoidMessage, RecommendationForms,
+                      path='recommendations',
+                      http_method='GET',
+                      name='getRecommendations')
+    def get_recommendations(self, request):
+        """Return the sessions and conferences recommended to the current
+        user by the last recommender run."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        rec = ndb.Key(Recommendation, getUserId(user)).get()
+        if not rec:
+            return RecommendationForms()
 
-        if speaker:
-            if len(speaker.sessions) >= 2:
-                featured = '%s %s %s %s' % (
-                    'Featured Speaker:',
-                    speaker.name, '| Sessions:',
-                    ', '.join(speaker.sessions))
-                memcache.set(MEMCACHE_FEATURED_SPEAKERS_KEY, featured)
+        def to_forms(items):
+            return [RecommendationForm(websafeKey=item.websafeKey,
+                                       name=item.name,
+                                       score=item.score) for item in items]
+        return RecommendationForms(sessions=to_forms(rec.sessions),
+                                   conferences=to_forms(rec.conferences),
+                                   updated=str(rec.updated))
+
+
+# - - - Calendar feed - - - - - - - - - - - - - - - - - - - - -
+
+    @endpoints.method(CALENDAR_POST_REQUEST, StringMessage,
+                      path='calendar',
+                      http_method='POST',
+                      name='getCalendarFeedUrl')
+    def get_calendar_feed_url(self, request):
+        """Return the URL of the user's iCalendar feed, creating the feed
+        on first use; with reset, move the feed to a new URL."""
+        prof = self._get_profile_from_user()
+        token = prof.calendarToken
+        if not token or request.reset:
+            token = ical.create(prof)
+        return StringMessage(data=ical.feed_url(token))
+
+
+# - - - Featured Speakers - - - - - - - - - - - - - - - - - - - -
 
     @endpoints.method(message_types.VoidMessage, StringMessage,
                       path='conference/featured_speaker/get',
                       http_method='GET',
                       name='getFeaturedSpeaker')
-    def get_announcement(self, request):
-        """Return Announcement from memcache."""
-        get_speaker = memcache.get(MEMCACHE_FEATURED_SPEAKERS_KEY)
-        return StringMessage(data=get_speaker or '')
+    def get_featured_speaker(self, request):
+        """Return Featured Speaker from cache."""
+        return StringMessage(data=announcements.FEATURED_SPEAKER.get())
+
 
+api = ProfilingMiddleware(endpoints.api_server([ConferenceApi]))  # register API
+index_audit.install_from_env()
 
-api = endpoints.api_server([ConferenceApi])  # register API
+logging.info('conference loaded in %.1f ms', 1000 * (time.time() - _LOAD_START))
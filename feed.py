@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+"""
+feed.py -- Udacity conference server-side Python App Engine
+    pre-rendered public conference feed
+
+$Id$
+
+The landing page lists conferences without filters, or filtered on one
+city or topic, for every visitor. Rather than run that query through the
+API each time, a task renders the feeds to JSON once per batch of
+conference writes (see schedule_render, which the API's write paths
+call) and main.py serves the stored pages as they are. Feeds are
+
+    all             every conference
+    city:<city>     the FEED_FILTERS cities with most conferences
+    topic:<topic>   the FEED_FILTERS topics with most conferences
+
+each in pages of FEED_PAGE_SIZE conferences ordered by name, up to
+FEED_PAGES pages. A page is the ConferenceColumns JSON of the compact
+API methods (see compact.py) plus `page` and `more`; clients wanting
+conferences past the last rendered page query the API instead.
+
+Pages are kept in memcache and in FeedPage entities, so that an evicted
+page costs one datastore get rather than a re-render.
+
+"""
+
+import hashlib
+import json
+from datetime import datetime
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+import compact
+import stats
+from models import Conference
+from models import FeedPage
+from models import Profile
+
+MEMCACHE_FEED_PAGE_PREFIX = "FEED_PAGE_"
+MEMCACHE_FEED_PENDING_KEY = "FEED_RENDER_PENDING"
+RENDER_URL = '/tasks/render_feed'
+# conference writes within this many seconds share one feed re-render
+FEED_DEBOUNCE_SECONDS = 30
+# the pending marker expires this long before its task runs, so that
+# writes the task might not see queue another render
+FEED_PENDING_SECONDS = FEED_DEBOUNCE_SECONDS - 5
+FEED_PAGE_SIZE = 100
+FEED_PAGES = 5
+FEED_FILTERS = 10
+
+
+def _mark_pending():
+    memcache.set(MEMCACHE_FEED_PENDING_KEY, 1, time=FEED_PENDING_SECONDS)
+
+
+def schedule_render(transactional=False):
+    """Queue a re-render of the feeds, unless one is already pending.
+
+    In a transaction pass transactional=True: the task is queued with
+    the transaction, and marked pending only once it commits.
+    """
+    if transactional:
+        if memcache.get(MEMCACHE_FEED_PENDING_KEY) is None:
+            taskqueue.add(url=RENDER_URL, countdown=FEED_DEBOUNCE_SECONDS,
+                          transactional=True)
+            ndb.get_context().call_on_commit(_mark_pending)
+    elif memcache.add(MEMCACHE_FEED_PENDING_KEY, 1, time=FEED_PENDING_SECONDS):
+        taskqueue.add(url=RENDER_URL, countdown=FEED_DEBOUNCE_SECONDS)
+
+
+def page_id(feed, page):
+    """Return the FeedPage id of a page of a feed."""
+    return '%s/%d' % (feed, page)
+
+
+def get_page(feed, page):
+    """Return {'body', 'etag', 'updated'} of a rendered page, or None."""
+    pid = page_id(feed, page)
+    cached = memcache.get(pid, key_prefix=MEMCACHE_FEED_PAGE_PREFIX)
+    if cached is None:
+        stored = FeedPage.get_by_id(pid)
+        if not stored:
+            return None
+        cached = _cached(stored)
+        memcache.set(pid, cached, key_prefix=MEMCACHE_FEED_PAGE_PREFIX)
+    return cached
+
+
+def _cached(page):
+    return {'body': page.body, 'etag': page.etag, 'updated': page.updated}
+
+
+def _common_filters():
+    """Return the feeds of the cities & topics with most conferences."""
+    feeds = []
+    for prefix in ('city', 'topic'):
+        counts = stats.get_prefixed(prefix + ':')
+        values = [(count, name[len(prefix) + 1:-len(':conferences')])
+                  for name, count in counts.items()
+                  if name.endswith(':conferences') and count > 0]
+        values.sort(reverse=True)
+        feeds.extend('%s:%s' % (prefix, value) for _, value in values[:FEED_FILTERS])
+    return feeds
+
+
+def _feed_query(feed):
+    q = Conference.query()
+    if feed.startswith('city:'):
+        q = q.filter(Conference.city == feed[len('city:'):])
+    elif feed.startswith('topic:'):
+        q = q.filter(Conference.topics == feed[len('topic:'):])
+    return q.order(Conference.name)
+
+
+def _render_feed(feed):
+    """Return {page id: body} of the pages of one feed."""
+    limit = FEED_PAGES * FEED_PAGE_SIZE
+    conferences = _feed_query(feed).fetch(limit + 1)
+    more = len(conferences) > limit
+    del conferences[limit:]
+
+    organisers = list(set(ndb.Key(Profile, conf.organizerUserId)
+                          for conf in conferences))
+    names = dict((key.id(), getattr(prof, 'displayName', None))
+                 for key, prof in zip(organisers, ndb.get_multi(organisers)))
+
+    pages = {}
+    # an empty feed still has its (empty) first page
+    n_pages = max(1, (len(conferences) + FEED_PAGE_SIZE - 1) // FEED_PAGE_SIZE)
+    for page in range(n_pages):
+        chunk = conferences[page * FEED_PAGE_SIZE:(page + 1) * FEED_PAGE_SIZE]
+        body = compact.conference_columns(chunk, names)
+        body['page'] = page
+        body['more'] = more or (page + 1) * FEED_PAGE_SIZE < len(conferences)
+        pages[page_id(feed, page)] = json.dumps(body, separators=(',', ':'))
+    return pages
+
+
+def render():
+    """Re-render every feed; store the pages that changed and drop the
+    pages of feeds that shrank or are no longer common."""
+    pages = {}
+    for feed in ['all'] + _common_filters():
+        pages.update(_render_feed(feed))
+
+    stored = dict((page.key.id(), page) for page in FeedPage.query())
+    now = datetime.utcnow()
+    changed = []
+    for pid, body in pages.items():
+        etag = hashlib.md5(body.encode('utf-8')).hexdigest()
+        page = stored.get(pid)
+        if page and page.etag == etag:
+            continue
+        changed.append(FeedPage(id=pid, body=body, etag=etag, updated=now))
+    removed = [page.key for pid, page in stored.items() if pid not in pages]
+
+    ndb.put_multi(changed)
+    ndb.delete_multi(removed)
+    memcache.set_multi(dict((page.key.id(), _cached(page)) for page in changed),
+                       key_prefix=MEMCACHE_FEED_PAGE_PREFIX)
+    memcache.delete_multi([key.id() for key in removed],
+                          key_prefix=MEMCACHE_FEED_PAGE_PREFIX)
+    return len(changed), len(removed)
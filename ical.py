@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+"""
+ical.py -- Udacity conference server-side Python App Engine
+    per-user iCalendar feed of registered conferences & wishlisted sessions
+
+$Id$
+
+Calendar apps poll the feed URL often, so the feed is never built on a
+poll. Each user's CalendarFeed holds one rendered VEVENT per conference
+and session; registration, unregistration, waitlist promotion and the
+wishlist queue an update task for the one item they change, and updating
+a conference queues a refresh of its event in its attendees' feeds. A
+poll reads the rendered feed from memcache, or joins the stored events
+after an eviction.
+
+The feed is keyed by a random token that is the only credential of its
+URL (/calendar/<token>.ics); getCalendarFeedUrl can replace it with a
+new one.
+
+"""
+
+import base64
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+from google.appengine.api import app_identity
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+import archive
+from models import Attendance
+from models import CalendarFeed
+from models import Profile
+
+MEMCACHE_CALENDAR_KEY = "CALENDAR_%s"
+CACHE_SECONDS = 3600
+# seconds a changed feed's memcache entry refuses re-adds, outlasting
+# polls that read the feed before the change committed
+CACHE_LOCK_SECONDS = 10
+UPDATE_URL = '/tasks/update_calendar'
+REFRESH_URL = '/tasks/refresh_calendars'
+REFRESH_BATCH = 100
+TIME_BUDGET_SECONDS = 60
+# content lines longer than this many octets are folded (RFC 5545 3.1)
+MAX_LINE_OCTETS = 75
+
+# - - - Rendering - - - - - - - - - - - - - - - - - - - - - -
+
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """Fold a content line into lines of at most MAX_LINE_OCTETS."""
+    lines = []
+    current, size = u'', 0
+    for char in line:
+        octets = len(char.encode('utf-8'))
+        if size + octets > MAX_LINE_OCTETS:
+            lines.append(current)
+            # continuation lines start with a space
+            current, size = u' ', 1
+        current += char
+        size += octets
+    lines.append(current)
+    return u'\r\n'.join(lines)
+
+
+def _event(websafe_key, fields):
+    lines = [u'BEGIN:VEVENT',
+             u'UID:%s@%s' % (websafe_key, app_identity.get_application_id()),
+             u'DTSTAMP:%s' % datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')]
+    lines.extend(u'%s:%s' % (name, value) for name, value in fields if value)
+    lines.append(u'END:VEVENT')
+    return u''.join(_fold(line) + u'\r\n' for line in lines)
+
+
+def conference_event(conf):
+    """Return the VEVENT of a Conference, an all-day event over its
+    dates, or None if it has no start date."""
+    if not conf.startDate:
+        return None
+    # DTEND of an all-day event is exclusive
+    end = (conf.endDate or conf.startDate) + timedelta(days=1)
+    return _event(conf.key.urlsafe(), [
+        (u'DTSTART;VALUE=DATE', conf.startDate.strftime('%Y%m%d')),
+        (u'DTEND;VALUE=DATE', end.strftime('%Y%m%d')),
+        (u'SUMMARY', _escape(conf.name)),
+        (u'LOCATION', _escape(conf.city or u'')),
+        (u'DESCRIPTION', _escape(conf.description or u'')),
+    ])
+
+
+def session_event(session, conf):
+    """Return the VEVENT of a Session of conf. Times are floating: the
+    app stores them in the conference's local time, without zone."""
+    start = datetime.combine(session.date, session.startTime)
+    end = start + timedelta(minutes=session.durationMinutes)
+    details = [session.parentConferenceName or getattr(conf, 'name', None),
+               session.speaker and u'Speaker: %s' % session.speaker,
+               session.typeOfSession, session.highlights]
+    return _event(session.key.urlsafe(), [
+        (u'DTSTART', start.strftime('%Y%m%dT%H%M%S')),
+        (u'DTEND', end.strftime('%Y%m%dT%H%M%S')),
+        (u'SUMMARY', _escape(session.name)),
+        (u'LOCATION', _escape(getattr(conf, 'city', None) or u'')),
+        (u'DESCRIPTION', _escape(u'\n'.join(d for d in details if d))),
+    ])
+
+
+def _item_events(websafe_keys):
+    """Return {websafe key: VEVENT} of the conferences and sessions
+    that still exist, archived or not."""
+    keys = [ndb.Key(urlsafe=wsk) for wsk in websafe_keys]
+    items = archive.get_multi(keys)
+    conf_keys = list(set(key.parent() for key, item in zip(keys, items)
+                         if item and key.kind() == 'Session'))
+    confs = dict(zip(conf_keys, archive.get_multi(conf_keys)))
+
+    events = {}
+    for wsk, key, item in zip(websafe_keys, keys, items):
+        if not item:
+            continue
+        if key.kind() == 'Session':
+            event = session_event(item, confs[key.parent()])
+        else:
+            event = conference_event(item)
+        if event:
+            events[wsk] = event
+    return events
+
+
+def _body(events):
+    return u''.join(
+        [u'BEGIN:VCALENDAR\r\n',
+         u'VERSION:2.0\r\n',
+         u'PRODID:-//Conference Central//EN\r\n',
+         u'CALSCALE:GREGORIAN\r\n',
+         u'X-WR-CALNAME:Conference Central\r\n'] +
+        [events[key] for key in sorted(events)] +
+        [u'END:VCALENDAR\r\n'])
+
+# - - - Serving - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def feed_url(token):
+    """Return the absolute URL of a calendar feed."""
+    dev = os.environ.get('SERVER_SOFTWARE', '').startswith('Development')
+    return '%s://%s/calendar/%s.ics' % (
+        'http' if dev else 'https',
+        app_identity.get_default_version_hostname(), token)
+
+
+def _cache(feed):
+    cached = {'body': _body(feed.events), 'etag': feed.etag,
+              'updated': feed.updated}
+    # add, not set: fails while a change holds the entry locked (see _store)
+    memcache.add(MEMCACHE_CALENDAR_KEY % feed.key.id(), cached,
+                 time=CACHE_SECONDS)
+    return cached
+
+
+def get(token):
+    """Return {'body', 'etag', 'updated'} of a feed, or None."""
+    cached = memcache.get(MEMCACHE_CALENDAR_KEY % token)
+    if cached is None:
+        feed = CalendarFeed.get_by_id(token)
+        if not feed:
+            return None
+        cached = _cache(feed)
+    return cached
+
+# - - - Maintenance - - - - - - - - - - - - - - - - - - - - -
+
+
+def _touch(feed):
+    feed.etag = hashlib.md5(_body(feed.events).encode('utf-8')).hexdigest()
+    feed.updated = datetime.utcnow()
+
+
+def create(prof):
+    """Give prof a new feed of all its registrations and wishlist,
+    replacing its previous feed (and URL) if any; return the token."""
+    items = prof.conferenceKeysToAttend + prof.sessionsInWishlist
+    feed = CalendarFeed(id=base64.urlsafe_b64encode(os.urandom(18)),
+                        userId=prof.key.id(), events=_item_events(items))
+    _touch(feed)
+    old_token, current = _install(prof.key, feed)
+    if old_token:
+        memcache.delete(MEMCACHE_CALENDAR_KEY % old_token)
+    # registrations & wishlist changes made while the events were
+    # loaded updated the old feed, or none
+    for websafe_key in set(items) ^ set(current):
+        queue_update(prof.key.id(), websafe_key)
+    return feed.key.id()
+
+
+@ndb.transactional(xg=True)
+def _install(p_key, feed):
+    prof = p_key.get()
+    old_token = prof.calendarToken
+    prof.calendarToken = feed.key.id()
+    ndb.put_multi([prof, feed])
+    if old_token:
+        ndb.Key(CalendarFeed, old_token).delete()
+    return old_token, prof.conferenceKeysToAttend + prof.sessionsInWishlist
+
+
+def queue_update(user_id, websafe_key, transactional=False):
+    """Queue bringing a conference or session's event in a user's feed
+    in line with their registrations and wishlist."""
+    taskqueue.add(url=UPDATE_URL,
+                  params={'userId': user_id, 'websafeKey': websafe_key},
+                  transactional=transactional)
+
+
+def queue_refresh(conf, transactional=False):
+    """Queue re-rendering a conference's event in its attendees' feeds."""
+    taskqueue.add(url=REFRESH_URL,
+                  params={'websafeConferenceKey': conf.key.urlsafe()},
+                  transactional=transactional)
+
+
+@ndb.transactional(xg=True)
+def _apply(user_id, websafe_key, event):
+    """Put or drop an item's event in a user's feed, going by the user's
+    registrations and wishlist as of the commit; return the feed's
+    token if the feed changed."""
+    prof = Profile.get_by_id(user_id)
+    if not prof or not prof.calendarToken:
+        return None
+    feed = CalendarFeed.get_by_id(prof.calendarToken)
+    if not feed:
+        return None
+    listed = (websafe_key in prof.conferenceKeysToAttend or
+              websafe_key in prof.sessionsInWishlist)
+    if listed and event:
+        feed.events[websafe_key] = event
+    elif websafe_key in feed.events:
+        del feed.events[websafe_key]
+    else:
+        return None
+    _touch(feed)
+    feed.put()
+    return feed.key.id()
+
+
+def _store(user_id, websafe_key, event):
+    token = _apply(user_id, websafe_key, event)
+    if token:
+        # the next poll caches the committed feed
+        memcache.delete(MEMCACHE_CALENDAR_KEY % token, seconds=CACHE_LOCK_SECONDS)
+
+
+def update(user_id, websafe_key):
+    """Add, re-render or remove an item's event in a user's feed. The
+    profile is read in the transaction that writes the feed, so that
+    tasks of the same item can run in any order."""
+    _store(user_id, websafe_key, _item_events([websafe_key]).get(websafe_key))
+
+
+def refresh(wsck, cursor=None):
+    """Re-render a conference's event in the feeds of its attendees
+    after cursor until the time budget is spent, then chain a task."""
+    deadline = time.time() + TIME_BUDGET_SECONDS
+    conf_key = ndb.Key(urlsafe=wsck)
+    conf = conf_key.get()
+    if not conf:
+        return
+    event = conference_event(conf)
+    q = Attendance.query(ancestor=conf_key)
+    start = Cursor(urlsafe=cursor) if cursor else None
+    more = True
+    while more and time.time() < deadline:
+        keys, start, more = q.fetch_page(
+            REFRESH_BATCH, start_cursor=start, keys_only=True)
+        more = more and start is not None
+        # skip users without a feed; _store re-reads the rest
+        profiles = ndb.get_multi([ndb.Key(Profile, key.id()) for key in keys])
+        for prof in profiles:
+            if prof and prof.calendarToken:
+                _store(prof.key.id(), wsck, event)
+    if more:
+        taskqueue.add(url=REFRESH_URL,
+                      params={'websafeConferenceKey': wsck,
+                              'cursor': start.urlsafe()})
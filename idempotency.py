@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+idempotency.py -- Udacity conference server-side Python App Engine
+    replay protection for mutating API methods via idempotency keys
+
+$Id$
+
+"""
+
+import functools
+from datetime import datetime, timedelta
+
+import endpoints
+from protorpc import protojson
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from models import ConflictException
+from models import IdempotentResponse
+from utils import getUserId
+
+MEMCACHE_IDEMPOTENCY_KEY = "IDEMPOTENCY_%s"
+IDEMPOTENCY_TTL = 24 * 60 * 60          # seconds a response is replayable
+IN_PROGRESS_TTL = 60                    # seconds a claim blocks replays
+MAX_KEY_LENGTH = 128
+_IN_PROGRESS = '__IN_PROGRESS__'
+
+
+def _load_response(record_id):
+    """Return the stored encoded response, checking memcache first."""
+    stored = memcache.get(MEMCACHE_IDEMPOTENCY_KEY % record_id)
+    if stored is None:
+        record = IdempotentResponse.get_by_id(record_id)
+        cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+        if record and record.created > cutoff:
+            stored = record.response
+    return stored
+
+
+def idempotent(method_name, response_type):
+    """Decorate a ConferenceApi method whose request carries an optional
+    idempotencyKey field.
+
+    The first request with a given key runs normally and its response is
+    stored in memcache and datastore for IDEMPOTENCY_TTL; replays by the
+    same user return that response without running the method again, so
+    no further writes or tasks happen. A replay that arrives while the
+    first request is still running gets a ConflictException.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request):
+            key = getattr(request, 'idempotencyKey', None)
+            user = endpoints.get_current_user()
+            if not key or not user:
+                return func(self, request)
+            if len(key) > MAX_KEY_LENGTH:
+                raise endpoints.BadRequestException(
+                    "'idempotencyKey' must be at most %d characters" % MAX_KEY_LENGTH)
+
+            record_id = '%s:%s:%s' % (getUserId(user), method_name, key)
+            cache_key = MEMCACHE_IDEMPOTENCY_KEY % record_id
+            stored = _load_response(record_id)
+            if stored is None and not memcache.add(cache_key, _IN_PROGRESS,
+                                                   time=IN_PROGRESS_TTL):
+                stored = _IN_PROGRESS
+            if stored == _IN_PROGRESS:
+                raise ConflictException(
+                    'A request with this idempotency key is in progress.')
+            if stored is not None:
+                return protojson.decode_message(response_type, stored)
+
+            try:
+                response = func(self, request)
+            except Exception:
+                # failures are not recorded, so the client may retry
+                memcache.delete(cache_key)
+                raise
+            encoded = protojson.encode_message(response)
+            IdempotentResponse(id=record_id, response=encoded).put()
+            memcache.set(cache_key, encoded, time=IDEMPOTENCY_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired(batch_size=500):
+    """Delete stored responses older than IDEMPOTENCY_TTL; used by cron."""
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+    q = IdempotentResponse.query(IdempotentResponse.created < cutoff)
+    deleted = 0
+    cursor = None
+    more = True
+    while more:
+        keys, cursor, more = q.fetch_page(batch_size, start_cursor=cursor,
+                                          keys_only=True)
+        ndb.delete_multi(keys)
+        deleted += len(keys)
+    return deleted
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+"""
+index_audit.py -- Udacity conference server-side Python App Engine
+    datastore query shape & index audit
+
+$Id$
+
+Recording: run the dev server with its log kept, e.g.
+
+    dev_appserver.py . --env_var INDEX_AUDIT=1 2> /tmp/server.log
+
+and drive the app (the web client, the API explorer or a script). Every
+datastore query and put is logged as one RECORD_MARKER line of JSON:
+the query's shape (kind, ancestor, equality & inequality filter
+properties, sort orders, projection) and the endpoint that issued it,
+and the number of indexed values of each property of every put entity.
+(The dev server's sandbox lets the app write no files, so the records
+go through logging.)
+
+Reporting, no SDK needed:
+
+    python index_audit.py /tmp/server.log [--index index.yaml] [--yaml]
+
+lists each observed query shape with the composite index it needs, the
+index.yaml indexes no observed query uses, the estimated index writes
+per new entity with index.yaml and with the minimal index set, and with
+--yaml prints that minimal set in index.yaml format.
+
+Index requirements follow the datastore's rules: built-in indexes serve
+queries on equality filters only (merged, with or without ancestor) and
+queries on a single property; anything else needs a composite index on
+the equality properties, then the inequality property, then the sort
+orders, then the projected properties. IN and != filters reach the
+datastore already split into equality and inequality queries.
+
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+
+RECORD_MARKER = 'INDEX_AUDIT '
+
+# - - - Recording - - - - - - - - - - - - - - - - - - - - - -
+
+
+def install_from_env():
+    """Start recording if INDEX_AUDIT is set on the dev server."""
+    if (os.environ.get('INDEX_AUDIT') and
+            os.environ.get('SERVER_SOFTWARE', '').startswith('Development')):
+        install()
+
+
+def install():
+    """Log the shape of every datastore query and put."""
+    from google.appengine.api import apiproxy_stub_map
+    from google.appengine.datastore import datastore_pb
+
+    def hook(service, call, request, response):
+        if call == 'RunQuery':
+            _write([_query_record(request, datastore_pb)])
+        elif call == 'Put':
+            _write([_put_record(entity) for entity in request.entity_list()])
+
+    # a no-op when already installed
+    apiproxy_stub_map.apiproxy.GetPreCallHooks().Append(
+        'index_audit', hook, 'datastore_v3')
+
+
+def _write(records):
+    for record in records:
+        logging.info('%s%s', RECORD_MARKER, json.dumps(record))
+
+
+def read_log(lines):
+    """Return the records logged in the lines of a server log."""
+    records = []
+    for line in lines:
+        at = line.find(RECORD_MARKER)
+        if at >= 0:
+            records.append(json.loads(line[at + len(RECORD_MARKER):]))
+    return records
+
+
+def _query_record(query, datastore_pb):
+    eq = set()
+    ineq = None
+    for f in query.filter_list():
+        name = f.property(0).name()
+        if f.op() == datastore_pb.Query_Filter.EQUAL:
+            eq.add(name)
+        else:
+            ineq = name
+    orders = [[o.property(),
+               'desc' if o.direction() == datastore_pb.Query_Order.DESCENDING else 'asc']
+              for o in query.order_list()]
+    return {'type': 'query',
+            'source': os.environ.get('PATH_INFO', ''),
+            'kind': query.kind(),
+            'ancestor': query.has_ancestor(),
+            'eq': sorted(eq),
+            'ineq': ineq,
+            'orders': orders,
+            'projection': list(query.property_name_list())}
+
+
+def _put_record(entity):
+    # property_list() only holds indexed values, one per repeated value
+    return {'type': 'put',
+            'kind': entity.key().path().element_list()[-1].type(),
+            'values': Counter(p.name() for p in entity.property_list())}
+
+# - - - Analysis - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def required_index(shape):
+    """Return the composite index a query shape needs, as
+    (kind, ancestor, ((property, direction), ...)), or None when the
+    built-in indexes serve it."""
+    eq = shape['eq']
+    orders = [tuple(order) for order in shape['orders'] if order[0] not in eq]
+    ineq = shape['ineq']
+    if ineq and (not orders or orders[0][0] != ineq):
+        orders.insert(0, (ineq, 'asc'))
+    ordered = set(name for name, _ in orders)
+    projection = [(name, 'asc') for name in shape.get('projection', [])
+                  if name not in eq and name not in ordered]
+    tail = orders + projection
+
+    if not tail:
+        # equality filters only: merge join of the built-in indexes
+        return None
+    if not eq and not shape['ancestor'] and len(tail) == 1:
+        # a single property, in either direction
+        return None
+    return (shape['kind'], bool(shape['ancestor']),
+            tuple((name, 'asc') for name in eq) + tuple(tail))
+
+
+def serves(index, required, n_eq):
+    """Whether a defined index can serve a required one whose first n_eq
+    properties are equality filters, which may come in any order."""
+    kind, ancestor, props = index
+    if (kind, ancestor) != required[:2] or len(props) != len(required[2]):
+        return False
+    return (set(props[:n_eq]) == set(required[2][:n_eq]) and
+            props[n_eq:] == required[2][n_eq:])
+
+
+def load_index_yaml(path):
+    """Return the composite indexes defined in index.yaml."""
+    import yaml
+    with open(path) as f:
+        doc = yaml.safe_load(f) or {}
+    indexes = []
+    for index in doc.get('indexes') or []:
+        ancestor = index.get('ancestor') in (True, 'yes')
+        props = tuple((p['name'], 'desc' if p.get('direction') == 'desc' else 'asc')
+                      for p in index.get('properties', []))
+        indexes.append((index['kind'], ancestor, props))
+    return indexes
+
+
+def index_rows(index, values):
+    """Rows an entity with the given indexed value counts has in index."""
+    rows = 1
+    for name, _ in index[2]:
+        rows *= values.get(name, 0)
+    return rows
+
+
+def writes_per_put(values, indexes):
+    """Estimated datastore writes for putting a new entity: the entity
+    and its kind index row, two built-in rows (ascending & descending)
+    per indexed value, and one row per composite index entry."""
+    builtin = 2 + 2 * sum(values.values())
+    return builtin + sum(index_rows(index, values) for index in indexes)
+
+
+def audit(records, indexes):
+    """Return the audit of the recorded queries & puts against indexes:
+
+        shapes   [(shape, count, sources, required index or None,
+                   defined index serving it or None)]
+        unused   defined indexes no recorded query needs
+        minimal  the required indexes, one per equality permutation
+        writes   {kind: (puts, writes per put with indexes,
+                         writes per put with minimal)}
+    """
+    shapes = {}
+    values = {}
+    for record in records:
+        if record['type'] == 'query':
+            key = json.dumps(dict((k, v) for k, v in record.items() if k != 'source'),
+                             sort_keys=True)
+            entry = shapes.setdefault(key, [record, 0, set()])
+            entry[1] += 1
+            entry[2].add(record.get('source') or '?')
+        elif record['type'] == 'put':
+            values.setdefault(record['kind'], []).append(record['values'])
+
+    report = []
+    used = set()
+    minimal = []
+    for shape, count, sources in shapes.values():
+        required = required_index(shape)
+        served_by = None
+        if required:
+            n_eq = len(shape['eq'])
+            served_by = next((index for index in indexes
+                              if serves(index, required, n_eq)), None)
+            if served_by:
+                used.add(served_by)
+            if not any(serves(index, required, n_eq) for index in minimal):
+                minimal.append(served_by or required)
+        report.append((shape, count, sorted(sources), required, served_by))
+
+    writes = {}
+    for kind, puts in values.items():
+        defined = [index for index in indexes if index[0] == kind]
+        needed = [index for index in minimal if index[0] == kind]
+        writes[kind] = (
+            len(puts),
+            sum(writes_per_put(v, defined) for v in puts) / float(len(puts)),
+            sum(writes_per_put(v, needed) for v in puts) / float(len(puts)))
+
+    unused = [index for index in indexes if index not in used]
+    return report, unused, minimal, writes
+
+
+def _format_index(index):
+    kind, ancestor, props = index
+    return '%s%s(%s)' % (kind, ' [ancestor]' if ancestor else '',
+                         ', '.join(name + (' desc' if direction == 'desc' else '')
+                                   for name, direction in props))
+
+
+def _format_shape(shape):
+    parts = ['%s =' % name for name in shape['eq']]
+    if shape['ineq']:
+        parts.append('%s <>' % shape['ineq'])
+    parts += ['order %s %s' % tuple(order) for order in shape['orders']]
+    if shape.get('projection'):
+        parts.append('project %s' % ', '.join(shape['projection']))
+    return '%s%s: %s' % (shape['kind'], ' [ancestor]' if shape['ancestor'] else '',
+                         '; '.join(parts) or 'all')
+
+
+def index_yaml(indexes):
+    """Format indexes as index.yaml entries."""
+    lines = ['indexes:', '']
+    for kind, ancestor, props in indexes:
+        lines.append('- kind: %s' % kind)
+        if ancestor:
+            lines.append('  ancestor: yes')
+        lines.append('  properties:')
+        for name, direction in props:
+            lines.append('  - name: %s' % name)
+            if direction == 'desc':
+                lines.append('    direction: desc')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def _main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('log', help='dev server log recorded with INDEX_AUDIT')
+    parser.add_argument('--index', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'index.yaml'))
+    parser.add_argument('--yaml', action='store_true',
+                        help='print the minimal index set as index.yaml')
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        records = read_log(f)
+    report, unused, minimal, writes = audit(records, load_index_yaml(args.index))
+    out = sys.stdout.write
+
+    if args.yaml:
+        out(index_yaml(minimal))
+        return
+
+    out('Query shapes\n')
+    for shape, count, sources, required, served_by in sorted(
+            report, key=lambda item: -item[1]):
+        if not required:
+            needs = 'built-in'
+        elif served_by:
+            needs = _format_index(served_by)
+        else:
+            needs = 'MISSING ' + _format_index(required)
+        out('%6d  %s\n        -> %s\n        from %s\n' % (
+            count, _format_shape(shape), needs, ', '.join(sources)))
+
+    out('\nUnused indexes (%d of %d)\n' % (len(unused), len(load_index_yaml(args.index))))
+    for index in unused:
+        out('        %s\n' % _format_index(index))
+
+    out('\nWrites per new entity put: index.yaml -> minimal set\n')
+    for kind, (puts, current, needed) in sorted(writes.items()):
+        out('        %-20s %6.1f -> %6.1f   (%d puts)\n' % (kind, current, needed, puts))
+
+    out('\nMinimal index set: %d indexes (--yaml to print)\n' % len(minimal))
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""
+intervals.py -- Udacity conference server-side Python App Engine
+    static interval index for schedule overlap queries
+
+$Id$
+
+Intervals are half-open [start, end), so back to back sessions do not
+overlap. Building the index sorts once, O(n log n); alongside the sorted
+starts it keeps the running maximum of the ends, which lets a query skip
+with bisect both the intervals starting after it and the prefix of
+intervals all ending before it.
+
+"""
+
+from bisect import bisect_left
+from bisect import bisect_right
+from operator import itemgetter
+
+
+class IntervalIndex(object):
+    """Index over (start, end, value) triples with comparable bounds."""
+
+    def __init__(self, intervals):
+        self._items = sorted(intervals, key=itemgetter(0, 1))
+        self._starts = [start for start, _, _ in self._items]
+        self._max_ends = []
+        max_end = None
+        for _, end, _ in self._items:
+            if max_end is None or end > max_end:
+                max_end = end
+            self._max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self._items)
+
+    def overlapping(self, start, end):
+        """Return (start, end, value) of the intervals overlapping [start, end)."""
+        hi = bisect_left(self._starts, end)
+        # every interval before lo ends at or before start
+        lo = bisect_right(self._max_ends, start, 0, hi)
+        return [item for item in self._items[lo:hi] if item[1] > start]
+
+    def overlaps(self):
+        """Yield each overlapping pair of intervals once, in start order;
+        O(n + number of pairs) on the sorted items."""
+        items = self._items
+        for i, first in enumerate(items):
+            j = i + 1
+            while j < len(items) and items[j][0] < first[1]:
+                yield first, items[j]
+                j += 1
@@ -10,10 +10,29 @@ created by wesc on 2014 may 24
 
 """
 
+import calendar
+import logging
+import time
+_LOAD_START = time.time()
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
-from conference import ConferenceApi
+from datetime import datetime
+from email.utils import formatdate
+import announcements
+import archive
+import feed
+import ical
+import idempotency
+import index_audit
+import profiling
+import notifications
+import recommender
+import stats
+import transfer
+import waitlist
+import warmup
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
@@ -21,31 +40,298 @@ __author__ = 'wesc+api@google.com (Wesley Chun)'
 class SetAnnouncementHandler(webapp2.RequestHandler):
     def get(self):
         """Set Announcement in Memcache."""
-        ConferenceApi._cacheAnnouncement()
+        announcements.cache_announcement()
+
+
+class PurgeIdempotencyHandler(webapp2.RequestHandler):
+    def get(self):
+        """Delete expired idempotent responses."""
+        idempotency.purge_expired()
+
+
+class FoldStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Fold queued counter deltas into the aggregate counters."""
+        stats.fold_pending()
+
+
+class ReconcileStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Recompute aggregate counters from scratch and report drift."""
+        drift = stats.reconcile()
+        self.response.headers['Content-Type'] = 'text/plain'
+        self.response.write('%d counters drifted\n' % len(drift))
+        for name, delta in sorted(drift.items()):
+            self.response.write('%s\t%+d\n' % (name, delta))
+
+
+class StartRecommendationsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Start a batch run of the recommender."""
+        recommender.start()
+
+
+class RecommendHandler(webapp2.RequestHandler):
+    def post(self):
+        """Carry a recommender run on from its checkpoint."""
+        recommender.run(self.request.get('job'),
+                        int(self.request.get('seq')))
+
+
+class ArchiveHandler(webapp2.RequestHandler):
+    def get(self):
+        """Archive ended conferences and speakers left without sessions."""
+        archive.run()
+
+    def post(self):
+        """Carry an archival run on where the previous task stopped."""
+        archive.run(self.request.get('phase'),
+                    self.request.get('cursor') or None)
+
+
+def send_mail(to, subject, body):
+    """Send an email from the app's noreply address."""
+    mail.send_mail(
+        'noreply@%s.appspotmail.com' % (
+            app_identity.get_application_id()),     # from
+        to, subject, body)
 
 
 class SendConfirmationEmailHandler(webapp2.RequestHandler):
     def post(self):
         """Send email confirming Conference creation."""
-        mail.send_mail(
-            'noreply@%s.appspotmail.com' % (
-                app_identity.get_application_id()),     # from
-            self.request.get('email'),                  # to
-            'You created a new Conference!',            # subj
-            'Hi, you have created a following '         # body
+        send_mail(
+            self.request.get('email'),
+            'You created a new Conference!',
+            'Hi, you have created a following '
             'conference:\r\n\r\n%s' % self.request.get(
                 'conferenceInfo')
         )
 
 
+class SendWaitlistEmailHandler(webapp2.RequestHandler):
+    def post(self):
+        """Send email telling a waitlisted user they got a seat."""
+        send_mail(
+            self.request.get('email'),
+            'You got a seat!',
+            'Hi, a seat freed up and you are now registered for '
+            'the following conference:\r\n\r\n%s' % self.request.get(
+                'conferenceName')
+        )
+
+
+class FanOutNotificationHandler(webapp2.RequestHandler):
+    def post(self):
+        """Queue the send tasks of a notification to conference attendees."""
+        notifications.fan_out(
+            self.request.get('websafeConferenceKey'),
+            self.request.get('notification'),
+            self.request.get('subject'),
+            self.request.get('body'),
+            cursor=self.request.get('cursor') or None,
+            batch=int(self.request.get('batch', 0)))
+
+
+class SendNotificationEmailHandler(webapp2.RequestHandler):
+    def post(self):
+        """Send a notification email to one batch of attendees."""
+        subject = self.request.get('subject')
+        body = self.request.get('body')
+        for email in notifications.recipients(self.request.get_all('userId')):
+            send_mail(email, subject, body)
+
+
+class BackfillAttendanceHandler(webapp2.RequestHandler):
+    def get(self):
+        """Start building the attendance index from existing profiles."""
+        notifications.backfill_attendance()
+
+    def post(self):
+        """Index the next batch of profiles' registrations."""
+        notifications.backfill_attendance(self.request.get('cursor'))
+
+
+class PromoteWaitlistHandler(webapp2.RequestHandler):
+    def post(self):
+        """Move the head of a Conference waitlist into a freed seat."""
+        wsck = self.request.get('websafeConferenceKey')
+        waitlist.promote(wsck)
+
+
 class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
     def post(self):
         """Set Featured Speakers in Memcache."""
         speaker_key = self.request.get('speaker_key')
-        ConferenceApi._cache_featured_speaker(speaker_key)
+        announcements.cache_featured_speaker(speaker_key)
+
+class ExportHandler(webapp2.RequestHandler):
+    def get(self):
+        """Stream entities of one kind as newline-delimited JSON."""
+        kind = self.request.get('kind')
+        if kind not in transfer.EXPORT_KINDS:
+            self.abort(400, detail='Unsupported kind: %s' % kind)
+        self.response.headers['Content-Type'] = 'application/x-ndjson'
+        # keep each response well under the response size limit; clients
+        # follow X-Export-Cursor until it is absent
+        cursor = transfer.export_kind(
+            kind, self.response.out.write,
+            cursor=self.request.get('cursor') or None,
+            max_batches=int(self.request.get('max_batches', 50)))
+        if cursor:
+            self.response.headers['X-Export-Cursor'] = cursor
+
+
+class ImportHandler(webapp2.RequestHandler):
+    def post(self):
+        """Import newline-delimited JSON, resuming from the job checkpoint."""
+        job_id = self.request.get('job')
+        if not job_id:
+            self.abort(400, detail="'job' parameter required")
+        done = transfer.import_lines(
+            self.request.body_file, job_id)
+        self.response.headers['Content-Type'] = 'text/plain'
+        self.response.write('%d lines imported\n' % done)
+
+class ProfilesHandler(webapp2.RequestHandler):
+    def get(self):
+        """List the hottest functions of each profiled endpoint."""
+        day = self.request.get('day')
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.utcnow().date()
+        sort = self.request.get('sort', 'own')
+        if sort not in ('calls', 'own', 'cumulative'):
+            self.abort(400, detail="sort must be 'calls', 'own' or 'cumulative'")
+        report = profiling.hot_functions(
+            day, self.request.get('endpoint') or None,
+            n=int(self.request.get('n', 20)), sort=sort)
+
+        self.response.headers['Content-Type'] = 'text/plain'
+        for stats, rows in report:
+            self.response.write('%s: %d samples, %.1f ms average\n' % (
+                stats.endpoint, stats.samples,
+                1000 * stats.wallTime / stats.samples))
+            self.response.write('%10s %10s %10s  %s\n' % (
+                'calls', 'own ms', 'cum ms', 'function'))
+            for name, calls, own, cumulative in rows:
+                self.response.write('%10d %10.2f %10.2f  %s\n' % (
+                    calls, 1000 * own, 1000 * cumulative, name))
+            self.response.write('\n')
+
+class RenderFeedHandler(webapp2.RequestHandler):
+    def post(self):
+        """Re-render the public conference feed."""
+        changed, removed = feed.render()
+        logging.info('feed: %d pages changed, %d removed', changed, removed)
+
+
+def not_modified(handler, etag, updated):
+    """Set the validators of a stored response on handler's response;
+    return True, having answered 304, if the client's copy is current."""
+    handler.response.etag = etag
+    handler.response.headers['Last-Modified'] = formatdate(
+        calendar.timegm(updated.utctimetuple()), usegmt=True)
+    if handler.request.if_none_match:
+        current = etag in handler.request.if_none_match
+    else:
+        since = handler.request.if_modified_since
+        current = bool(since) and (
+            since.replace(tzinfo=None) >= updated.replace(microsecond=0))
+    if current:
+        handler.response.status = 304
+    return current
 
-app = webapp2.WSGIApplication([
+
+class ConferenceFeedHandler(webapp2.RequestHandler):
+    def get(self):
+        """Serve a pre-rendered page of the public conference feed;
+        ?city= or ?topic= select a filtered feed, ?page= the page."""
+        city = self.request.get('city')
+        topic = self.request.get('topic')
+        name = 'city:' + city if city else 'topic:' + topic if topic else 'all'
+        try:
+            number = int(self.request.get('page', 0))
+        except ValueError:
+            self.abort(400, detail="'page' must be a number")
+
+        page = feed.get_page(name, number)
+        if not page:
+            if name == 'all' and number == 0:
+                # never rendered, or lost: clients use the API meanwhile
+                feed.schedule_render()
+            self.abort(404)
+
+        self.response.headers['Cache-Control'] = 'public, max-age=%d' % (
+            feed.FEED_DEBOUNCE_SECONDS)
+        if not_modified(self, page['etag'], page['updated']):
+            return
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(page['body'])
+
+
+class CalendarFeedHandler(webapp2.RequestHandler):
+    def get(self, token):
+        """Serve a user's pre-rendered iCalendar feed."""
+        cal = ical.get(token)
+        if not cal:
+            self.abort(404)
+        # the URL is a credential: no shared caches
+        self.response.headers['Cache-Control'] = 'private, max-age=300'
+        if not_modified(self, cal['etag'], cal['updated']):
+            return
+        self.response.headers['Content-Type'] = 'text/calendar; charset=utf-8'
+        self.response.write(cal['body'])
+
+
+class UpdateCalendarHandler(webapp2.RequestHandler):
+    def post(self):
+        """Bring one item of a user's calendar feed up to date."""
+        ical.update(self.request.get('userId'),
+                    self.request.get('websafeKey'))
+
+
+class RefreshCalendarsHandler(webapp2.RequestHandler):
+    def post(self):
+        """Re-render a changed conference in its attendees' calendar feeds."""
+        ical.refresh(self.request.get('websafeConferenceKey'),
+                     self.request.get('cursor') or None)
+
+class WarmupHandler(webapp2.RequestHandler):
+    def get(self):
+        """Load the API module and prime caches before taking traffic."""
+        timings = warmup.warm()
+        self.response.headers['Content-Type'] = 'text/plain'
+        for label, ms in timings:
+            self.response.write('%s\t%.1f ms\n' % (label, ms))
+
+app = profiling.ProfilingMiddleware(webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
+    ('/crons/purge_idempotency', PurgeIdempotencyHandler),
+    ('/crons/fold_stats', FoldStatsHandler),
+    ('/crons/reconcile_stats', ReconcileStatsHandler),
+    ('/crons/recommendations', StartRecommendationsHandler),
+    ('/crons/archive', ArchiveHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/set_featured_speakers', SetFeaturedSpeakerHandler),
-], debug=True)
+    ('/tasks/promote_waitlist', PromoteWaitlistHandler),
+    ('/tasks/send_waitlist_email', SendWaitlistEmailHandler),
+    ('/tasks/recommend', RecommendHandler),
+    ('/tasks/archive', ArchiveHandler),
+    ('/tasks/fanout_notification', FanOutNotificationHandler),
+    ('/tasks/send_notification_email', SendNotificationEmailHandler),
+    ('/tasks/backfill_attendance', BackfillAttendanceHandler),
+    ('/tasks/render_feed', RenderFeedHandler),
+    ('/tasks/update_calendar', UpdateCalendarHandler),
+    ('/tasks/refresh_calendars', RefreshCalendarsHandler),
+    ('/feed/conferences', ConferenceFeedHandler),
+    (r'/calendar/([\w-]+)\.ics', CalendarFeedHandler),
+    ('/admin/export', ExportHandler),
+    ('/admin/import', ImportHandler),
+    ('/admin/backfill_attendance', BackfillAttendanceHandler),
+    ('/admin/profiles', ProfilesHandler),
+    ('/_ah/warmup', WarmupHandler),
+], debug=True))
+
+index_audit.install_from_env()
+
+# cold start cost of this script, without the API module
+logging.info('main loaded in %.1f ms', 1000 * (time.time() - _LOAD_START))
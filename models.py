@@ -12,17 +12,47 @@ created/forked from conferences.py by wesc on 2014 may 24
 import httplib
 import endpoints
 from protorpc import messages
+from google.appengine.api import memcache
 from google.appengine.ext import ndb
 from datetime import datetime, timedelta, time
 
+MEMCACHE_CONFERENCE_VERSION_KEY = "CONFERENCE_VERSION_%s"
+MEMCACHE_SESSIONS_VERSION_KEY = "SESSIONS_VERSION_%s"
+MEMCACHE_CONFERENCES_VERSION_KEY = "CONFERENCES_VERSION"
+MEMCACHE_CONFERENCE_DETAIL_KEY = "CONFERENCE_DETAIL_%s"
+# bounds how long a lost race between two version writes can go unnoticed
+VERSION_CACHE_TTL = 600
+# bounds how long a composite misses changes nothing invalidates it for
+# (organiser names, speakers' sessions elsewhere)
+DETAIL_CACHE_TTL = 60
+# a dropped composite refuses re-adds this long, outlasting reads that
+# loaded it before the write
+DETAIL_LOCK_SECONDS = 5
+
+
+def clear_conference_detail(wsck):
+    """Drop the cached composite of a conference after a write."""
+    memcache.delete(MEMCACHE_CONFERENCE_DETAIL_KEY % wsck,
+                    seconds=DETAIL_LOCK_SECONDS)
+
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
+def current_version_seed():
+    """Return milliseconds since the epoch, used to seed version counters."""
+    return int((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
 class ConflictException(endpoints.ServiceException):
     """ConflictException -- exception mapped to HTTP 409 response"""
     http_status = httplib.CONFLICT
 
 
+class TooManyRequestsException(endpoints.ForbiddenException):
+    """TooManyRequestsException -- exception mapped to HTTP 403 response;
+    Endpoints passes no 429 through to clients"""
+
+
 class Profile(ndb.Model):
     """Profile -- User profile object"""
     displayName = ndb.StringProperty()
@@ -31,6 +61,7 @@ class Profile(ndb.Model):
     conferenceKeysToAttend = ndb.StringProperty(repeated=True)
     sessionsInWishlist = ndb.StringProperty(repeated=True)
     interestedTopics = ndb.StringProperty(repeated=True)
+    calendarToken = ndb.StringProperty(indexed=False)
 
 
 class ProfileMiniForm(messages.Message):
@@ -66,6 +97,27 @@ class Conference(ndb.Model):
     endDate = ndb.DateProperty()
     maxAttendees = ndb.IntegerProperty()
     seatsAvailable = ndb.IntegerProperty()
+    version = ndb.IntegerProperty(default=0)
+    sessionsVersion = ndb.IntegerProperty(default=0)
+
+    def _pre_put_hook(self):
+        # every write path goes through put(), so bump the version here
+        self.version = (self.version or 0) + 1
+
+    def _post_put_hook(self, future):
+        # in a transaction, publish the versions only once it commits
+        # (outside one, call_on_commit runs the callback right away)
+        ndb.get_context().call_on_commit(self._publish_versions)
+
+    def _publish_versions(self):
+        wsck = self.key.urlsafe()
+        memcache.set_multi({
+            MEMCACHE_CONFERENCE_VERSION_KEY % wsck: self.version,
+            MEMCACHE_SESSIONS_VERSION_KEY % wsck: self.sessionsVersion,
+        }, time=VERSION_CACHE_TTL)
+        # seeded from the clock so a new counter never repeats old values
+        memcache.incr(MEMCACHE_CONFERENCES_VERSION_KEY,
+                      initial_value=current_version_seed())
 
 
 class ConferenceForm(messages.Message):
@@ -82,11 +134,44 @@ class ConferenceForm(messages.Message):
     endDate = messages.StringField(10)  # DateTimeField()
     websafeKey = messages.StringField(11)
     organizerDisplayName = messages.StringField(12)
+    version = messages.IntegerField(13)
+    notModified = messages.BooleanField(14)
+    notFound = messages.BooleanField(15)
+    archived = messages.BooleanField(16)
+
+
+class ConferenceKeysForm(messages.Message):
+    """ConferenceKeysForm -- inbound list of websafe Conference keys"""
+    websafeConferenceKeys = messages.StringField(1, repeated=True)
 
 
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    version = messages.IntegerField(2)
+    notModified = messages.BooleanField(3)
+
+
+class ConferenceColumns(messages.Message):
+    """ConferenceColumns -- compact columnar form of ConferenceForms (see compact.py)"""
+    strings = messages.StringField(1, repeated=True)
+    startBaseDate = messages.StringField(2)
+    endBaseDate = messages.StringField(3)
+    name = messages.StringField(4, repeated=True)
+    description = messages.StringField(5, repeated=True)
+    organizerUserId = messages.IntegerField(6, repeated=True, variant=messages.Variant.INT32)
+    organizerDisplayName = messages.IntegerField(7, repeated=True, variant=messages.Variant.INT32)
+    topics = messages.IntegerField(8, repeated=True, variant=messages.Variant.INT32)
+    topicCount = messages.IntegerField(9, repeated=True, variant=messages.Variant.INT32)
+    city = messages.IntegerField(10, repeated=True, variant=messages.Variant.INT32)
+    startDate = messages.IntegerField(11, repeated=True, variant=messages.Variant.INT32)
+    endDate = messages.IntegerField(12, repeated=True, variant=messages.Variant.INT32)
+    month = messages.IntegerField(13, repeated=True, variant=messages.Variant.INT32)
+    maxAttendees = messages.IntegerField(14, repeated=True, variant=messages.Variant.INT32)
+    seatsAvailable = messages.IntegerField(15, repeated=True, variant=messages.Variant.INT32)
+    websafeKey = messages.StringField(16, repeated=True)
+    version = messages.IntegerField(17)
+    notModified = messages.BooleanField(18)
 
 
 class TeeShirtSize(messages.Enum):
@@ -118,6 +203,8 @@ class ConferenceQueryForm(messages.Message):
 class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms -- multiple ConferenceQueryForm inbound form message"""
     filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    version = messages.IntegerField(2)
+    includeArchived = messages.BooleanField(3)
 
 
 class StringMessage(messages.Message):
@@ -137,6 +224,10 @@ class Session(ndb.Model):
     endDateTime = ndb.ComputedProperty(lambda self: self.get_session_end_time())
     parentConferenceName = ndb.StringProperty()
     finishBeforeSeven = ndb.ComputedProperty(lambda self: self.get_before_seven())
+    version = ndb.IntegerProperty(default=0)
+
+    def _pre_put_hook(self):
+        self.version = (self.version or 0) + 1
 
     def get_session_end_time(self):
         start_datetime = datetime.combine(self.date, self.startTime)
@@ -160,11 +251,31 @@ class SessionForm(messages.Message):
     date = messages.StringField(6)
     startTime = messages.StringField(7)
     websafeKey = messages.StringField(8)
+    version = messages.IntegerField(9)
+    archived = messages.BooleanField(10)
 
 
 class SessionForms(messages.Message):
     """SessionForms - Multiple SessionForm outbound form messages"""
     items = messages.MessageField(SessionForm, 1, repeated=True)
+    version = messages.IntegerField(2)
+    notModified = messages.BooleanField(3)
+
+
+class SessionColumns(messages.Message):
+    """SessionColumns - compact columnar form of SessionForms (see compact.py)"""
+    strings = messages.StringField(1, repeated=True)
+    baseDate = messages.StringField(2)
+    name = messages.StringField(3, repeated=True)
+    highlights = messages.StringField(4, repeated=True)
+    speaker = messages.IntegerField(5, repeated=True, variant=messages.Variant.INT32)
+    durationMinutes = messages.IntegerField(6, repeated=True, variant=messages.Variant.INT32)
+    typeOfSession = messages.IntegerField(7, repeated=True, variant=messages.Variant.INT32)
+    date = messages.IntegerField(8, repeated=True, variant=messages.Variant.INT32)
+    startTime = messages.IntegerField(9, repeated=True, variant=messages.Variant.INT32)
+    websafeKey = messages.StringField(10, repeated=True)
+    version = messages.IntegerField(11)
+    notModified = messages.BooleanField(12)
 
 
 class Speaker(ndb.Model):
@@ -173,4 +284,213 @@ class Speaker(ndb.Model):
     sessions = ndb.StringProperty(repeated=True)
 
 
+class SpeakerForm(messages.Message):
+    """SpeakerForm - Speaker outbound form message"""
+    name = messages.StringField(1)
+    sessions = messages.StringField(2, repeated=True)
+
+
+class FeaturedSpeaker(ndb.Model):
+    """FeaturedSpeaker - the speaker the set featured speakers task last
+    featured; a single entity"""
+    speaker = ndb.KeyProperty(kind=Speaker, indexed=False)
+    updated = ndb.DateTimeProperty(auto_now=True, indexed=False)
+
+
+class WaitlistEntry(ndb.Model):
+    """WaitlistEntry - user waiting for a seat; child of the Conference,
+    keyed by user id"""
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class Attendance(ndb.Model):
+    """Attendance - reverse index of Profile.conferenceKeysToAttend; child
+    of the Conference, keyed by user id"""
+    created = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+
+class WaitlistPositionForm(messages.Message):
+    """WaitlistPositionForm - outbound waitlist position message"""
+    position = messages.IntegerField(1, variant=messages.Variant.INT32)
+    seatsAvailable = messages.IntegerField(2, variant=messages.Variant.INT32)
 
+
+class ScheduleConflictForm(messages.Message):
+    """ScheduleConflictForm -- two overlapping items of a user's schedule"""
+    kind = messages.StringField(1)
+    websafeKey = messages.StringField(2)
+    name = messages.StringField(3)
+    otherWebsafeKey = messages.StringField(4)
+    otherName = messages.StringField(5)
+    overlapStart = messages.StringField(6)
+    overlapEnd = messages.StringField(7)
+
+
+class ScheduleConflictForms(messages.Message):
+    """ScheduleConflictForms -- multiple ScheduleConflictForm outbound form message"""
+    items = messages.MessageField(ScheduleConflictForm, 1, repeated=True)
+
+
+class ConferenceDetailForm(messages.Message):
+    """ConferenceDetailForm - Conference with its sessions, speakers and
+    the current user's registration/wishlist state"""
+    conference = messages.MessageField(ConferenceForm, 1)
+    sessions = messages.MessageField(SessionForm, 2, repeated=True)
+    speakers = messages.MessageField(SpeakerForm, 3, repeated=True)
+    isUserAttending = messages.BooleanField(4)
+    wishlistSessionKeys = messages.StringField(5, repeated=True)
+    # free seats are owed to waitlisted users
+    hasWaitlist = messages.BooleanField(6)
+
+
+class IdempotentResponse(ndb.Model):
+    """IdempotentResponse - stored response of a mutating request, keyed by
+    user, method and client supplied idempotency key"""
+    response = ndb.TextProperty()
+    created = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class AggregateCounter(ndb.Model):
+    """AggregateCounter - incrementally maintained dashboard count, keyed
+    by counter name (see stats.py)"""
+    count = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class StatForm(messages.Message):
+    """StatForm - outbound named count message"""
+    name = messages.StringField(1)
+    count = messages.IntegerField(2)
+
+
+class ConferenceStatsForm(messages.Message):
+    """ConferenceStatsForm - outbound aggregate statistics message; the
+    conference fields are only set when a conference was requested"""
+    conferences = messages.IntegerField(1)
+    registrations = messages.IntegerField(2)
+    sessions = messages.IntegerField(3)
+    conferencesByCity = messages.MessageField(StatForm, 4, repeated=True)
+    conferencesByTopic = messages.MessageField(StatForm, 5, repeated=True)
+    conferencesByMonth = messages.MessageField(StatForm, 6, repeated=True)
+    registrationsByCity = messages.MessageField(StatForm, 7, repeated=True)
+    registrationsByTopic = messages.MessageField(StatForm, 8, repeated=True)
+    registrationsByMonth = messages.MessageField(StatForm, 9, repeated=True)
+    sessionsByType = messages.MessageField(StatForm, 10, repeated=True)
+    conferenceRegistrations = messages.IntegerField(11)
+    conferenceSessions = messages.IntegerField(12)
+    conferenceSessionsByType = messages.MessageField(StatForm, 13, repeated=True)
+
+
+class ImportCheckpoint(ndb.Model):
+    """ImportCheckpoint - progress of a resumable bulk import job"""
+    linesDone = ndb.IntegerProperty(default=0)
+    updated = ndb.DateTimeProperty(auto_now=True)
+
+
+class RecommenderJob(ndb.Model):
+    """RecommenderJob - progress of a batch recommendation run; the
+    CoOccurrence entities of the run are its children"""
+    phase = ndb.StringProperty(default='count')
+    cursor = ndb.StringProperty(indexed=False)
+    profilesDone = ndb.IntegerProperty(default=0, indexed=False)
+    # items of the chunk at cursor whose tallies are already counted
+    appliedItems = ndb.StringProperty(repeated=True, indexed=False)
+    started = ndb.DateTimeProperty(auto_now_add=True)
+    finished = ndb.DateTimeProperty()
+
+
+class CoOccurrence(ndb.Model):
+    """CoOccurrence - how many users hold an item (id, 'session:<key>' or
+    'conference:<key>'), and how many of them also hold each other item"""
+    count = ndb.IntegerProperty(default=0, indexed=False)
+    others = ndb.JsonProperty(compressed=True)
+
+
+class RecommendedItem(ndb.Model):
+    """RecommendedItem - one recommended Session or Conference, with its
+    name denormalized for serving"""
+    websafeKey = ndb.StringProperty()
+    name = ndb.StringProperty()
+    score = ndb.FloatProperty()
+
+
+class Recommendation(ndb.Model):
+    """Recommendation - precomputed recommendations of a user, id is the
+    user id"""
+    sessions = ndb.LocalStructuredProperty(RecommendedItem, repeated=True)
+    conferences = ndb.LocalStructuredProperty(RecommendedItem, repeated=True)
+    updated = ndb.DateTimeProperty(auto_now=True)
+
+
+class RecommendationForm(messages.Message):
+    """RecommendationForm -- outbound recommended item message"""
+    websafeKey = messages.StringField(1)
+    name = messages.StringField(2)
+    score = messages.FloatField(3)
+
+
+class RecommendationForms(messages.Message):
+    """RecommendationForms -- outbound recommendations message"""
+    sessions = messages.MessageField(RecommendationForm, 1, repeated=True)
+    conferences = messages.MessageField(RecommendationForm, 2, repeated=True)
+    updated = messages.StringField(3)
+
+
+class ArchivedConference(ndb.Expando):
+    """ArchivedConference - a Conference that has ended, same key path with
+    the archive kinds; only the queryConferences equality filter fields
+    are indexed"""
+    _default_indexed = False
+    city = ndb.StringProperty()
+    topics = ndb.StringProperty(repeated=True)
+    month = ndb.IntegerProperty()
+    maxAttendees = ndb.IntegerProperty()
+    # dynamic properties cannot hold dates
+    startDate = ndb.DateProperty(indexed=False)
+    endDate = ndb.DateProperty(indexed=False)
+    archived = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+
+class ArchivedSession(ndb.Expando):
+    """ArchivedSession - a Session of an archived Conference; speaker and
+    endDateTime are indexed for getSessionsBySpeaker/getFinishedSessions"""
+    _default_indexed = False
+    speaker = ndb.StringProperty()
+    # dynamic properties cannot hold dates or times
+    date = ndb.DateProperty(indexed=False)
+    startTime = ndb.TimeProperty(indexed=False)
+    endDateTime = ndb.DateTimeProperty()
+    archived = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+
+class ArchivedSpeaker(ndb.Expando):
+    """ArchivedSpeaker - a Speaker left without active sessions"""
+    _default_indexed = False
+    archived = ndb.DateTimeProperty(auto_now_add=True, indexed=False)
+
+
+class ProfileStats(ndb.Model):
+    """ProfileStats - profiler samples of one endpoint aggregated over a
+    day; functions maps 'file:line(function)' to [calls, own seconds,
+    cumulative seconds]"""
+    endpoint = ndb.StringProperty()
+    day = ndb.DateProperty()
+    samples = ndb.IntegerProperty(default=0, indexed=False)
+    wallTime = ndb.FloatProperty(default=0.0, indexed=False)
+    functions = ndb.JsonProperty(compressed=True)
+
+
+class FeedPage(ndb.Model):
+    """FeedPage - pre-rendered page of the public conference feed, keyed
+    by '<feed>/<page>' (see feed.py)"""
+    body = ndb.TextProperty()
+    etag = ndb.StringProperty(indexed=False)
+    updated = ndb.DateTimeProperty(indexed=False)
+
+
+class CalendarFeed(ndb.Model):
+    """CalendarFeed - a user's iCalendar feed, keyed by the secret token
+    of its URL; events maps websafe keys to rendered VEVENTs (see ical.py)"""
+    userId = ndb.StringProperty(indexed=False)
+    events = ndb.JsonProperty(compressed=True)
+    etag = ndb.StringProperty(indexed=False)
+    updated = ndb.DateTimeProperty(indexed=False)
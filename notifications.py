@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+notifications.py -- Udacity conference server-side Python App Engine
+    fan-out of notification emails to the attendees of a conference
+
+$Id$
+
+Attendees are found through the Attendance children of the Conference
+(kept in step with Profile.conferenceKeysToAttend by registration), so no
+Profile scan is needed. A fan-out task walks them with a keys only cursor
+and queues one send task per batch of recipients on the rate limited
+notifications queue (see queue.yaml); when its time budget is spent it
+chains itself from the cursor. All tasks of a notification are named, so
+a retried fan-out task cannot queue a batch twice.
+
+"""
+
+import time
+import uuid
+
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from models import Attendance
+from models import Profile
+
+NOTIFY_QUEUE = 'notifications'
+FANOUT_URL = '/tasks/fanout_notification'
+SEND_URL = '/tasks/send_notification_email'
+BACKFILL_URL = '/tasks/backfill_attendance'
+# recipients per send task
+SEND_BATCH = 100
+# the most tasks a single Queue.add takes
+MAX_TASKS_PER_ADD = 100
+TIME_BUDGET_SECONDS = 60
+BACKFILL_BATCH = 200
+
+
+def notify_attendees(conf, subject, body, transactional=False):
+    """Queue an email to everyone registered for conf."""
+    taskqueue.add(url=FANOUT_URL,
+                  params={'websafeConferenceKey': conf.key.urlsafe(),
+                          'notification': uuid.uuid4().hex,
+                          'subject': subject,
+                          'body': body},
+                  transactional=transactional)
+
+
+def _add(queue, tasks):
+    try:
+        taskqueue.Queue(queue).add(tasks)
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        # queued by an earlier attempt; the others were still added
+        pass
+
+
+def fan_out(wsck, notification, subject, body, cursor=None, batch=0):
+    """Queue send tasks for the attendees after cursor until the time
+    budget is spent, then chain the next fan-out task."""
+    deadline = time.time() + TIME_BUDGET_SECONDS
+    q = Attendance.query(ancestor=ndb.Key(urlsafe=wsck))
+    start = Cursor(urlsafe=cursor) if cursor else None
+    more = True
+    while more and time.time() < deadline:
+        tasks = []
+        while more and len(tasks) < MAX_TASKS_PER_ADD:
+            keys, start, more = q.fetch_page(
+                SEND_BATCH, start_cursor=start, keys_only=True)
+            more = more and start is not None
+            if keys:
+                tasks.append(taskqueue.Task(
+                    url=SEND_URL,
+                    name='notify-%s-%d' % (notification, batch),
+                    params={'userId': [key.id() for key in keys],
+                            'subject': subject,
+                            'body': body}))
+                batch += 1
+        if tasks:
+            _add(NOTIFY_QUEUE, tasks)
+    if more:
+        _add('default', [taskqueue.Task(
+            url=FANOUT_URL,
+            name='fanout-%s-%d' % (notification, batch),
+            params={'websafeConferenceKey': wsck,
+                    'notification': notification,
+                    'subject': subject,
+                    'body': body,
+                    'cursor': start.urlsafe(),
+                    'batch': batch})])
+
+
+def recipients(user_ids):
+    """Return the email addresses of the given users."""
+    profiles = ndb.get_multi([ndb.Key(Profile, user_id) for user_id in user_ids])
+    return [prof.mainEmail for prof in profiles if prof and prof.mainEmail]
+
+
+def backfill_attendance(cursor=None):
+    """Create the Attendance entities of registrations made before they
+    were maintained, a batch of Profiles per task."""
+    start = Cursor(urlsafe=cursor) if cursor else None
+    profiles, next_cursor, more = Profile.query().fetch_page(
+        BACKFILL_BATCH, start_cursor=start)
+
+    conf_keys = list(set(ndb.Key(urlsafe=wsck) for prof in profiles
+                         for wsck in prof.conferenceKeysToAttend))
+    # skip registrations of conferences since deleted or archived
+    existing = set(key for key, conf in zip(conf_keys, ndb.get_multi(conf_keys))
+                   if conf)
+    attendances = []
+    for prof in profiles:
+        for wsck in prof.conferenceKeysToAttend:
+            conf_key = ndb.Key(urlsafe=wsck)
+            if conf_key in existing:
+                attendances.append(Attendance(id=prof.key.id(), parent=conf_key))
+    ndb.put_multi(attendances)
+
+    if more and next_cursor:
+        taskqueue.add(url=BACKFILL_URL, params={'cursor': next_cursor.urlsafe()})
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+profiling.py -- Udacity conference server-side Python App Engine
+    sampling profiler for the API and the task/cron handlers
+
+$Id$
+
+ProfilingMiddleware wraps a WSGI application and runs a random fraction
+of its requests (settings.PROFILE_SAMPLE_RATE), plus any request with an
+"X-Profile: <settings.PROFILE_TOKEN>" header when that token is set,
+under cProfile. A request that is not sampled costs one random() call.
+Requests answered 404 are recorded under one OTHER_ENDPOINT, so that
+probes of arbitrary paths do not each add an entity.
+
+The function stats of each sample are merged into a ProfileStats entity
+per endpoint and day. The merge is a single try transaction: a sample
+colliding with another one of the same endpoint is dropped rather than
+slowing the request down further. /admin/profiles lists the hot
+functions.
+
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime
+
+from google.appengine.api import datastore_errors
+from google.appengine.ext import ndb
+
+from models import ProfileStats
+from settings import PROFILE_SAMPLE_RATE
+from settings import PROFILE_TOKEN
+
+# functions kept per sample and per stored aggregate, by own time
+MAX_SAMPLE_FUNCTIONS = 200
+MAX_STORED_FUNCTIONS = 500
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+OTHER_ENDPOINT = '<other>'
+
+# paths carrying per-user parts, recorded under one endpoint name each
+# (which also keeps secrets such as calendar tokens out of the stats)
+_ENDPOINT_PATTERNS = [
+    (re.compile(r'^/calendar/[^/]+\.ics$'), '/calendar/<token>.ics'),
+]
+
+
+def endpoint_name(path):
+    """Return the endpoint name stats of a request path are kept under."""
+    for pattern, name in _ENDPOINT_PATTERNS:
+        if pattern.match(path):
+            return name
+    return path
+
+
+class ProfilingMiddleware(object):
+    """WSGI middleware profiling sampled requests of app."""
+
+    def __init__(self, app, sample_rate=None):
+        self.app = app
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def _sampled(self, environ):
+        token = environ.get('HTTP_X_PROFILE')
+        if token:
+            return bool(PROFILE_TOKEN) and token == PROFILE_TOKEN
+        return random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self._sampled(environ):
+            return self.app(environ, start_response)
+
+        statuses = []
+
+        def capture_status(status, headers, exc_info=None):
+            statuses.append(status)
+            return start_response(status, headers, exc_info)
+
+        def run():
+            body = self.app(environ, capture_status)
+            try:
+                # the body may be produced lazily; profile that too
+                return list(body)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+        profiler = cProfile.Profile()
+        start = time.time()
+        try:
+            return profiler.runcall(run)
+        finally:
+            if statuses and statuses[-1].startswith('404'):
+                endpoint = OTHER_ENDPOINT
+            else:
+                endpoint = endpoint_name(environ.get('PATH_INFO', ''))
+            try:
+                record(endpoint, profiler, time.time() - start)
+            except Exception:
+                # never fail the profiled request over its sample
+                logging.exception('Could not record profile sample of %s', endpoint)
+
+
+def _function_name(filename, lineno, func):
+    if filename.startswith(_APP_DIR):
+        filename = filename[len(_APP_DIR):]
+    return '%s:%d(%s)' % (filename, lineno, func)
+
+
+def _top(functions, n):
+    """Keep the n functions with the most own time."""
+    if len(functions) <= n:
+        return functions
+    ranked = sorted(functions.items(), key=lambda item: -item[1][1])
+    return dict(ranked[:n])
+
+
+def record(endpoint, profiler, wall_time):
+    """Merge a profiler's stats into the endpoint's stats of the day."""
+    functions = {}
+    for (filename, lineno, func), (_, calls, own, cumulative, _) in \
+            pstats.Stats(profiler).stats.items():
+        functions[_function_name(filename, lineno, func)] = [calls, own, cumulative]
+    functions = _top(functions, MAX_SAMPLE_FUNCTIONS)
+
+    day = datetime.utcnow().date()
+    try:
+        _merge(ndb.Key(ProfileStats, '%s %s' % (day, endpoint)),
+               endpoint, day, functions, wall_time)
+    except (datastore_errors.TransactionFailedError, datastore_errors.Timeout):
+        logging.info('Dropped profile sample of %s', endpoint)
+
+
+@ndb.transactional(retries=0)
+def _merge(key, endpoint, day, functions, wall_time):
+    stats = key.get() or ProfileStats(key=key, endpoint=endpoint, day=day)
+    stats.samples += 1
+    stats.wallTime += wall_time
+    merged = stats.functions or {}
+    for name, (calls, own, cumulative) in functions.items():
+        total = merged.get(name, [0, 0.0, 0.0])
+        merged[name] = [total[0] + calls, total[1] + own, total[2] + cumulative]
+    stats.functions = _top(merged, MAX_STORED_FUNCTIONS)
+    stats.put()
+
+
+def hot_functions(day, endpoint=None, n=20, sort='own'):
+    """Return [(ProfileStats, [(name, calls, own, cumulative), ...])] with
+    the n hottest functions of each endpoint profiled on day; times are
+    seconds per sampled request."""
+    column = {'calls': 0, 'own': 1, 'cumulative': 2}[sort]
+    q = ProfileStats.query(ProfileStats.day == day)
+    if endpoint:
+        q = q.filter(ProfileStats.endpoint == endpoint)
+    report = []
+    for stats in q:
+        rows = sorted((stats.functions or {}).items(),
+                      key=lambda item: -item[1][column])[:n]
+        report.append((stats, [(name, calls, own / stats.samples,
+                                cumulative / stats.samples)
+                               for name, (calls, own, cumulative) in rows]))
+    report.sort(key=lambda item: -item[0].wallTime)
+    return report
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""
+ratelimit.py -- Udacity conference server-side Python App Engine
+    per-user, per-method request rate limiting backed by memcache
+
+$Id$
+
+"""
+
+import functools
+import os
+import time
+
+import endpoints
+from google.appengine.api import memcache
+
+from models import TooManyRequestsException
+from settings import RATE_LIMITS
+from utils import getUserId
+
+MEMCACHE_RATE_LIMIT_KEY = "RATE_LIMIT_%s_%s_%d"
+
+
+def _caller_id():
+    """Return the user id of the caller, or its address if anonymous."""
+    user = endpoints.get_current_user()
+    if user:
+        return getUserId(user)
+    return os.environ.get('REMOTE_ADDR', 'anonymous')
+
+
+def rate_limited(method_name):
+    """Decorate a ConferenceApi method with the limit configured for
+    method_name in settings.RATE_LIMITS.
+
+    Each caller gets a bucket of `requests` tokens per `window` seconds,
+    counted with a single memcache incr on a key that is unique to the
+    window, so stale buckets simply age out of memcache. If memcache is
+    unavailable the request is let through.
+    """
+    limit, window = RATE_LIMITS[method_name]
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request):
+            now = int(time.time())
+            key = MEMCACHE_RATE_LIMIT_KEY % (method_name, _caller_id(), now // window)
+            count = memcache.incr(key, initial_value=0)
+            if count is not None and count > limit:
+                raise TooManyRequestsException(
+                    'Rate limit exceeded: too many %s requests; '
+                    'retry in %d seconds.' % (
+                        method_name, window - now % window))
+            return func(self, request)
+        return wrapper
+    return decorator
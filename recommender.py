@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""
+recommender.py -- Udacity conference server-side Python App Engine
+    offline session & conference recommendations
+
+$Id$
+
+A daily cron job starts a RecommenderJob, which a chain of tasks moves
+through its phases a chunk of Profiles at a time:
+
+    count    tally, for every wishlisted session and attended conference,
+             how many users hold it and which other items they also hold
+             (CoOccurrence children of the job)
+    score    for every user, score the items they don't hold yet by their
+             co-occurrence with the items they do, and write the top ones
+             into the user's Recommendation entity
+    cleanup  drop the CoOccurrence entities of this and any abandoned job
+
+The job entity holds the query cursor, so each task runs chunks until its
+time budget is spent and chains the next task to carry on from there.
+Count chunks commit their tallies in transactions of bounded size (the
+job is their entity group); each records the items it counted in the
+job, and the last one moves the cursor past the chunk, so a retried
+task never counts an item of a chunk twice.
+
+"""
+
+import json
+import time
+from collections import Counter
+from datetime import datetime
+
+from google.appengine.api import taskqueue
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from models import CoOccurrence
+from models import Profile
+from models import RecommendedItem
+from models import Recommendation
+from models import RecommenderJob
+
+RECOMMEND_URL = '/tasks/recommend'
+PROFILE_CHUNK = 25
+# stay well inside the 10 minute push task deadline
+TIME_BUDGET_SECONDS = 60
+# most recent items of each kind per user taken into account
+MAX_ITEMS_PER_USER = 25
+# co-occurring items kept per item, keeps CoOccurrence under 1MB
+MAX_OTHERS = 1000
+TOP_N = 10
+# per count transaction, well inside the datastore's 10MB and 500
+# entity commit limits
+MAX_COMMIT_BYTES = 4 * 1024 * 1024
+MAX_COMMIT_ENTITIES = 400
+# added to a conference's score per topic the user is interested in
+TOPIC_BOOST = 0.5
+CLEANUP_BATCH = 500
+
+# - - - Job control - - - - - - - - - - - - - - - - - - - - -
+
+
+def start():
+    """Start a new recommendation run."""
+    job = RecommenderJob(id=datetime.utcnow().strftime('%Y%m%d%H%M%S'))
+    job.put()
+    _chain(job.key.id(), 0)
+
+
+def _chain(job_id, seq):
+    # named, so a retried task cannot fork the chain
+    try:
+        taskqueue.add(url=RECOMMEND_URL,
+                      params={'job': job_id, 'seq': seq},
+                      name='recommend-%s-%d' % (job_id, seq))
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+
+def run(job_id, seq):
+    """Advance the job a chunk at a time until the time budget is spent,
+    then chain the next task; used by the recommend task."""
+    deadline = time.time() + TIME_BUDGET_SECONDS
+    job_key = ndb.Key(RecommenderJob, job_id)
+    while time.time() < deadline:
+        job = job_key.get()
+        if not job or job.phase == 'done':
+            return
+        PHASES[job.phase](job)
+    _chain(job_id, seq + 1)
+
+
+def _next_page(job):
+    """Return the next chunk of Profiles and the cursor after it, or None
+    as cursor when this was the last chunk."""
+    start = Cursor(urlsafe=job.cursor) if job.cursor else None
+    profiles, cursor, more = Profile.query().fetch_page(
+        PROFILE_CHUNK, start_cursor=start)
+    return profiles, cursor.urlsafe() if more and cursor else None
+
+
+def _advance(job, cursor, next_phase):
+    job.cursor = cursor
+    if cursor is None:
+        job.phase = next_phase
+
+
+def _items(prof):
+    """The ids of the items a user holds, most recent of each kind."""
+    sessions = prof.sessionsInWishlist[-MAX_ITEMS_PER_USER:]
+    conferences = prof.conferenceKeysToAttend[-MAX_ITEMS_PER_USER:]
+    items = ['session:%s' % wsk for wsk in sessions]
+    items += ['conference:%s' % wsck for wsck in conferences]
+    return sorted(set(items))
+
+# - - - Count - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def _count_chunk(job):
+    profiles, cursor = _next_page(job)
+    tallies = {}
+    for prof in profiles:
+        items = _items(prof)
+        for item in items:
+            tally = tallies.setdefault(item, [0, Counter()])
+            tally[0] += 1
+            tally[1].update(other for other in items if other != item)
+    while not _apply_tallies(job.key, job.cursor, cursor, tallies, len(profiles)):
+        pass
+
+
+@ndb.transactional
+def _apply_tallies(job_key, start, cursor, tallies, profiles_done):
+    """Add the next part of a chunk's tallies, up to MAX_COMMIT_BYTES,
+    and once all are in move the cursor past the chunk; return whether
+    the chunk is done."""
+    job = job_key.get()
+    if job.phase != 'count' or job.cursor != start:
+        # a duplicate run already applied this chunk
+        return True
+    applied = set(job.appliedItems)
+    pending = [item for item in sorted(tallies) if item not in applied]
+    keys = [ndb.Key(CoOccurrence, item, parent=job_key)
+            for item in pending[:MAX_COMMIT_ENTITIES]]
+    entities = []
+    size = 0
+    for key, co in zip(keys, ndb.get_multi(keys)):
+        co = co or CoOccurrence(key=key)
+        count, others = tallies[key.id()]
+        co.count += count
+        merged = Counter(co.others or {})
+        merged.update(others)
+        if len(merged) > MAX_OTHERS:
+            merged = Counter(dict(merged.most_common(MAX_OTHERS)))
+        co.others = dict(merged)
+        entities.append(co)
+        job.appliedItems.append(key.id())
+        size += len(json.dumps(co.others))
+        if size >= MAX_COMMIT_BYTES:
+            break
+
+    done = len(entities) == len(pending)
+    if done:
+        job.appliedItems = []
+        job.profilesDone += profiles_done
+        _advance(job, cursor, 'score')
+    ndb.put_multi(entities + [job])
+    return done
+
+# - - - Score - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def _scores(items, cooc):
+    """Score the items co-occurring with the given ones; an item held by
+    n users and co-occurring k times with another adds k / n to it."""
+    held = set(items)
+    scores = Counter()
+    for item in items:
+        co = cooc.get(item)
+        if not co:
+            continue
+        for other, k in co.others.items():
+            if other not in held:
+                scores[other] += float(k) / co.count
+    return scores
+
+
+def _top(scores, kind, entities, boost=None):
+    prefix = kind + ':'
+    ranked = []
+    for item, score in scores.items():
+        if not item.startswith(prefix):
+            continue
+        entity = entities.get(item)
+        if not entity:
+            # deleted or archived since it was tallied
+            continue
+        if boost:
+            score += boost(entity)
+        ranked.append(RecommendedItem(websafeKey=item[len(prefix):],
+                                      name=entity.name, score=score))
+    ranked.sort(key=lambda r: -r.score)
+    return ranked[:TOP_N]
+
+
+def _score_chunk(job):
+    profiles, cursor = _next_page(job)
+    items = dict((prof.key.id(), _items(prof)) for prof in profiles)
+
+    keys = [ndb.Key(CoOccurrence, item, parent=job.key)
+            for item in set(i for held in items.values() for i in held)]
+    cooc = dict((key.id(), co) for key, co in zip(keys, ndb.get_multi(keys)) if co)
+
+    scores = {}
+    candidates = set()
+    for prof in profiles:
+        user_scores = _scores(items[prof.key.id()], cooc)
+        # only the best few are looked up; the topic boost can't lift a
+        # conference much further than that
+        scores[prof.key.id()] = Counter(dict(user_scores.most_common(TOP_N * 3)))
+        candidates.update(scores[prof.key.id()])
+
+    candidates = sorted(candidates)
+    loaded = ndb.get_multi([ndb.Key(urlsafe=item.split(':', 1)[1])
+                            for item in candidates])
+    entities = dict(zip(candidates, loaded))
+
+    recommendations = []
+    for prof in profiles:
+        interests = set(prof.interestedTopics)
+        boost = lambda conf: TOPIC_BOOST * len(interests.intersection(conf.topics))
+        user_scores = scores[prof.key.id()]
+        recommendations.append(Recommendation(
+            id=prof.key.id(),
+            sessions=_top(user_scores, 'session', entities),
+            conferences=_top(user_scores, 'conference', entities, boost)))
+    # rewriting recommendations is harmless, so no transaction here
+    ndb.put_multi(recommendations)
+
+    _advance(job, cursor, 'cleanup')
+    job.put()
+
+# - - - Cleanup - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def _cleanup_chunk(job):
+    jobs = RecommenderJob.query(
+        RecommenderJob.started <= job.started).fetch(keys_only=True)
+    for job_key in jobs:
+        keys = CoOccurrence.query(ancestor=job_key).fetch(
+            CLEANUP_BATCH, keys_only=True)
+        if keys:
+            ndb.delete_multi(keys)
+            return
+        if job_key != job.key:
+            job_key.delete()
+    job.phase = 'done'
+    job.finished = datetime.utcnow()
+    job.put()
+
+
+PHASES = {
+    'count': _count_chunk,
+    'score': _score_chunk,
+    'cleanup': _cleanup_chunk,
+}
@@ -16,3 +16,17 @@ WEB_CLIENT_ID = '554895272694-og9k6thiuv0q4ohbpp0pnfus8kkftc35.apps.googleuserco
 ANDROID_CLIENT_ID = 'replace with Android client ID'
 IOS_CLIENT_ID = 'replace with iOS client ID'
 ANDROID_AUDIENCE = WEB_CLIENT_ID
+
+# Requests allowed per caller within each window, by API method name:
+# (requests, window in seconds)
+RATE_LIMITS = {
+    'queryConferences': (30, 60),
+    'registerForConference': (10, 60),
+    'unregisterFromConference': (10, 60),
+}
+
+# Fraction of requests run under the sampling profiler (see profiling.py),
+# and the X-Profile header value that has a request profiled regardless;
+# the header is ignored unless this is set to a secret
+PROFILE_SAMPLE_RATE = 0.001
+PROFILE_TOKEN = None
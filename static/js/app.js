@@ -130,3 +130,317 @@ app.factory('oauth2Provider', function ($modal) {
 
     return oauth2Provider;
 });
+
+
+/**
+ * @ngdoc service
+ * @name conferenceApi
+ *
+ * @description
+ * Shared front for the gapi.client.conference methods. Mirrors their interface
+ * (conferenceApi.getProfile(params).execute(callback)), but identical read calls in flight are sent
+ * once, read responses are cached for a per-method TTL and revalidated by version where the server
+ * supports it, and mutations drop the cached reads they affect.
+ *
+ */
+app.factory('conferenceApi', function () {
+    /**
+     * Milliseconds a response of each read method is served from the cache.
+     */
+    var CACHE_TTL = {
+        getProfile: 60000,
+        getConference: 30000,
+        getConferences: 30000,
+        getConferenceDetail: 30000,
+        getConferenceSessions: 30000,
+        getConferenceSessionsCompact: 30000,
+        getConferencesCreated: 30000,
+        getConferencesToAttend: 30000,
+        getSessionsInWishlist: 30000,
+        getRecommendations: 300000,
+        queryConferences: 30000,
+        queryConferencesCompact: 30000
+    };
+
+    /**
+     * Read methods that accept a version and may answer notModified once the TTL has expired.
+     */
+    var VERSIONED = {
+        getConference: true,
+        getConferenceSessions: true,
+        getConferenceSessionsCompact: true,
+        queryConferences: true,
+        queryConferencesCompact: true
+    };
+
+    /**
+     * Cached read methods invalidated by each mutation.
+     */
+    var INVALIDATES = {
+        saveProfile: ['getProfile'],
+        createConference: ['queryConferences', 'queryConferencesCompact', 'getConferencesCreated'],
+        updateConference: ['queryConferences', 'queryConferencesCompact', 'getConferencesCreated',
+            'getConferencesToAttend', 'getConference', 'getConferences', 'getConferenceDetail'],
+        registerForConference: ['getProfile', 'queryConferences', 'queryConferencesCompact',
+            'getConferencesToAttend', 'getConference', 'getConferences', 'getConferenceDetail'],
+        unregisterFromConference: ['getProfile', 'queryConferences', 'queryConferencesCompact',
+            'getConferencesToAttend', 'getConference', 'getConferences', 'getConferenceDetail'],
+        createSession: ['getConferenceSessions', 'getConferenceSessionsCompact', 'getConferenceDetail'],
+        addSessionToWishlist: ['getProfile', 'getSessionsInWishlist', 'getConferenceDetail'],
+        deleteSessionInWishlist: ['getProfile', 'getSessionsInWishlist', 'getConferenceDetail']
+    };
+
+    var METHODS = [
+        'getProfile', 'saveProfile', 'createConference', 'updateConference', 'getConference',
+        'getConferences', 'getConferenceDetail', 'getConferencesCreated', 'queryConferences', 'queryConferencesCompact',
+        'getConferencesToAttend', 'registerForConference', 'unregisterFromConference', 'joinWaitlist',
+        'leaveWaitlist', 'getWaitlistPosition', 'getConferenceSessions', 'getConferenceSessionsCompact',
+        'createSession', 'addSessionToWishlist', 'deleteSessionInWishlist', 'getSessionsInWishlist',
+        'getMyScheduleConflicts', 'getRecommendations', 'getAnnouncement', 'getFeaturedSpeaker',
+        'getCalendarFeedUrl'
+    ];
+
+    var cache = {};
+    var inFlight = {};
+
+    var cacheKey = function (method, params) {
+        return method + ':' + JSON.stringify(params);
+    };
+
+    /**
+     * Drops the cached responses of the given methods.
+     */
+    var invalidate = function (methods) {
+        angular.forEach(Object.keys(cache), function (key) {
+            if (methods.indexOf(key.split(':')[0]) >= 0) {
+                delete cache[key];
+            }
+        });
+    };
+
+    /**
+     * Hands a private copy of the response to each callback, asynchronously like gapi does so callers
+     * can $apply.
+     */
+    var deliver = function (callbacks, resp) {
+        setTimeout(function () {
+            angular.forEach(callbacks, function (callback) {
+                callback(angular.copy(resp));
+            });
+        }, 0);
+    };
+
+    var call = function (method, params, callback) {
+        if (!CACHE_TTL[method]) {
+            gapi.client.conference[method](params).execute(function (resp) {
+                if (resp && !resp.error && INVALIDATES[method]) {
+                    invalidate(INVALIDATES[method]);
+                }
+                callback(resp);
+            });
+            return;
+        }
+
+        var key = cacheKey(method, params);
+        var entry = cache[key];
+        if (entry && entry.expires > Date.now()) {
+            deliver([callback], entry.resp);
+            return;
+        }
+        if (inFlight[key]) {
+            inFlight[key].push(callback);
+            return;
+        }
+        inFlight[key] = [callback];
+
+        var sendParams = params;
+        if (entry && VERSIONED[method] && entry.resp.result && entry.resp.result.version) {
+            sendParams = angular.extend({version: entry.resp.result.version}, params);
+        }
+        gapi.client.conference[method](sendParams).execute(function (resp) {
+            if (resp && !resp.error) {
+                if (entry && resp.result && resp.result.notModified) {
+                    // Still current; keep serving the cached copy.
+                    resp = entry.resp;
+                }
+                cache[key] = {resp: resp, expires: Date.now() + CACHE_TTL[method]};
+            }
+            var callbacks = inFlight[key];
+            delete inFlight[key];
+            deliver(callbacks, resp);
+        });
+    };
+
+    var conferenceApi = {
+        /**
+         * Drops every cached response, e.g. when the signed in user changes.
+         */
+        clear: function () {
+            cache = {};
+        }
+    };
+    angular.forEach(METHODS, function (method) {
+        conferenceApi[method] = function (params) {
+            return {
+                execute: function (callback) {
+                    call(method, params || {}, callback);
+                }
+            };
+        };
+    });
+    return conferenceApi;
+});
+
+
+/**
+ * @ngdoc service
+ * @name compactCodec
+ *
+ * @description
+ * Turns the columnar responses of the *Compact methods (see compact.py) back into the
+ * {items: [...]} shape of the standard SessionForms / ConferenceForms responses.
+ *
+ */
+app.factory('compactCodec', function () {
+    var lookup = function (strings, index) {
+        return index >= 0 ? strings[index] : undefined;
+    };
+
+    var pad = function (n) {
+        return (n < 10 ? '0' : '') + n;
+    };
+
+    /**
+     * Returns a function mapping a day offset from base ('YYYY-MM-DD') to a date string, memoised as
+     * many items share a date.
+     */
+    var dateDecoder = function (base) {
+        var memo = {};
+        var parts = base ? base.split('-') : [];
+        return function (offset) {
+            if (offset === undefined || offset < 0 || !base) {
+                return undefined;
+            }
+            if (!(offset in memo)) {
+                var d = new Date(Date.UTC(+parts[0], parts[1] - 1, +parts[2] + offset));
+                memo[offset] = d.getUTCFullYear() + '-' + pad(d.getUTCMonth() + 1) + '-' + pad(d.getUTCDate());
+            }
+            return memo[offset];
+        };
+    };
+
+    var column = function (resp, name) {
+        return resp[name] || [];
+    };
+
+    return {
+        decodeSessions: function (resp) {
+            var strings = column(resp, 'strings');
+            var date = dateDecoder(resp.baseDate);
+            var names = column(resp, 'name');
+            var items = [];
+            for (var i = 0; i < names.length; i++) {
+                var minutes = +column(resp, 'startTime')[i];
+                items.push({
+                    name: names[i],
+                    highlights: column(resp, 'highlights')[i] || undefined,
+                    speaker: lookup(strings, column(resp, 'speaker')[i]),
+                    durationMinutes: column(resp, 'durationMinutes')[i],
+                    typeOfSession: lookup(strings, column(resp, 'typeOfSession')[i]),
+                    date: date(column(resp, 'date')[i]),
+                    startTime: pad(Math.floor(minutes / 60)) + ':' + pad(minutes % 60),
+                    websafeKey: column(resp, 'websafeKey')[i]
+                });
+            }
+            return {items: items, version: resp.version};
+        },
+
+        decodeConferences: function (resp) {
+            var strings = column(resp, 'strings');
+            var startDate = dateDecoder(resp.startBaseDate);
+            var endDate = dateDecoder(resp.endBaseDate);
+            var names = column(resp, 'name');
+            var topics = column(resp, 'topics');
+            var topicStart = 0;
+            var items = [];
+            for (var i = 0; i < names.length; i++) {
+                var count = column(resp, 'topicCount')[i] || 0;
+                var conferenceTopics = [];
+                for (var j = topicStart; j < topicStart + count; j++) {
+                    conferenceTopics.push(strings[topics[j]]);
+                }
+                topicStart += count;
+                items.push({
+                    name: names[i],
+                    description: column(resp, 'description')[i] || undefined,
+                    organizerUserId: lookup(strings, column(resp, 'organizerUserId')[i]),
+                    organizerDisplayName: lookup(strings, column(resp, 'organizerDisplayName')[i]),
+                    topics: conferenceTopics,
+                    city: lookup(strings, column(resp, 'city')[i]),
+                    startDate: startDate(column(resp, 'startDate')[i]),
+                    endDate: endDate(column(resp, 'endDate')[i]),
+                    month: column(resp, 'month')[i],
+                    maxAttendees: column(resp, 'maxAttendees')[i],
+                    seatsAvailable: column(resp, 'seatsAvailable')[i],
+                    websafeKey: column(resp, 'websafeKey')[i]
+                });
+            }
+            return {items: items, version: resp.version};
+        }
+    };
+});
+
+
+/**
+ * @ngdoc service
+ * @name conferenceFeed
+ *
+ * @description
+ * Loads the pre-rendered public conference feed (see feed.py): every conference, or those in one
+ * city or with one topic. The returned promise is rejected when the feed does not hold the whole
+ * list, in which case callers query the API instead.
+ *
+ */
+app.factory('conferenceFeed', function ($http, $q, compactCodec) {
+    var load = function (params) {
+        var items = [];
+        var deferred = $q.defer();
+        var fetchPage = function (page) {
+            $http.get('/feed/conferences', {params: angular.extend({page: page}, params)}).
+                success(function (data) {
+                    items = items.concat(compactCodec.decodeConferences(data).items);
+                    if (data.more) {
+                        fetchPage(page + 1);
+                    } else {
+                        deferred.resolve({items: items});
+                    }
+                }).
+                error(function () {
+                    deferred.reject();
+                });
+        };
+        fetchPage(0);
+        return deferred.promise;
+    };
+
+    /**
+     * Returns the feed parameters serving the given query filters, or null if no feed does: only
+     * no filter at all, or a single equality filter on city or topic, are pre-rendered.
+     */
+    var paramsFor = function (filters) {
+        if (filters.length == 0) {
+            return {};
+        }
+        if (filters.length == 1 && filters[0].operator == 'EQ') {
+            if (filters[0].field == 'CITY') {
+                return {city: filters[0].value};
+            }
+            if (filters[0].field == 'TOPIC') {
+                return {topic: filters[0].value};
+            }
+        }
+        return null;
+    };
+
+    return {load: load, paramsFor: paramsFor};
+});
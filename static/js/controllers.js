@@ -25,7 +25,7 @@ conferenceApp.controllers = angular.module('conferenceControllers', ['ui.bootstr
  * A controller used for the My Profile page.
  */
 conferenceApp.controllers.controller('MyProfileCtrl',
-    function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+    function ($scope, $log, oauth2Provider, conferenceApi, HTTP_ERRORS) {
         $scope.submitted = false;
         $scope.loading = false;
 
@@ -63,7 +63,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
             var retrieveProfileCallback = function () {
                 $scope.profile = {};
                 $scope.loading = true;
-                gapi.client.conference.getProfile().
+                conferenceApi.getProfile().
                     execute(function (resp) {
                         $scope.$apply(function () {
                             $scope.loading = false;
@@ -94,7 +94,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
         $scope.saveProfile = function () {
             $scope.submitted = true;
             $scope.loading = true;
-            gapi.client.conference.saveProfile($scope.profile).
+            conferenceApi.saveProfile($scope.profile).
                 execute(function (resp) {
                     $scope.$apply(function () {
                         $scope.loading = false;
@@ -124,6 +124,37 @@ conferenceApp.controllers.controller('MyProfileCtrl',
                     });
                 });
         };
+
+        /**
+         * Invokes the conference.getCalendarFeedUrl API; with reset, the feed moves to a new URL and the
+         * old one stops working.
+         *
+         * @param reset whether to replace the current URL
+         */
+        $scope.getCalendarFeedUrl = function (reset) {
+            $scope.loading = true;
+            conferenceApi.getCalendarFeedUrl({reset: !!reset}).
+                execute(function (resp) {
+                    $scope.$apply(function () {
+                        $scope.loading = false;
+                        if (resp.error) {
+                            // The request has failed.
+                            var errorMessage = resp.error.message || '';
+                            $scope.messages = 'Failed to get the calendar feed : ' + errorMessage;
+                            $scope.alertStatus = 'warning';
+                            $log.error($scope.messages);
+
+                            if (resp.code && resp.code == HTTP_ERRORS.UNAUTHORIZED) {
+                                oauth2Provider.showLoginModal();
+                                return;
+                            }
+                        } else {
+                            // The request has succeeded.
+                            $scope.calendarFeedUrl = resp.result.data;
+                        }
+                    });
+                });
+        };
     })
 ;
 
@@ -135,7 +166,7 @@ conferenceApp.controllers.controller('MyProfileCtrl',
  * A controller used for the Create conferences page.
  */
 conferenceApp.controllers.controller('CreateConferenceCtrl',
-    function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+    function ($scope, $log, oauth2Provider, conferenceApi, HTTP_ERRORS) {
 
         /**
          * The conference object being edited in the page.
@@ -143,6 +174,13 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
          */
         $scope.conference = $scope.conference || {};
 
+        /**
+         * Idempotency key for the conference being edited, so that retried submissions of the same
+         * conference are not created twice. Renewed once the conference has been created.
+         * @type {string}
+         */
+        $scope.idempotencyKey = Date.now().toString(36) + Math.random().toString(36).slice(2);
+
         /**
          * Holds the default values for the input candidates for city select.
          * @type {string[]}
@@ -214,7 +252,8 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
             }
 
             $scope.loading = true;
-            gapi.client.conference.createConference($scope.conference).
+            conferenceApi.createConference(
+                angular.extend({idempotencyKey: $scope.idempotencyKey}, $scope.conference)).
                 execute(function (resp) {
                     $scope.$apply(function () {
                         $scope.loading = false;
@@ -235,6 +274,7 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
                             $scope.alertStatus = 'success';
                             $scope.submitted = false;
                             $scope.conference = {};
+                            $scope.idempotencyKey = Date.now().toString(36) + Math.random().toString(36).slice(2);
                             $log.info($scope.messages + ' : ' + JSON.stringify(resp.result));
                         }
                     });
@@ -249,7 +289,8 @@ conferenceApp.controllers.controller('CreateConferenceCtrl',
  * @description
  * A controller used for the Show conferences page.
  */
-conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $log, oauth2Provider, HTTP_ERRORS) {
+conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $log, oauth2Provider, conferenceApi, compactCodec,
+                                                                          conferenceFeed, HTTP_ERRORS) {
 
     /**
      * Holds the status if the query is being executed.
@@ -424,7 +465,8 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     };
 
     /**
-     * Invokes the conference.queryConferences API.
+     * Loads the conferences from the pre-rendered feed when it serves the filters, or else from the
+     * conference.queryConferencesCompact API.
      */
     $scope.queryConferencesAll = function () {
         var sendFilters = {
@@ -440,8 +482,29 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                 });
             }
         }
+        var feedParams = conferenceFeed.paramsFor(sendFilters.filters);
         $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
+        if (feedParams) {
+            conferenceFeed.load(feedParams).then(function (feed) {
+                $scope.loading = false;
+                $scope.messages = 'Query succeeded : ' + JSON.stringify(sendFilters);
+                $scope.alertStatus = 'success';
+                $log.info($scope.messages);
+                $scope.conferences = feed.items;
+                $scope.submitted = true;
+            }, function () {
+                $scope.queryConferencesApi(sendFilters);
+            });
+        } else {
+            $scope.queryConferencesApi(sendFilters);
+        }
+    };
+
+    /**
+     * Invokes the conference.queryConferencesCompact API.
+     */
+    $scope.queryConferencesApi = function (sendFilters) {
+        conferenceApi.queryConferencesCompact(sendFilters).
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -458,10 +521,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         $scope.alertStatus = 'success';
                         $log.info($scope.messages);
 
-                        $scope.conferences = [];
-                        angular.forEach(resp.items, function (conference) {
-                            $scope.conferences.push(conference);
-                        });
+                        $scope.conferences = compactCodec.decodeConferences(resp).items;
                     }
                     $scope.submitted = true;
                 });
@@ -473,7 +533,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesCreated = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesCreated().
+        conferenceApi.getConferencesCreated().
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -511,7 +571,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesAttend = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesToAttend().
+        conferenceApi.getConferencesToAttend().
             execute(function (resp) {
                 $scope.$apply(function () {
                     if (resp.error) {
@@ -547,19 +607,27 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
  * @description
  * A controller used for the conference detail page.
  */
-conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $log, $routeParams, HTTP_ERRORS) {
+conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $log, $routeParams, oauth2Provider, conferenceApi,
+                                                                     HTTP_ERRORS) {
     $scope.conference = {};
 
+    $scope.sessions = [];
+
+    $scope.speakers = [];
+
     $scope.isUserAttending = false;
 
+    $scope.hasWaitlist = false;
+
     /**
      * Initializes the conference detail page.
-     * Invokes the conference.getConference method and sets the returned conference in the $scope.
+     * Invokes the conference.getConferenceDetail method and sets the returned conference, its sessions and
+     * speakers and the user's registration state in the $scope.
      *
      */
     $scope.init = function () {
         $scope.loading = true;
-        gapi.client.conference.getConference({
+        conferenceApi.getConferenceDetail({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -574,27 +642,16 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
                 } else {
                     // The request has succeeded.
                     $scope.alertStatus = 'success';
-                    $scope.conference = resp.result;
-                }
-            });
-        });
-
-        $scope.loading = true;
-        // If the user is attending the conference, updates the status message and available function.
-        gapi.client.conference.getProfile().execute(function (resp) {
-            $scope.$apply(function () {
-                $scope.loading = false;
-                if (resp.error) {
-                    // Failed to get a user profile.
-                } else {
-                    var profile = resp.result;
-                    for (var i = 0; i < profile.conferenceKeysToAttend.length; i++) {
-                        if ($routeParams.websafeConferenceKey == profile.conferenceKeysToAttend[i]) {
-                            // The user is attending the conference.
-                            $scope.alertStatus = 'info';
-                            $scope.messages = 'You are attending this conference';
-                            $scope.isUserAttending = true;
-                        }
+                    $scope.conference = resp.result.conference;
+                    $scope.sessions = resp.result.sessions || [];
+                    $scope.speakers = resp.result.speakers || [];
+                    // free seats go to waitlisted users first
+                    $scope.hasWaitlist = !!resp.result.hasWaitlist;
+                    if (resp.result.isUserAttending) {
+                        // The user is attending the conference.
+                        $scope.alertStatus = 'info';
+                        $scope.messages = 'You are attending this conference';
+                        $scope.isUserAttending = true;
                     }
                 }
             });
@@ -607,7 +664,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
      */
     $scope.registerForConference = function () {
         $scope.loading = true;
-        gapi.client.conference.registerForConference({
+        conferenceApi.registerForConference({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -644,7 +701,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
      */
     $scope.unregisterFromConference = function () {
         $scope.loading = true;
-        gapi.client.conference.unregisterFromConference({
+        conferenceApi.unregisterFromConference({
             websafeConferenceKey: $routeParams.websafeConferenceKey
         }).execute(function (resp) {
             $scope.$apply(function () {
@@ -679,6 +736,36 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
             });
         });
     };
+
+    /**
+     * Invokes the conference.joinWaitlist method.
+     */
+    $scope.joinWaitlist = function () {
+        $scope.loading = true;
+        conferenceApi.joinWaitlist({
+            websafeConferenceKey: $routeParams.websafeConferenceKey
+        }).execute(function (resp) {
+            $scope.$apply(function () {
+                $scope.loading = false;
+                if (resp.error) {
+                    // The request has failed.
+                    var errorMessage = resp.error.message || '';
+                    $scope.messages = 'Failed to join the waitlist : ' + errorMessage;
+                    $scope.alertStatus = 'warning';
+                    $log.error($scope.messages);
+
+                    if (resp.code && resp.code == HTTP_ERRORS.UNAUTHORIZED) {
+                        oauth2Provider.showLoginModal();
+                        return;
+                    }
+                } else {
+                    // Joined; the user is emailed once promoted into a seat, so there is no need to poll.
+                    $scope.messages = 'You are on the waitlist and will be registered when a seat frees up';
+                    $scope.alertStatus = 'info';
+                }
+            });
+        });
+    };
 });
 
 
@@ -691,7 +778,7 @@ conferenceApp.controllers.controller('ConferenceDetailCtrl', function ($scope, $
  * such as user authentications.
  *
  */
-conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oauth2Provider) {
+conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oauth2Provider, conferenceApi) {
 
     /**
      * Returns if the viewLocation is the currently viewed page.
@@ -717,6 +804,7 @@ conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oa
      */
     $scope.signIn = function () {
         oauth2Provider.signIn(function () {
+            conferenceApi.clear();
             gapi.client.oauth2.userinfo.get().execute(function (resp) {
                 $scope.$apply(function () {
                     if (resp.email) {
@@ -755,6 +843,7 @@ conferenceApp.controllers.controller('RootCtrl', function ($scope, $location, oa
      */
     $scope.signOut = function () {
         oauth2Provider.signOut();
+        conferenceApi.clear();
         $scope.alertStatus = 'success';
         $scope.rootMessages = 'Logged out';
     };
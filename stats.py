@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+"""
+stats.py -- Udacity conference server-side Python App Engine
+    incrementally maintained aggregate counters for dashboards
+
+$Id$
+
+Write paths queue counter deltas as pull tasks (transactionally where the
+write is transactional). A cron job folds all pending deltas into
+AggregateCounter entities, so a busy counter is written once per run
+rather than once per registration. Counters are named
+
+    conferences, registrations, sessions
+    city:<city>:conferences          city:<city>:registrations
+    topic:<topic>:conferences        topic:<topic>:registrations
+    month:<month>:conferences        month:<month>:registrations
+    sessionType:<type>:sessions
+    conference:<websafeKey>:registrations
+    conference:<websafeKey>:sessions
+    conference:<websafeKey>:sessionType:<type>
+
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+
+from google.appengine.api import memcache
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+from models import AggregateCounter
+from models import Conference
+from models import Profile
+from models import Session
+
+STATS_QUEUE = 'stats'
+LEASE_SECONDS = 60
+LEASE_BATCH = 1000
+FOLD_BUDGET_SECONDS = 50
+MAX_GROUPS_PER_TRANSACTION = 25
+MEMCACHE_DRIFT_KEY = "STATS_DRIFT"
+
+# - - - Deltas - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def conference_deltas(conf, n=1):
+    """Deltas for n conferences like conf being added (n < 0: removed)."""
+    deltas = Counter({'conferences': n})
+    deltas['city:%s:conferences' % conf.city] += n
+    deltas['month:%s:conferences' % (conf.month or 0)] += n
+    for topic in conf.topics:
+        deltas['topic:%s:conferences' % topic] += n
+    return deltas
+
+
+def registration_deltas(conf, n=1):
+    """Deltas for n registrations to conf (n < 0: unregistrations)."""
+    deltas = Counter({'registrations': n})
+    deltas['conference:%s:registrations' % conf.key.urlsafe()] += n
+    deltas['city:%s:registrations' % conf.city] += n
+    deltas['month:%s:registrations' % (conf.month or 0)] += n
+    for topic in conf.topics:
+        deltas['topic:%s:registrations' % topic] += n
+    return deltas
+
+
+def session_deltas(session, n=1):
+    """Deltas for a session being added (n < 0: removed)."""
+    wsck = session.key.parent().urlsafe()
+    session_type = session.typeOfSession or 'NOT_SPECIFIED'
+    deltas = Counter({'sessions': n})
+    deltas['sessionType:%s:sessions' % session_type] += n
+    deltas['conference:%s:sessions' % wsck] += n
+    deltas['conference:%s:sessionType:%s' % (wsck, session_type)] += n
+    return deltas
+
+
+def enqueue(deltas, transactional=False):
+    """Queue counter deltas to be folded in by the next cron run."""
+    deltas = dict((name, n) for name, n in deltas.items() if n)
+    if deltas:
+        taskqueue.Queue(STATS_QUEUE).add(
+            taskqueue.Task(payload=json.dumps(deltas), method='PULL'),
+            transactional=transactional)
+
+# - - - Folding - - - - - - - - - - - - - - - - - - - - - - -
+
+
+@ndb.transactional(xg=True)
+def _apply_chunk(deltas):
+    keys = [ndb.Key(AggregateCounter, name) for name in deltas]
+    counters = [counter or AggregateCounter(key=key)
+                for key, counter in zip(keys, ndb.get_multi(keys))]
+    for counter in counters:
+        counter.count += deltas[counter.key.id()]
+    ndb.put_multi(counters)
+
+
+def apply_deltas(deltas):
+    """Add deltas to their counters, one transaction per 25 counters."""
+    names = sorted(deltas)
+    for i in range(0, len(names), MAX_GROUPS_PER_TRANSACTION):
+        _apply_chunk(dict((name, deltas[name]) for name in
+                          names[i:i + MAX_GROUPS_PER_TRANSACTION]))
+
+
+def fold_pending():
+    """Fold queued deltas into the counters; used by cron.
+
+    Returns the number of tasks folded. A run that dies between applying
+    and deleting a batch counts it twice; reconcile() finds and repairs
+    that.
+    """
+    queue = taskqueue.Queue(STATS_QUEUE)
+    deadline = time.time() + FOLD_BUDGET_SECONDS
+    folded = 0
+    while time.time() < deadline:
+        tasks = queue.lease_tasks(LEASE_SECONDS, LEASE_BATCH)
+        if not tasks:
+            break
+        deltas = Counter()
+        for task in tasks:
+            deltas.update(json.loads(task.payload))
+        apply_deltas(deltas)
+        queue.delete_tasks(tasks)
+        folded += len(tasks)
+    return folded
+
+# - - - Reading - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def get_counts(names):
+    """Return {name: count} for the given counter names."""
+    counters = ndb.get_multi([ndb.Key(AggregateCounter, name) for name in names])
+    return dict((name, counter.count if counter else 0)
+                for name, counter in zip(names, counters))
+
+
+def get_prefixed(prefix):
+    """Return {name: count} for every counter whose name starts with prefix."""
+    q = AggregateCounter.query(
+        AggregateCounter.key >= ndb.Key(AggregateCounter, prefix),
+        AggregateCounter.key < ndb.Key(AggregateCounter, prefix + u'\ufffd'))
+    return dict((counter.key.id(), counter.count) for counter in q)
+
+# - - - Reconciliation - - - - - - - - - - - - - - - - - - - -
+
+
+def recompute():
+    """Return every counter's expected value, computed from scratch."""
+    expected = Counter()
+    registrations = Counter()
+    for prof in Profile.query().iter(batch_size=500):
+        registrations.update(prof.conferenceKeysToAttend)
+
+    for conf in Conference.query().iter(batch_size=500):
+        expected.update(conference_deltas(conf))
+        n = registrations.get(conf.key.urlsafe())
+        if n:
+            expected.update(registration_deltas(conf, n))
+
+    for session in Session.query().iter(batch_size=500):
+        expected.update(session_deltas(session))
+    return expected
+
+
+def reconcile():
+    """Recompute all counters and return the drift as
+    {name: stored - expected}; used by cron.
+
+    Counters are not overwritten: the scan is no snapshot, so a write
+    made during it can be in the expected counts while its delta is
+    still queued. Such drift is gone by the next run, once the delta is
+    folded; drift that is the same on two runs in a row is repaired by
+    folding in the difference, which adds up with concurrent folds.
+    """
+    fold_pending()
+    expected = recompute()
+    stored = {}
+    for counter in AggregateCounter.query().iter(batch_size=500):
+        stored[counter.key.id()] = counter.count
+
+    drift = {}
+    for name in set(stored) | set(expected):
+        delta = stored.get(name, 0) - expected.get(name, 0)
+        if delta:
+            drift[name] = delta
+            logging.warning('Counter %s drifted by %d', name, delta)
+
+    previous = memcache.get(MEMCACHE_DRIFT_KEY) or {}
+    repairs = dict((name, -delta) for name, delta in drift.items()
+                   if previous.get(name) == delta)
+    apply_deltas(repairs)
+    # repaired counters start over
+    memcache.set(MEMCACHE_DRIFT_KEY,
+                 dict((name, delta) for name, delta in drift.items()
+                      if name not in repairs))
+    return drift
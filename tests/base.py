@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""
+base.py -- Udacity conference server-side Python App Engine
+    App Engine testbed shared by the tests
+
+$Id$
+
+Run from the repository root with the App Engine SDK (and its endpoints
+library) on the path:
+
+    python -m unittest discover -s tests -t .
+
+"""
+
+import os
+import unittest
+
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AppEngineTestCase(unittest.TestCase):
+    """Runs each test against fresh datastore, memcache & task queue stubs."""
+
+    def setUp(self):
+        self.testbed = testbed.Testbed()
+        self.testbed.activate()
+        # queries see every write, like the tests expect
+        policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+        self.testbed.init_datastore_v3_stub(consistency_policy=policy)
+        self.testbed.init_memcache_stub()
+        # queue.yaml is read from the root
+        self.testbed.init_taskqueue_stub(root_path=ROOT)
+        self.testbed.init_app_identity_stub()
+        self.testbed.init_user_stub()
+        self.testbed.init_mail_stub()
+        ndb.get_context().clear_cache()
+        self.taskqueue = self.testbed.get_stub(testbed.TASKQUEUE_SERVICE_NAME)
+
+    def tearDown(self):
+        self.testbed.deactivate()
+
+    def login(self, email):
+        """Make endpoints.get_current_user() return the user of email."""
+        self.testbed.setup_env(ENDPOINTS_AUTH_EMAIL=email,
+                               ENDPOINTS_AUTH_DOMAIN='gmail.com',
+                               overwrite=True)
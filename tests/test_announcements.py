@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+"""
+test_announcements.py -- Udacity conference server-side Python App Engine
+    tests of the featured speaker
+
+$Id$
+
+"""
+
+import unittest
+
+import announcements
+from models import Speaker
+from tests.base import AppEngineTestCase
+
+
+class FeaturedSpeakerTest(AppEngineTestCase):
+
+    def _put_speaker(self, name, sessions):
+        speaker = Speaker(name=name, sessions=sessions)
+        speaker.put()
+        return speaker
+
+    def test_regenerates_last_featured_speaker(self):
+        featured = self._put_speaker('Ada', ['Engines', 'Notes'])
+        self._put_speaker('Grace', ['Compilers', 'COBOL', 'Bugs'])
+        announcements.cache_featured_speaker(featured.key.urlsafe())
+
+        self.assertEqual(announcements.make_featured_speaker(),
+                         'Featured Speaker: Ada | Sessions: Engines, Notes')
+
+    def test_skips_speaker_with_one_session(self):
+        speaker = self._put_speaker('Ada', ['Engines'])
+        announcements.cache_featured_speaker(speaker.key.urlsafe())
+
+        self.assertEqual(announcements.make_featured_speaker(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+test_archive.py -- Udacity conference server-side Python App Engine
+    tests of the archival of ended conferences
+
+$Id$
+
+"""
+
+import unittest
+from datetime import date, datetime, time
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+import endpoints
+from protorpc import message_types
+
+import archive
+from conference import CONF_REGISTER_REQUEST
+from conference import ConferenceApi
+from models import ArchivedConference
+from models import ArchivedSession
+from models import ConferenceKeysForm
+from models import Conference
+from models import Profile
+from models import Session
+from models import MEMCACHE_CONFERENCE_VERSION_KEY
+from tests.base import AppEngineTestCase
+
+
+class ArchiveConferenceTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(ArchiveConferenceTest, self).setUp()
+        self.conf_key = Conference(
+            parent=ndb.Key(Profile, 'organizer@example.com'),
+            name='PyCon', city='Montreal', topics=['Python'],
+            organizerUserId='organizer@example.com',
+            startDate=date(2020, 5, 1), endDate=date(2020, 5, 3), month=5,
+            maxAttendees=10, seatsAvailable=8).put()
+        self.session_key = Session(
+            parent=self.conf_key, name='Keynote', speaker='Guido',
+            durationMinutes=60, typeOfSession='lecture',
+            date=date(2020, 5, 1), startTime=time(9, 30)).put()
+
+    def test_archives_dated_conference_and_sessions(self):
+        archive._archive_conference(self.conf_key)
+
+        self.assertIsNone(self.conf_key.get())
+        self.assertIsNone(self.session_key.get())
+        conf = archive.archived_key(self.conf_key).get()
+        self.assertIsInstance(conf, ArchivedConference)
+        self.assertEqual(conf.startDate, date(2020, 5, 1))
+        self.assertEqual(conf.endDate, date(2020, 5, 3))
+        session = archive.archived_key(self.session_key).get()
+        self.assertIsInstance(session, ArchivedSession)
+        self.assertEqual(session.date, date(2020, 5, 1))
+        self.assertEqual(session.startTime, time(9, 30))
+        self.assertEqual(session.endDateTime, datetime(2020, 5, 1, 10, 30))
+
+    def test_archived_sessions_are_found_by_end_time(self):
+        archive._archive_conference(self.conf_key)
+
+        finished = ArchivedSession.query(
+            ArchivedSession.endDateTime < datetime(2020, 5, 2)).fetch()
+        self.assertEqual([s.name for s in finished], ['Keynote'])
+
+    def test_get_multi_falls_back_to_archive(self):
+        archive._archive_conference(self.conf_key)
+
+        conf, = archive.get_multi([self.conf_key])
+        self.assertEqual(conf.name, 'PyCon')
+
+    def test_run_clears_version_stamps(self):
+        key = MEMCACHE_CONFERENCE_VERSION_KEY % self.conf_key.urlsafe()
+        self.assertIsNotNone(memcache.get(key))
+
+        archive.run()
+        self.assertIsNone(memcache.get(key))
+
+
+class ArchivedConferenceApiTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(ArchivedConferenceApiTest, self).setUp()
+        Profile(id='organizer@example.com', displayName='Org').put()
+        self.conf_key = Conference(
+            parent=ndb.Key(Profile, 'organizer@example.com'), name='PyCon',
+            organizerUserId='organizer@example.com',
+            startDate=date(2020, 5, 1), endDate=date(2020, 5, 3),
+            maxAttendees=10, seatsAvailable=9).put()
+        self.wsck = self.conf_key.urlsafe()
+        Profile(id='user@example.com', conferenceKeysToAttend=[self.wsck]).put()
+        archive._archive_conference(self.conf_key)
+        self.api = ConferenceApi()
+        self.login('user@example.com')
+
+    def test_batch_returns_requested_key(self):
+        form, = self.api.get_conferences(
+            ConferenceKeysForm(websafeConferenceKeys=[self.wsck])).items
+
+        self.assertEqual(form.websafeKey, self.wsck)
+        self.assertTrue(form.archived)
+
+    def test_attending_returns_registered_key(self):
+        form, = self.api.get_conferences_to_attend(message_types.VoidMessage()).items
+
+        self.assertEqual(form.websafeKey, self.wsck)
+
+    def test_rejects_registration_into_archive(self):
+        archived_wsck = archive.archived_key(self.conf_key).urlsafe()
+        request = CONF_REGISTER_REQUEST.combined_message_class(
+            websafeConferenceKey=archived_wsck)
+
+        with self.assertRaises(endpoints.NotFoundException):
+            self.api.register_for_conference(request)
+        self.assertEqual(archive.archived_key(self.conf_key).get().seatsAvailable, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""
+test_compact.py -- Udacity conference server-side Python App Engine
+    round-trip tests of the columnar Session/Conference encoding
+
+$Id$
+
+"""
+
+import json
+import unittest
+from datetime import date, datetime, time, timedelta
+
+import compact
+
+
+class _Key(object):
+
+    def __init__(self, urlsafe):
+        self._urlsafe = urlsafe
+
+    def urlsafe(self):
+        return self._urlsafe
+
+
+class _Item(object):
+
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def _string(columns, index):
+    return None if index == -1 else columns['strings'][index]
+
+
+def _date(base, offset):
+    if offset == -1:
+        return None
+    return datetime.strptime(base, '%Y-%m-%d').date() + timedelta(days=offset)
+
+
+def _decode_sessions(columns):
+    """Rebuild session dicts from columns, like the web client does."""
+    # the columns go over the wire as JSON
+    columns = json.loads(json.dumps(columns))
+    return [{'name': columns['name'][i],
+             'highlights': columns['highlights'][i],
+             'speaker': _string(columns, columns['speaker'][i]),
+             'durationMinutes': columns['durationMinutes'][i],
+             'typeOfSession': _string(columns, columns['typeOfSession'][i]),
+             'date': _date(columns['baseDate'], columns['date'][i]),
+             'startTime': time(*divmod(columns['startTime'][i], 60)),
+             'websafeKey': columns['websafeKey'][i]}
+            for i in range(len(columns['name']))]
+
+
+def _decode_conferences(columns):
+    columns = json.loads(json.dumps(columns))
+    conferences = []
+    topic = 0
+    for i, count in enumerate(columns['topicCount']):
+        topics = [_string(columns, index)
+                  for index in columns['topics'][topic:topic + count]]
+        topic += count
+        conferences.append({
+            'name': columns['name'][i],
+            'organizerUserId': _string(columns, columns['organizerUserId'][i]),
+            'organizerDisplayName': _string(columns, columns['organizerDisplayName'][i]),
+            'topics': topics,
+            'city': _string(columns, columns['city'][i]),
+            'startDate': _date(columns['startBaseDate'], columns['startDate'][i]),
+            'endDate': _date(columns['endBaseDate'], columns['endDate'][i]),
+            'seatsAvailable': columns['seatsAvailable'][i],
+            'websafeKey': columns['websafeKey'][i]})
+    return conferences
+
+
+class SessionColumnsTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        sessions = [
+            _Item(key=_Key('s1'), name=u'Keynote', highlights=None,
+                  speaker=u'Guido', durationMinutes=60, typeOfSession=u'Keynote',
+                  date=date(2026, 11, 3), startTime=time(9, 30)),
+            _Item(key=_Key('s2'), name=u'Caf\xe9 talk', highlights=u'Bring a laptop',
+                  speaker=None, durationMinutes=45, typeOfSession=u'Talk',
+                  date=date(2026, 11, 2), startTime=time(0, 0)),
+            _Item(key=_Key('s3'), name=u'Panel', highlights=None,
+                  speaker=u'Guido', durationMinutes=90, typeOfSession=u'Talk',
+                  date=None, startTime=time(23, 59)),
+        ]
+
+        columns = compact.session_columns(sessions)
+
+        self.assertEqual(columns['baseDate'], '2026-11-02')
+        # repeated strings are stored once
+        self.assertEqual(sorted(columns['strings']), [u'Guido', u'Keynote', u'Talk'])
+        self.assertEqual(_decode_sessions(columns), [
+            {'name': s.name, 'highlights': s.highlights or '', 'speaker': s.speaker,
+             'durationMinutes': s.durationMinutes, 'typeOfSession': s.typeOfSession,
+             'date': s.date, 'startTime': s.startTime, 'websafeKey': s.key.urlsafe()}
+            for s in sessions])
+
+    def test_no_sessions(self):
+        columns = compact.session_columns([])
+
+        self.assertIsNone(columns['baseDate'])
+        self.assertEqual(_decode_sessions(columns), [])
+
+
+class ConferenceColumnsTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        conferences = [
+            _Item(key=_Key('c1'), name=u'PyCon', description=None,
+                  organizerUserId=u'org1', topics=[u'Python', u'Web'],
+                  city=u'Montreal', startDate=date(2026, 11, 2),
+                  endDate=date(2026, 11, 4), month=11, maxAttendees=100,
+                  seatsAvailable=3),
+            _Item(key=_Key('c2'), name=u'Unscheduled', description=u'Soon',
+                  organizerUserId=u'org2', topics=[], city=None,
+                  startDate=None, endDate=None, month=None, maxAttendees=None,
+                  seatsAvailable=None),
+            _Item(key=_Key('c3'), name=u'DjangoCon', description=None,
+                  organizerUserId=u'org1', topics=[u'Web'], city=u'Montreal',
+                  startDate=date(2026, 10, 30), endDate=date(2026, 11, 1),
+                  month=10, maxAttendees=50, seatsAvailable=50),
+        ]
+        names = {u'org1': u'Org One'}
+
+        columns = compact.conference_columns(conferences, names)
+
+        self.assertEqual(columns['topicCount'], [2, 0, 1])
+        self.assertEqual(_decode_conferences(columns), [
+            {'name': c.name, 'organizerUserId': c.organizerUserId,
+             'organizerDisplayName': names.get(c.organizerUserId),
+             'topics': c.topics, 'city': c.city, 'startDate': c.startDate,
+             'endDate': c.endDate, 'seatsAvailable': c.seatsAvailable or 0,
+             'websafeKey': c.key.urlsafe()}
+            for c in conferences])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+test_conference.py -- Udacity conference server-side Python App Engine
+    tests of the conference API methods
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.api import memcache
+from google.appengine.ext import ndb
+
+from conference import CONF_CREATE_REQUEST
+from conference import CONF_GET_REQUEST
+from conference import CONF_REGISTER_REQUEST
+from conference import ConferenceApi
+from models import Conference
+from models import Profile
+from models import clear_conference_detail
+from models import MEMCACHE_CONFERENCE_DETAIL_KEY
+from models import MEMCACHE_CONFERENCE_VERSION_KEY
+from tests.base import AppEngineTestCase
+
+
+class CreateConferenceTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(CreateConferenceTest, self).setUp()
+        self.api = ConferenceApi()
+        self.request_type = CONF_CREATE_REQUEST.combined_message_class
+        self.login('organizer@example.com')
+
+    def test_creates_conference_from_form(self):
+        form = self.api.create_conference(self.request_type(
+            name='PyCon', city='Montreal', topics=['Python'],
+            startDate='2026-11-02', endDate='2026-11-04', maxAttendees=100))
+
+        self.assertFalse(form.notFound)
+        conf = ndb.Key(urlsafe=form.websafeKey).get()
+        self.assertEqual(conf.name, 'PyCon')
+        self.assertEqual(conf.organizerUserId, 'organizer@example.com')
+        self.assertEqual(conf.month, 11)
+        self.assertEqual(conf.seatsAvailable, 100)
+        self.assertEqual(conf.key.parent().id(), 'organizer@example.com')
+
+    def test_ignores_output_only_fields(self):
+        form = self.api.create_conference(self.request_type(
+            name='PyCon', notFound=True, notModified=True, version=7,
+            organizerDisplayName='Someone else'))
+
+        conf = ndb.Key(urlsafe=form.websafeKey).get()
+        self.assertEqual(conf.version, 1)
+        self.assertEqual(conf.city, 'Default City')
+
+
+class ConferenceVersionTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(ConferenceVersionTest, self).setUp()
+        self.conf = Conference(name='PyCon')
+        self.conf.put()
+        self.key = MEMCACHE_CONFERENCE_VERSION_KEY % self.conf.key.urlsafe()
+
+    def test_put_publishes_version(self):
+        self.assertEqual(memcache.get(self.key), 1)
+
+    def test_rolled_back_put_publishes_nothing(self):
+        def rename():
+            conf = self.conf.key.get()
+            conf.name = 'PyCon 2'
+            conf.put()
+            raise ndb.Rollback()
+        ndb.transaction(rename)
+
+        self.assertEqual(memcache.get(self.key), 1)
+
+
+class ConferenceDetailCacheTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(ConferenceDetailCacheTest, self).setUp()
+        self.api = ConferenceApi()
+        organizer = Profile(id='organizer@example.com', displayName='Org')
+        organizer.put()
+        self.wsck = Conference(parent=organizer.key, name='PyCon',
+                               organizerUserId='organizer@example.com',
+                               maxAttendees=10, seatsAvailable=10).put().urlsafe()
+        self.login('user@example.com')
+
+    def _detail(self):
+        return self.api.get_conference_detail(
+            CONF_GET_REQUEST.combined_message_class(websafeConferenceKey=self.wsck))
+
+    def test_registration_refreshes_detail(self):
+        self.assertEqual(self._detail().conference.seatsAvailable, 10)
+        self.api.register_for_conference(CONF_REGISTER_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck))
+
+        self.assertEqual(self._detail().conference.seatsAvailable, 9)
+
+    def test_read_started_before_a_write_cannot_cache(self):
+        clear_conference_detail(self.wsck)
+
+        self._detail()
+        self.assertIsNone(memcache.get(MEMCACHE_CONFERENCE_DETAIL_KEY % self.wsck))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""
+test_feed.py -- Udacity conference server-side Python App Engine
+    tests of the public feed's render scheduling
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.ext import ndb
+
+import feed
+from tests.base import AppEngineTestCase
+
+
+class ScheduleRenderTest(AppEngineTestCase):
+
+    def _render_tasks(self):
+        return self.taskqueue.get_filtered_tasks(url=feed.RENDER_URL)
+
+    def test_writes_in_a_window_share_a_render(self):
+        feed.schedule_render()
+        feed.schedule_render()
+
+        self.assertEqual(len(self._render_tasks()), 1)
+
+    def test_transactional_render_is_marked_on_commit(self):
+        ndb.transaction(lambda: feed.schedule_render(transactional=True))
+        feed.schedule_render()
+
+        self.assertEqual(len(self._render_tasks()), 1)
+
+    def test_failed_transaction_leaves_no_marker(self):
+        def fail():
+            feed.schedule_render(transactional=True)
+            raise ndb.Rollback()
+        ndb.transaction(fail)
+        feed.schedule_render()
+
+        self.assertEqual(len(self._render_tasks()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
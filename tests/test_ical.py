@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+test_ical.py -- Udacity conference server-side Python App Engine
+    tests of the per-user iCalendar feed
+
+$Id$
+
+"""
+
+import unittest
+from datetime import date
+
+from google.appengine.ext import ndb
+
+import ical
+from models import Conference
+from models import Profile
+from tests.base import AppEngineTestCase
+
+
+class RenderingTest(AppEngineTestCase):
+
+    def test_escapes_text_values(self):
+        self.assertEqual(ical._escape(u'a,b;c\\d\ne'), u'a\\,b\\;c\\\\d\\ne')
+
+    def test_folds_long_lines_by_octets(self):
+        line = u'DESCRIPTION:' + u'\xe9' * 70
+        folded = ical._fold(line).split(u'\r\n')
+
+        self.assertEqual(u''.join(part[1:] if i else part
+                                  for i, part in enumerate(folded)), line)
+        for part in folded:
+            self.assertLessEqual(len(part.encode('utf-8')), ical.MAX_LINE_OCTETS)
+        self.assertTrue(all(part.startswith(u' ') for part in folded[1:]))
+
+    def test_conference_event_ends_the_day_after(self):
+        conf = Conference(parent=ndb.Key(Profile, 'organizer@example.com'),
+                          name='PyCon', startDate=date(2026, 11, 2),
+                          endDate=date(2026, 11, 4))
+        conf.put()
+        event = ical.conference_event(conf)
+
+        self.assertIn(u'DTSTART;VALUE=DATE:20261102\r\n', event)
+        self.assertIn(u'DTEND;VALUE=DATE:20261105\r\n', event)
+
+    def test_undated_conference_has_no_event(self):
+        self.assertIsNone(ical.conference_event(Conference(name='PyCon')))
+
+
+class FeedUpdateTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(FeedUpdateTest, self).setUp()
+        self.conf = Conference(parent=ndb.Key(Profile, 'organizer@example.com'),
+                               name='PyCon', startDate=date(2026, 11, 2),
+                               endDate=date(2026, 11, 4))
+        self.conf.put()
+        self.wsck = self.conf.key.urlsafe()
+        self.prof = Profile(id='user@example.com')
+        self.prof.put()
+        self.token = ical.create(self.prof)
+
+    def _body(self):
+        return ical.get(self.token)['body']
+
+    def test_update_follows_registrations(self):
+        self.prof = self.prof.key.get()
+        self.prof.conferenceKeysToAttend.append(self.wsck)
+        self.prof.put()
+        ical.update(self.prof.key.id(), self.wsck)
+        self.assertIn(u'SUMMARY:PyCon', self._body())
+
+        self.prof.conferenceKeysToAttend.remove(self.wsck)
+        self.prof.put()
+        ical.update(self.prof.key.id(), self.wsck)
+        self.assertNotIn(u'SUMMARY:PyCon', self._body())
+
+    def test_update_of_unlisted_item_leaves_feed(self):
+        etag = ical.get(self.token)['etag']
+        ical.update(self.prof.key.id(), self.wsck)
+
+        self.assertEqual(ical.get(self.token)['etag'], etag)
+
+    def test_new_token_replaces_old_feed(self):
+        new_token = ical.create(self.prof.key.get())
+
+        self.assertNotEqual(new_token, self.token)
+        self.assertIsNone(ical.get(self.token))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+test_idempotency.py -- Udacity conference server-side Python App Engine
+    tests of idempotency key replay protection
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.api import memcache
+
+from idempotency import idempotent
+from models import BooleanMessage
+from models import ConflictException
+from tests.base import AppEngineTestCase
+
+
+class _Request(object):
+
+    def __init__(self, idempotencyKey=None):
+        self.idempotencyKey = idempotencyKey
+
+
+class _Api(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    @idempotent('registerForConference', BooleanMessage)
+    def register(self, request):
+        self.calls += 1
+        if self.fail:
+            raise ValueError('datastore trouble')
+        return BooleanMessage(data=True)
+
+
+class _ReplayingApi(object):
+
+    @idempotent('registerForConference', BooleanMessage)
+    def register(self, request):
+        # the client retries while the first request still runs
+        return self.register(request)
+
+
+class IdempotentTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(IdempotentTest, self).setUp()
+        self.api = _Api()
+        self.login('user@example.com')
+
+    def test_replay_returns_stored_response(self):
+        first = self.api.register(_Request('k1'))
+        # also once memcache has lost it
+        memcache.flush_all()
+        replay = self.api.register(_Request('k1'))
+
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(replay, first)
+
+    def test_requests_without_key_always_run(self):
+        self.api.register(_Request())
+        self.api.register(_Request())
+
+        self.assertEqual(self.api.calls, 2)
+
+    def test_keys_are_per_user(self):
+        self.api.register(_Request('k1'))
+        self.login('other@example.com')
+        self.api.register(_Request('k1'))
+
+        self.assertEqual(self.api.calls, 2)
+
+    def test_failures_can_be_retried(self):
+        self.api.fail = True
+        with self.assertRaises(ValueError):
+            self.api.register(_Request('k1'))
+        self.api.fail = False
+
+        self.assertTrue(self.api.register(_Request('k1')).data)
+        self.assertEqual(self.api.calls, 2)
+
+    def test_replay_during_first_request_conflicts(self):
+        with self.assertRaises(ConflictException):
+            _ReplayingApi().register(_Request('k1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+"""
+test_index_audit.py -- Udacity conference server-side Python App Engine
+    tests of the index audit's log reading and index rules
+
+$Id$
+
+"""
+
+import unittest
+
+import index_audit
+
+
+def _shape(eq=(), ineq=None, orders=(), projection=(), ancestor=False):
+    return {'kind': 'Conference', 'ancestor': ancestor, 'eq': list(eq),
+            'ineq': ineq, 'orders': [list(order) for order in orders],
+            'projection': list(projection)}
+
+
+class ReadLogTest(unittest.TestCase):
+
+    def test_reads_marked_lines_only(self):
+        lines = [
+            'INFO     2026-10-19 07:44:46,000 module.py:812] default: "GET / HTTP/1.1" 200\n',
+            'INFO     2026-10-19 07:44:46,100 index_audit.py:70] INDEX_AUDIT '
+            '{"type": "put", "kind": "Conference", "values": {"city": 1}}\n',
+        ]
+
+        self.assertEqual(index_audit.read_log(lines), [
+            {'type': 'put', 'kind': 'Conference', 'values': {'city': 1}}])
+
+
+class RequiredIndexTest(unittest.TestCase):
+
+    def test_equality_filters_use_builtin_indexes(self):
+        self.assertIsNone(index_audit.required_index(_shape(eq=['city', 'topics'])))
+
+    def test_single_property_order_uses_builtin_index(self):
+        self.assertIsNone(index_audit.required_index(
+            _shape(orders=[('name', 'desc')])))
+        self.assertIsNone(index_audit.required_index(_shape(ineq='month')))
+
+    def test_ancestor_inequality_and_order(self):
+        required = index_audit.required_index(_shape(
+            ancestor=True, ineq='month', orders=[('name', 'asc')]))
+
+        # the inequality property is sorted on first
+        self.assertEqual(required, ('Conference', True,
+                                    (('month', 'asc'), ('name', 'asc'))))
+
+    def test_equality_then_inequality_then_orders(self):
+        required = index_audit.required_index(_shape(
+            eq=['city'], ineq='month', orders=[('month', 'desc'), ('name', 'asc')]))
+
+        self.assertEqual(required, ('Conference', False,
+                                    (('city', 'asc'), ('month', 'desc'),
+                                     ('name', 'asc'))))
+
+    def test_orders_on_equality_properties_are_dropped(self):
+        required = index_audit.required_index(_shape(
+            eq=['city'], orders=[('city', 'asc'), ('name', 'asc')]))
+
+        self.assertEqual(required, ('Conference', False,
+                                    (('city', 'asc'), ('name', 'asc'))))
+
+    def test_projection_follows_orders(self):
+        required = index_audit.required_index(_shape(
+            eq=['city'], projection=['name', 'city']))
+
+        self.assertEqual(required, ('Conference', False,
+                                    (('city', 'asc'), ('name', 'asc'))))
+
+    def test_serves_equality_properties_in_any_order(self):
+        required = ('Conference', False,
+                    (('city', 'asc'), ('topics', 'asc'), ('name', 'asc')))
+        index = ('Conference', False,
+                 (('topics', 'asc'), ('city', 'asc'), ('name', 'asc')))
+
+        self.assertTrue(index_audit.serves(index, required, 2))
+        self.assertFalse(index_audit.serves(index, required, 1))
+
+
+class AuditTest(unittest.TestCase):
+
+    def test_reports_unused_indexes_and_writes(self):
+        query = dict(_shape(eq=['city'], orders=[('name', 'asc')]),
+                     type='query', source='/conferences')
+        put = {'type': 'put', 'kind': 'Conference', 'values': {'city': 1, 'name': 1, 'month': 1}}
+        used = ('Conference', False, (('city', 'asc'), ('name', 'asc')))
+        unused = ('Conference', False, (('month', 'asc'), ('name', 'asc')))
+
+        report, unused_indexes, minimal, writes = index_audit.audit(
+            [query, query, put], [used, unused])
+
+        self.assertEqual(report, [(query, 2, ['/conferences'], used, used)])
+        self.assertEqual(unused_indexes, [unused])
+        self.assertEqual(minimal, [used])
+        # entity + kind row, 2 rows per value, 1 row per composite index
+        self.assertEqual(writes, {'Conference': (1, 10.0, 9.0)})
+
+
+if __name__ == '__main__':
+    unittest.main()
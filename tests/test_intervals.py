@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+test_intervals.py -- Udacity conference server-side Python App Engine
+    tests of the static interval index
+
+$Id$
+
+"""
+
+import unittest
+
+from intervals import IntervalIndex
+
+
+class OverlappingTest(unittest.TestCase):
+
+    def test_back_to_back_intervals_do_not_overlap(self):
+        index = IntervalIndex([(0, 10, 'a'), (20, 30, 'c')])
+
+        self.assertEqual(index.overlapping(10, 20), [])
+
+    def test_nested_intervals_overlap(self):
+        index = IntervalIndex([(0, 100, 'outer'), (40, 50, 'inner')])
+
+        self.assertEqual(index.overlapping(45, 46),
+                         [(0, 100, 'outer'), (40, 50, 'inner')])
+        self.assertEqual(index.overlapping(10, 20), [(0, 100, 'outer')])
+
+    def test_identical_intervals_overlap(self):
+        index = IntervalIndex([(10, 20, 'a'), (10, 20, 'b')])
+
+        self.assertEqual(index.overlapping(10, 20), [(10, 20, 'a'), (10, 20, 'b')])
+
+    def test_skips_short_interval_before_long_one(self):
+        # the running maximum of ends must not stop at the short one
+        index = IntervalIndex([(0, 100, 'long'), (5, 6, 'short'), (50, 60, 'mid')])
+
+        self.assertEqual(index.overlapping(70, 80), [(0, 100, 'long')])
+
+    def test_empty_index(self):
+        index = IntervalIndex([])
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.overlapping(0, 10), [])
+
+
+class OverlapsTest(unittest.TestCase):
+
+    def _pairs(self, intervals):
+        return [(first[2], second[2])
+                for first, second in IntervalIndex(intervals).overlaps()]
+
+    def test_back_to_back_intervals_do_not_overlap(self):
+        self.assertEqual(self._pairs([(0, 10, 'a'), (10, 20, 'b')]), [])
+
+    def test_nested_intervals_overlap(self):
+        self.assertEqual(self._pairs([(40, 50, 'inner'), (0, 100, 'outer')]),
+                         [('outer', 'inner')])
+
+    def test_identical_intervals_pair_once(self):
+        self.assertEqual(self._pairs([(10, 20, 'a'), (10, 20, 'b')]),
+                         [('a', 'b')])
+
+    def test_every_pair_of_a_chain(self):
+        self.assertEqual(self._pairs([(0, 30, 'a'), (10, 40, 'b'), (20, 50, 'c'),
+                                      (45, 60, 'd')]),
+                         [('a', 'b'), ('a', 'c'), ('b', 'c'), ('c', 'd')])
+
+
+if __name__ == '__main__':
+    unittest.main()
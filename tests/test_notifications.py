@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+test_notifications.py -- Udacity conference server-side Python App Engine
+    tests of the attendee notification fan-out
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.ext import ndb
+
+import notifications
+from models import Attendance
+from models import Conference
+from models import Profile
+from tests.base import AppEngineTestCase
+
+
+class FanOutTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(FanOutTest, self).setUp()
+        conf_key = Conference(parent=ndb.Key(Profile, 'organizer@example.com'),
+                              name='PyCon').put()
+        self.wsck = conf_key.urlsafe()
+        ndb.put_multi([Attendance(id='user%03d@example.com' % i, parent=conf_key)
+                       for i in range(250)])
+
+    def _send_tasks(self):
+        return self.taskqueue.get_filtered_tasks(url=notifications.SEND_URL)
+
+    def test_queues_a_send_task_per_batch(self):
+        notifications.fan_out(self.wsck, 'n1', 'Subject', 'Body')
+
+        # 250 attendees in batches of SEND_BATCH = 100
+        self.assertEqual(len(self._send_tasks()), 3)
+
+    def test_rerun_queues_no_batch_twice(self):
+        notifications.fan_out(self.wsck, 'n1', 'Subject', 'Body')
+        notifications.fan_out(self.wsck, 'n1', 'Subject', 'Body')
+
+        self.assertEqual(len(self._send_tasks()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
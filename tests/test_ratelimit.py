@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+test_ratelimit.py -- Udacity conference server-side Python App Engine
+    tests of the per-user API rate limits
+
+$Id$
+
+"""
+
+import unittest
+
+import endpoints
+
+import ratelimit
+from models import TooManyRequestsException
+from settings import RATE_LIMITS
+from tests.base import AppEngineTestCase
+
+
+class _Clock(object):
+    """Stands in for the time module, at a settable time."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class _Api(object):
+
+    @ratelimit.rate_limited('registerForConference')
+    def register(self, request):
+        return request
+
+
+class RateLimitedTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(RateLimitedTest, self).setUp()
+        self.limit, self.window = RATE_LIMITS['registerForConference']
+        self.clock = _Clock(1000 * self.window)
+        self._time, ratelimit.time = ratelimit.time, self.clock
+        self.api = _Api()
+        self.login('user@example.com')
+
+    def tearDown(self):
+        ratelimit.time = self._time
+        super(RateLimitedTest, self).tearDown()
+
+    def _use_up_limit(self):
+        for i in range(self.limit):
+            self.assertEqual(self.api.register(i), i)
+
+    def test_rejects_requests_over_the_limit(self):
+        self._use_up_limit()
+
+        with self.assertRaises(TooManyRequestsException) as raised:
+            self.api.register('one too many')
+        # Endpoints passes no 429 through; clients get a 403
+        self.assertIsInstance(raised.exception, endpoints.ForbiddenException)
+        self.assertEqual(raised.exception.http_status, 403)
+        self.assertIn('retry in %d seconds' % self.window,
+                      str(raised.exception))
+
+    def test_counts_each_caller_apart(self):
+        self._use_up_limit()
+
+        self.login('other@example.com')
+        self.assertEqual(self.api.register('other'), 'other')
+
+    def test_allows_requests_in_the_next_window(self):
+        self._use_up_limit()
+
+        self.clock.now += self.window
+        self.assertEqual(self.api.register('later'), 'later')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+test_recommender.py -- Udacity conference server-side Python App Engine
+    tests of the recommendation job's counting
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.ext import ndb
+
+import recommender
+from models import CoOccurrence
+from models import Profile
+from models import RecommenderJob
+from tests.base import AppEngineTestCase
+
+
+class CountTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(CountTest, self).setUp()
+        for user in ('a', 'b'):
+            Profile(id=user, sessionsInWishlist=['s1', 's2'],
+                    conferenceKeysToAttend=['c1']).put()
+        self.job = RecommenderJob(id='job')
+        self.job.put()
+        # three items per chunk, committed two at a time
+        self._max, recommender.MAX_COMMIT_ENTITIES = recommender.MAX_COMMIT_ENTITIES, 2
+
+    def tearDown(self):
+        recommender.MAX_COMMIT_ENTITIES = self._max
+        super(CountTest, self).tearDown()
+
+    def _tally(self, item):
+        return CoOccurrence.get_by_id(item, parent=self.job.key)
+
+    def test_counts_chunk_over_several_commits(self):
+        recommender._count_chunk(self.job)
+
+        job = self.job.key.get()
+        self.assertEqual(job.phase, 'score')
+        self.assertEqual(job.profilesDone, 2)
+        self.assertEqual(job.appliedItems, [])
+        self.assertEqual(self._tally('session:s1').count, 2)
+        self.assertEqual(self._tally('session:s1').others,
+                         {'session:s2': 2, 'conference:c1': 2})
+        self.assertEqual(self._tally('conference:c1').count, 2)
+
+    def test_retried_commit_skips_counted_items(self):
+        tallies = {'session:s1': [1, {}], 'session:s2': [1, {}],
+                   'conference:c1': [1, {}]}
+        self.assertFalse(recommender._apply_tallies(
+            self.job.key, None, None, tallies, 1))
+        # the task dies and reruns the chunk from the start
+        while not recommender._apply_tallies(self.job.key, None, None, tallies, 1):
+            pass
+
+        self.assertEqual([self._tally(item).count for item in sorted(tallies)],
+                         [1, 1, 1])
+        self.assertEqual(self.job.key.get().profilesDone, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+test_schedule.py -- Udacity conference server-side Python App Engine
+    tests of the cached schedule intervals behind conflict checks
+
+$Id$
+
+"""
+
+import unittest
+from datetime import date
+
+from google.appengine.ext import ndb
+
+from conference import ConferenceApi
+from models import Conference
+from models import Profile
+from tests.base import AppEngineTestCase
+
+
+class ScheduleIntervalsTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(ScheduleIntervalsTest, self).setUp()
+        self.mine = self._put_conference('Mine')
+        self.other = self._put_conference('Other')
+        self.prof = Profile(id='user@example.com',
+                            conferenceKeysToAttend=[self.mine.key.urlsafe()])
+        self.prof.put()
+
+    def _put_conference(self, name):
+        conf = Conference(parent=ndb.Key(Profile, 'organizer@example.com'),
+                          name=name, startDate=date(2026, 11, 2),
+                          endDate=date(2026, 11, 3))
+        conf.put()
+        return conf
+
+    def _names(self):
+        schedule = ConferenceApi._schedule_intervals(self.prof)
+        return [name for _, _, (_, name) in schedule['conference']]
+
+    def test_other_conferences_keep_the_cache(self):
+        self._names()
+        self.other.put()
+        # gone from the datastore, so only a cached schedule has it
+        self.mine.key.delete()
+
+        self.assertEqual(self._names(), ['Mine'])
+
+    def test_own_conference_change_invalidates(self):
+        self._names()
+        self.mine.name = 'Renamed'
+        self.mine.put()
+
+        self.assertEqual(self._names(), ['Renamed'])
+
+
+if __name__ == '__main__':
+    unittest.main()
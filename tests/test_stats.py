@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+test_stats.py -- Udacity conference server-side Python App Engine
+    tests of the aggregate counters' reconciliation
+
+$Id$
+
+"""
+
+import unittest
+
+import stats
+from models import AggregateCounter
+from tests.base import AppEngineTestCase
+
+
+class ReconcileTest(AppEngineTestCase):
+
+    def _set_count(self, name, count):
+        AggregateCounter(id=name, count=count).put()
+
+    def _count(self, name):
+        return AggregateCounter.get_by_id(name).count
+
+    def test_reports_drift_without_overwriting(self):
+        self._set_count('conferences', 5)
+
+        self.assertEqual(stats.reconcile(), {'conferences': 5})
+        self.assertEqual(self._count('conferences'), 5)
+
+    def test_repairs_drift_seen_twice(self):
+        self._set_count('conferences', 5)
+        stats.reconcile()
+
+        self.assertEqual(stats.reconcile(), {'conferences': 5})
+        self.assertEqual(self._count('conferences'), 0)
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_keeps_changing_drift(self):
+        self._set_count('conferences', 5)
+        stats.reconcile()
+        self._set_count('conferences', 3)
+
+        stats.reconcile()
+        self.assertEqual(self._count('conferences'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+test_waitlist.py -- Udacity conference server-side Python App Engine
+    tests of the conference waitlist
+
+$Id$
+
+"""
+
+import unittest
+
+from google.appengine.ext import ndb
+
+import waitlist
+from conference import CONF_GET_REQUEST
+from conference import CONF_POST_REQUEST
+from conference import CONF_REGISTER_REQUEST
+from conference import ConferenceApi
+from models import Conference
+from models import ConflictException
+from models import Profile
+from tests.base import AppEngineTestCase
+
+
+class WaitlistOrderTest(AppEngineTestCase):
+
+    def setUp(self):
+        super(WaitlistOrderTest, self).setUp()
+        self.api = ConferenceApi()
+        # a sold out conference
+        organizer = Profile(id='organizer@example.com', displayName='Org')
+        organizer.put()
+        self.conf = Conference(parent=organizer.key, name='PyCon',
+                               organizerUserId='organizer@example.com',
+                               maxAttendees=1, seatsAvailable=0)
+        self.conf.put()
+        self.wsck = self.conf.key.urlsafe()
+
+    def _register(self, email):
+        self.login(email)
+        request = CONF_REGISTER_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck)
+        return self.api.register_for_conference(request).data
+
+    def _join_waitlist(self, email):
+        self.login(email)
+        request = CONF_GET_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck)
+        return self.api.join_waitlist(request).data
+
+    def _free_seat(self):
+        conf = self.conf.key.get()
+        conf.seatsAvailable += 1
+        conf.put()
+
+    def test_freed_seat_goes_to_waitlist_head(self):
+        self.assertTrue(self._join_waitlist('first@example.com'))
+        self._free_seat()
+
+        # the seat is free until the promote task runs
+        with self.assertRaises(ConflictException):
+            self._register('other@example.com')
+        waitlist.promote(self.wsck)
+
+        first = ndb.Key(Profile, 'first@example.com').get()
+        self.assertIn(self.wsck, first.conferenceKeysToAttend)
+        self.assertEqual(self.conf.key.get().seatsAvailable, 0)
+
+    def test_can_join_waitlist_before_promotion(self):
+        self._join_waitlist('first@example.com')
+        self._free_seat()
+
+        self.assertTrue(self._join_waitlist('second@example.com'))
+
+    def test_seats_added_by_organizer_go_to_waitlist(self):
+        self._join_waitlist('first@example.com')
+
+        self.login('organizer@example.com')
+        self.api.update_conference(CONF_POST_REQUEST.combined_message_class(
+            websafeConferenceKey=self.wsck, maxAttendees=2, seatsAvailable=1))
+        tasks = self.taskqueue.get_filtered_tasks(url='/tasks/promote_waitlist')
+        self.assertEqual(len(tasks), 1)
+
+    def test_detail_offers_waitlist_while_seats_are_owed(self):
+        self._join_waitlist('first@example.com')
+        self._free_seat()
+
+        self.login('other@example.com')
+        detail = self.api.get_conference_detail(
+            CONF_GET_REQUEST.combined_message_class(websafeConferenceKey=self.wsck))
+        self.assertTrue(detail.hasWaitlist)
+
+    def test_registers_directly_without_waitlist(self):
+        self._free_seat()
+
+        self.assertTrue(self._register('other@example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+"""
+transfer.py -- Udacity conference server-side Python App Engine
+    bulk export & import of datastore entities as newline-delimited JSON
+
+$Id$
+
+Each line is one entity:
+
+    {"kind": "Session", "key": ["Profile", "me", "Conference", 1, "Session", 2],
+     "properties": {"name": "Intro", "date": "2016-01-01", ...}}
+
+"key" may be omitted (optionally with a "parent" path instead) to have the
+importer allocate ids, which is handy for seeding benchmark datasets.
+
+Run locally against the datastore stub (SDK on PYTHONPATH):
+
+    python transfer.py import seed.ndjson --datastore_path=/tmp/conf.sqlite
+    python transfer.py export Conference --datastore_path=/tmp/conf.sqlite
+
+"""
+
+import json
+from datetime import datetime
+
+from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.ext import ndb
+
+from models import Conference
+from models import ImportCheckpoint
+from models import Profile
+from models import Session
+from models import Speaker
+
+EXPORT_KINDS = {
+    'Conference': Conference,
+    'Session': Session,
+    'Speaker': Speaker,
+    'Profile': Profile,
+}
+
+# string properties holding websafe keys; these embed the app id, so they
+# travel as key paths and get re-encoded for the importing app
+KEY_REFERENCE_FIELDS = {
+    'Profile': ('conferenceKeysToAttend', 'sessionsInWishlist'),
+}
+
+EXPORT_BATCH_SIZE = 200
+IMPORT_CHUNK_SIZE = 200
+
+# - - - Serialization - - - - - - - - - - - - - - - - - - - -
+
+
+def _encode_value(prop, value):
+    """Convert a property value to something JSON can carry."""
+    if value is None:
+        return None
+    if isinstance(prop, ndb.DateTimeProperty):
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%f')
+    if isinstance(prop, ndb.DateProperty):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(prop, ndb.TimeProperty):
+        return value.strftime('%H:%M:%S')
+    return value
+
+
+def _decode_value(prop, value):
+    """Inverse of _encode_value."""
+    if value is None:
+        return None
+    if isinstance(prop, ndb.DateTimeProperty):
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+    if isinstance(prop, ndb.DateProperty):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(prop, ndb.TimeProperty):
+        return datetime.strptime(value, '%H:%M:%S').time()
+    return value
+
+
+def entity_to_record(entity):
+    """Return the JSON-serialisable record for an entity."""
+    kind = entity._get_kind()
+    references = KEY_REFERENCE_FIELDS.get(kind, ())
+    props = {}
+    for prop in entity._properties.values():
+        # computed properties are rebuilt on put
+        if isinstance(prop, ndb.ComputedProperty):
+            continue
+        name = prop._code_name
+        value = getattr(entity, name)
+        if name in references:
+            value = [list(ndb.Key(urlsafe=wsk).flat()) for wsk in value]
+        elif prop._repeated:
+            value = [_encode_value(prop, v) for v in value]
+        else:
+            value = _encode_value(prop, value)
+        props[name] = value
+    return {'kind': kind, 'key': list(entity.key.flat()), 'properties': props}
+
+
+def record_to_entity(record):
+    """Build an (unsaved) entity from a record; key may still be partial."""
+    kind = record['kind']
+    model = EXPORT_KINDS.get(kind)
+    if model is None:
+        raise ValueError('Unsupported kind: %s' % kind)
+    references = KEY_REFERENCE_FIELDS.get(kind, ())
+
+    data = {}
+    for name, value in record.get('properties', {}).items():
+        prop = model._properties.get(name)
+        if prop is None or isinstance(prop, ndb.ComputedProperty):
+            continue
+        if name in references:
+            value = [ndb.Key(flat=path).urlsafe() for path in value]
+        elif prop._repeated:
+            value = [_decode_value(prop, v) for v in value]
+        else:
+            value = _decode_value(prop, value)
+        data[name] = value
+
+    if record.get('key'):
+        data['key'] = ndb.Key(flat=record['key'])
+    elif record.get('parent'):
+        data['parent'] = ndb.Key(flat=record['parent'])
+    return model(**data)
+
+# - - - Export - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def export_kind(kind, write, cursor=None, max_batches=None,
+                batch_size=EXPORT_BATCH_SIZE):
+    """Write one line per entity of kind, a cursor-sized batch at a time.
+
+    Only one batch is held in memory at once. Returns the websafe cursor to
+    resume from if max_batches stopped the export early, otherwise None.
+    """
+    model = EXPORT_KINDS.get(kind)
+    if model is None:
+        raise ValueError('Unsupported kind: %s' % kind)
+
+    q = model.query()
+    start = Cursor(urlsafe=cursor) if cursor else None
+    batches = 0
+    while True:
+        entities, start, more = q.fetch_page(batch_size, start_cursor=start)
+        write(''.join(json.dumps(entity_to_record(e)) + '\n'
+                      for e in entities))
+        batches += 1
+        if not more or not start:
+            return None
+        if max_batches and batches >= max_batches:
+            return start.urlsafe()
+
+# - - - Import - - - - - - - - - - - - - - - - - - - - - - - -
+
+
+def _assign_ids(entities):
+    """Give keyless entities ids and reserve explicit ones, using one
+    allocate_ids range per (kind, parent) in the chunk."""
+    groups = {}
+    for entity in entities:
+        if entity.key is None or entity.key.id() is None:
+            parent = entity.key.parent() if entity.key else None
+            scope = (entity.__class__, parent)
+            groups.setdefault(scope, [[], 0])[0].append(entity)
+        elif isinstance(entity.key.id(), (int, long)):
+            scope = (entity.__class__, entity.key.parent())
+            group = groups.setdefault(scope, [[], 0])
+            group[1] = max(group[1], entity.key.id())
+
+    for (model, parent), (keyless, max_id) in groups.items():
+        if max_id:
+            # make sure allocate_ids never hands out an imported id again
+            model.allocate_ids(max=max_id, parent=parent)
+        if keyless:
+            first, last = model.allocate_ids(size=len(keyless), parent=parent)
+            for entity, new_id in zip(keyless, range(first, last + 1)):
+                entity.key = ndb.Key(model, new_id, parent=parent)
+
+
+def _put_chunk(lines):
+    entities = [record_to_entity(json.loads(line)) for line in lines]
+    _assign_ids(entities)
+    ndb.put_multi(entities)
+
+
+def import_lines(lines, job_id, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import newline-delimited JSON records, checkpointing after each chunk.
+
+    Calling again with the same job_id and input skips the lines that
+    were already written, so a failed import can simply be re-run. Records
+    with explicit keys are idempotent; a keyless record may be duplicated
+    only if the failure hit between a chunk put and its checkpoint.
+    Returns the total number of lines done for the job.
+    """
+    checkpoint = ImportCheckpoint.get_or_insert(job_id)
+    done = checkpoint.linesDone
+
+    chunk = []
+    for lineno, line in enumerate(lines):
+        if lineno < done or not line.strip():
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            _put_chunk(chunk)
+            checkpoint.linesDone = lineno + 1
+            checkpoint.put()
+            chunk = []
+    if chunk:
+        _put_chunk(chunk)
+        checkpoint.linesDone = lineno + 1
+        checkpoint.put()
+    return checkpoint.linesDone
+
+# - - - Local driver - - - - - - - - - - - - - - - - - - - - -
+
+
+def _main():
+    import argparse
+    import sys
+    from google.appengine.ext import testbed
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('target', help='input file (import) or kind (export)')
+    parser.add_argument('--datastore_path', required=True)
+    parser.add_argument('--app_id', default='dev~ornate-bebop-120308')
+    parser.add_argument('--job_id', default='local')
+    args = parser.parse_args()
+
+    tb = testbed.Testbed()
+    tb.setup_env(app_id=args.app_id, overwrite=True)
+    tb.activate()
+    tb.init_datastore_v3_stub(datastore_file=args.datastore_path,
+                              use_sqlite=True)
+    tb.init_memcache_stub()
+    try:
+        if args.command == 'import':
+            with open(args.target) as f:
+                done = import_lines(f, args.job_id)
+            sys.stderr.write('%d lines imported\n' % done)
+        else:
+            export_kind(args.target, sys.stdout.write)
+    finally:
+        tb.deactivate()
+
+
+if __name__ == '__main__':
+    _main()
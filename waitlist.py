@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+waitlist.py -- Udacity conference server-side Python App Engine
+    promotion of waitlisted users into freed seats
+
+$Id$
+
+Run by the promote waitlist task, which unregistration queues; kept out
+of conference.py so that the task handlers don't load the API module.
+
+"""
+
+from google.appengine.api import taskqueue
+from google.appengine.ext import ndb
+
+import feed
+import ical
+import stats
+from models import Attendance
+from models import Profile
+from models import WaitlistEntry
+from models import clear_conference_detail
+
+
+def promote(wsck):
+    """Register the head of a conference's waitlist into a freed seat."""
+    _promote(wsck)
+    clear_conference_detail(wsck)
+
+
+@ndb.transactional(xg=True)
+def _promote(wsck):
+    conf = ndb.Key(urlsafe=wsck).get()
+    if not conf or conf.seatsAvailable <= 0:
+        return
+
+    entry = WaitlistEntry.query(ancestor=conf.key).order(WaitlistEntry.created).get()
+    if not entry:
+        return
+    prof = ndb.Key(Profile, entry.key.id()).get()
+    entry.key.delete()
+
+    # users who registered directly meanwhile just leave the queue
+    if prof and wsck not in prof.conferenceKeysToAttend:
+        prof.conferenceKeysToAttend.append(wsck)
+        conf.seatsAvailable -= 1
+        ndb.put_multi([prof, conf, Attendance(id=prof.key.id(), parent=conf.key)])
+        stats.enqueue(stats.registration_deltas(conf), transactional=True)
+        taskqueue.add(params={'email': prof.mainEmail,
+                              'conferenceName': conf.name},
+                      url='/tasks/send_waitlist_email',
+                      transactional=True)
+        if prof.calendarToken:
+            ical.queue_update(prof.key.id(), wsck, transactional=True)
+        feed.schedule_render(transactional=True)
+
+    # keep going while seats are left; the next task stops once
+    # the waitlist is empty
+    if conf.seatsAvailable > 0:
+        taskqueue.add(params={'websafeConferenceKey': wsck},
+                      url='/tasks/promote_waitlist',
+                      transactional=True)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+warmup.py -- Udacity conference server-side Python App Engine
+    instance warmup: loads modules and primes caches & connections
+
+$Id$
+
+Run by /_ah/warmup before an instance takes traffic. The API module is
+imported here, not by main.py at load, so the task and cron handlers
+don't pay for it, while instances still get it loaded ahead of their
+first API request.
+
+"""
+
+import logging
+import sys
+import time
+
+# in load order; importing conference builds the ResourceContainers and
+# the endpoints api_server
+MODULES = [
+    'models',
+    'protorpc.protojson',
+    'cache',
+    'announcements',
+    'conference',
+]
+
+
+def _timed(label, fn, timings):
+    start = time.time()
+    fn()
+    timings.append((label, 1000 * (time.time() - start)))
+
+
+def warm():
+    """Load the modules and prime the serializer, caches and service
+    connections; return [(step, milliseconds)]."""
+    timings = []
+    for name in MODULES:
+        if name not in sys.modules:
+            _timed('import %s' % name, lambda: __import__(name), timings)
+
+    from google.appengine.api import memcache
+    from google.appengine.ext import ndb
+    from protorpc import protojson
+    import announcements
+    from models import ConferenceForm
+    from models import Profile
+
+    _timed('protojson', lambda: protojson.decode_message(
+        ConferenceForm, protojson.encode_message(ConferenceForm(name='warmup'))),
+        timings)
+    _timed('memcache', lambda: memcache.get('WARMUP'), timings)
+    _timed('datastore', lambda: ndb.Key(Profile, 'warmup').get(use_cache=False,
+                                                               use_memcache=False),
+           timings)
+    # fills the instance-local tier of the derived values
+    _timed('announcement', announcements.ANNOUNCEMENT.get, timings)
+    _timed('featured speaker', announcements.FEATURED_SPEAKER.get, timings)
+
+    for label, ms in timings:
+        logging.info('warmup: %s took %.1f ms', label, ms)
+    return timings